@@ -0,0 +1,219 @@
+"""
+Analysis Runtime Configuration for LicitIA
+Defines executor stages, worker pools and concurrency limits used by the
+analysis API (PDF extraction and DEMO engine).
+"""
+
+import os
+from pathlib import Path
+from typing import Dict, Any
+
+
+# Executor Types
+EXECUTOR_THREADS = "hilos"  # Thread pool: I/O-ish work (upload reading, hashing)
+EXECUTOR_PROCESSES = "procesos"  # Process pool: CPU-heavy work (PDF text, similarity)
+
+# Executor Stages
+# - tipo: executor type
+# - trabajadores: pool size (None = os.cpu_count())
+# - max_concurrencia: max tasks submitted at once; the rest wait in the stage queue
+EXECUTION_STAGES: Dict[str, Dict[str, Any]] = {
+    "lectura": {
+        "tipo": EXECUTOR_THREADS,
+        "trabajadores": 8,
+        "max_concurrencia": 32
+    },
+    "pdf": {
+        "tipo": EXECUTOR_PROCESSES,
+        "trabajadores": 2,
+        "max_concurrencia": 8
+    },
+    "analisis": {
+        "tipo": EXECUTOR_PROCESSES,
+        "trabajadores": 2,
+        "max_concurrencia": 8
+    }
+}
+
+# Process Pool Workers
+# - max_tareas_por_trabajador: recycle a worker after N tasks to bound memory growth
+# - precalentar: start and warm every worker at application startup
+PROCESS_WORKERS = {
+    "max_tareas_por_trabajador": 200,
+    "precalentar": True,
+    "modulos_precargados": [
+        "demo_engine",
+        "core.extractor",
+        "core.comparador",
+        "core.validador",
+        "utils.pdf_handler"
+    ]
+}
+
+# Payloads at or above this size (bytes) reach worker processes through shared memory
+SHARED_MEMORY_THRESHOLD = 256 * 1024
+
+# PDF Text Extraction
+# - paginas_por_fragmento: pages per range sent to one worker when sharding a document
+# - min_paginas_paralelo: documents with fewer pages are extracted as a single range
+# - max_paginas: page budget per document; later pages are not decoded (None = no limit)
+# - fragmentos_adelantados: ranges decoded ahead of field extraction, which may stop early
+PDF_EXTRACTION = {
+    "paginas_por_fragmento": 8,
+    "min_paginas_paralelo": 16,
+    "max_paginas": 500,
+    "fragmentos_adelantados": 2
+}
+
+# Uploaded Documents
+# - max_bytes_documento: uploads above this size are rejected with 413
+# - tamano_bloque: chunk size used to copy and hash an upload
+# - directorio: where uploads are spooled to disk (None = system temp dir)
+UPLOADS = {
+    "max_bytes_documento": 50 * 1024 * 1024,
+    "tamano_bloque": 1024 * 1024,
+    "directorio": None
+}
+
+# PDF Text Backends
+# - orden: fallback order (uninstalled backends are skipped); calibration moves the winner first
+# - calidad_minima: mean word recall (or share of pages with text) a backend needs to be chosen
+# - corpus_calibracion: folder of sample PDFs (+ optional <name>.txt reference text)
+# - calibrar_al_iniciar: benchmark the backends on the corpus at application startup
+PDF_BACKENDS = {
+    "orden": ["pypdf", "pypdf2", "pdftotext", "pdfminer"],
+    "calidad_minima": 0.9,
+    "corpus_calibracion": "data/corpus_pdf",
+    "calibrar_al_iniciar": True,
+    "lote_pdftotext": 8,
+    "timeout_subproceso": 30
+}
+
+# OCR for Scanned Pages (tesseract + poppler pdftoppm, both optional)
+# - min_caracteres: pages with less extracted text are treated as having no text layer
+# - directorio_cache: recognized text by document hash, page, dpi and language, shared by all workers
+OCR = {
+    "habilitado": True,
+    "idioma": "spa",
+    "dpi": 300,
+    "min_caracteres": 20,
+    "directorio_cache": "data/ocr_cache",
+    "timeout_subproceso": 120
+}
+
+# ZIP Bundles (tender notice + annexes)
+# - patron_pliego: entry name identifying the tender notice PDF (first match wins)
+# - max_entradas / max_bytes_descomprimidos: guards against oversized or malicious archives
+BUNDLES = {
+    "max_bytes_paquete": 200 * 1024 * 1024,
+    "max_entradas": 500,
+    "max_bytes_descomprimidos": 1024 * 1024 * 1024,
+    "patron_pliego": r"(?i)(pliego|aviso|convocatoria)",
+    "max_paginas_anexo": 200
+}
+
+# SQLite Databases
+# - directorio: folder holding the database files (next to this file by default);
+#   the LICITIA_DATA_DIR environment variable overrides it (e.g. a temporary folder in tests)
+# - perfiles: stored company profiles
+# - trabajos: durable analysis job queue
+# - idempotencia: responses stored for Idempotency-Key retries
+DATABASES = {
+    "directorio": os.environ.get("LICITIA_DATA_DIR") or str(Path(__file__).parent / "data"),
+    "perfiles": "perfiles.db",
+    "trabajos": "trabajos.db",
+    "idempotencia": "idempotencia.db"
+}
+
+# Asynchronous Analysis Jobs (SQLite queue + worker threads)
+# - prioridades: queue priority per job type; PRO jobs run ahead of DEMO jobs
+# - directorio: uploads of queued jobs (next to this file), kept until the job completes or fails
+# - duracion_reserva: seconds a claimed job stays reserved; jobs of a crashed worker are retried after it
+# - retencion_horas: finished jobs (and results) are purged after this
+# - ventana_metricas: seconds of finished jobs used for throughput and queue latency
+JOBS = {
+    "trabajadores": 2,
+    "prioridades": {"pro": 10, "demo": 0},
+    "directorio": str(Path(__file__).parent / "data" / "trabajos"),
+    "intervalo_sondeo": 1.0,
+    "duracion_reserva": 900,
+    "max_intentos": 3,
+    "retencion_horas": 24,
+    "ventana_metricas": 300
+}
+
+# Idempotent Retries (Idempotency-Key header)
+# - rutas: POST endpoints whose responses are stored and replayed
+# - ttl_horas: how long a stored response can be replayed
+# - max_entradas_memoria / max_entradas_disco: in-memory LRU and SQLite bounds
+# - max_bytes_respuesta: larger responses are returned but not stored
+IDEMPOTENCY = {
+    "rutas": ["/api/analysis/process", "/api/pricing/quote"],
+    "ttl_horas": 24,
+    "max_entradas_memoria": 1000,
+    "max_entradas_disco": 100_000,
+    "max_bytes_respuesta": 1024 * 1024,
+    "max_longitud_clave": 255
+}
+
+# Admission Control for /api/analysis (pricing routes are never limited)
+# - tasa_por_cliente / rafaga_por_cliente: token bucket per client (requests/second, burst); over it -> 429
+# - max_concurrentes: analysis requests served at once by this worker (GET requests are not capped)
+# - max_en_espera / espera_maxima_segundos: bounded wait queue; full queue or longer wait -> 503
+# - usar_x_forwarded_for: identify clients by the first X-Forwarded-For address (behind a proxy)
+# - rutas_exentas: paths never limited (health)
+# Runtime changes: PUT /api/analysis/admin/limits
+ADMISSION = {
+    "tasa_por_cliente": 2.0,
+    "rafaga_por_cliente": 20,
+    "max_clientes": 10_000,
+    "max_concurrentes": 16,
+    "max_en_espera": 32,
+    "espera_maxima_segundos": 10.0,
+    "usar_x_forwarded_for": False,
+    "rutas_exentas": ["/api/analysis/health"]
+}
+
+# Admin Endpoints (/api/analysis/admin/...)
+# - variable_token: environment variable holding the admin token, sent by callers in
+#   the X-Admin-Token header; while it is unset the admin endpoints answer 403
+ADMIN = {
+    "variable_token": "LICITIA_ADMIN_TOKEN"
+}
+
+# Request Deadlines for analysis endpoints
+# - segundos_por_defecto: time budget when the client sends no X-Request-Timeout header
+# - maximo_segundos: cap for the X-Request-Timeout value
+# - ventana_coalescencia_segundos: identical requests only share one computation (and its
+#   deadline) when their deadlines fall in the same window of this many seconds
+# Stages stop between units of work (pages, candidates, similarity metrics) once the
+# deadline passes and the response is a partial result with "incompleto": true.
+# Queued jobs have no deadline.
+DEADLINES = {
+    "segundos_por_defecto": 60,
+    "maximo_segundos": 300,
+    "ventana_coalescencia_segundos": 1.0
+}
+
+# Stage Timings of the analysis pipeline (extractors, structural validation,
+# similarity by metric, financial validation, score, traffic light, recommendation)
+# - limites_ms: upper bounds of the latency histogram buckets per stage, in milliseconds
+# Per-request timings: include_timings=true on the analysis endpoints (metadata.tiempos_etapas_ms)
+# Aggregated histograms: GET /api/analysis/timings
+STAGE_TIMINGS = {
+    "limites_ms": [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000]
+}
+
+# Prometheus Metrics (GET /metrics, text exposition format)
+# - limites_latencia_ms: HTTP request latency histogram buckets (exposed in seconds)
+# - directorio_multiproceso: snapshot files shared by the workers of one server, merged on
+#   every scrape so any worker answers for all of them (None: this process only).
+#   Use one directory per server.
+# - intervalo_volcado_segundos: how often each worker writes its snapshot
+# - vigencia_segundos: snapshots older than this belong to exited workers and are dropped
+METRICS = {
+    "limites_latencia_ms": [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000],
+    "directorio_multiproceso": "data/metricas",
+    "intervalo_volcado_segundos": 5,
+    "vigencia_segundos": 30
+}
@@ -1,9 +1,55 @@
 """Text similarity comparison engine"""
 
 import re
-from typing import Tuple, Set
+import heapq
+import time
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple, Set
 from difflib import SequenceMatcher
 
+from core.cronometro import Cronometro
+from core.plazo import Plazo, SIN_PLAZO
+
+
+# Accent folding table applied with str.translate (ñ folds to n as well)
+TABLA_ACENTOS = str.maketrans('áéíóúüàèìòùñ', 'aeiouuaeioun')
+
+# Plural endings that drop the whole "es" (gestiones -> gestion, comunidades -> comunidad)
+_CONSONANTES_PLURAL_ES = frozenset('dlnrjz')
+
+
+def plegar_acentos(texto: str) -> str:
+    """Fold Spanish accents and diacritics to their base letters"""
+    return texto.translate(TABLA_ACENTOS)
+
+
+@lru_cache(maxsize=8192)
+def raiz_palabra(palabra: str) -> str:
+    """
+    Light Spanish stemmer (plural and gender endings only).
+    
+    Collapses servicio/servicios, pesquero/pesquera and gestion/gestiones
+    to the same root. Results are memoized in a bounded LRU cache.
+    
+    Args:
+        palabra: Lowercase, accent-folded word
+    
+    Returns:
+        Word root
+    """
+    if len(palabra) <= 4:
+        return palabra
+    
+    if palabra.endswith('es') and len(palabra) > 5 and palabra[-3] in _CONSONANTES_PLURAL_ES:
+        palabra = palabra[:-2]
+    elif palabra.endswith('s'):
+        palabra = palabra[:-1]
+    
+    if len(palabra) > 4 and palabra[-1] in 'aeo':
+        palabra = palabra[:-1]
+    
+    return palabra
+
 
 class ComparadorTextos:
     """Advanced text similarity comparator"""
@@ -35,24 +81,65 @@ class ComparadorTextos:
         'buenas', 'comunidad'
     }
     
-    def calcular_similitud_completa(self, texto1: str, texto2: str, incluir_detalle: bool = False) -> Tuple[float, dict]:
-        """Calculate similarity using multiple algorithms"""
+    # Tables pre-normalized once so comparisons match folded/stemmed tokens
+    _STOP_WORDS_NORM = frozenset(plegar_acentos(p) for p in STOP_WORDS)
+    _KEYWORDS_NORM = frozenset(raiz_palabra(plegar_acentos(p)) for p in KEYWORDS_IMPORTANTES)
+    
+    # Weights of each metric in similitud_total
+    PESOS = {
+        'keywords': 0.50,
+        'secuencia': 0.10,
+        'ngramas': 0.20,
+        'jaccard': 0.10,
+        'importantes': 0.10
+    }
+    
+    _PATRON_PUNTUACION = re.compile(r'[^\w\s]')
+    _PATRON_ESPACIOS = re.compile(r'\s+')
+    
+    def calcular_similitud_completa(
+        self,
+        texto1: str,
+        texto2: str,
+        incluir_detalle: bool = False,
+        plazo: Optional[Plazo] = None,
+        cronometro: Optional[Cronometro] = None
+    ) -> Tuple[float, dict]:
+        """
+        Calculate similarity using multiple algorithms.
+        
+        With a cronometro, each metric is timed as 'similitud.<metric>'.
+        
+        Raises:
+            PlazoVencido: If the deadline passes before one of the metrics
+        """
+        plazo = plazo or SIN_PLAZO
+        cronometro = cronometro or Cronometro()
         
-        texto1_norm = self._normalizar_texto(texto1)
-        texto2_norm = self._normalizar_texto(texto2)
+        with cronometro.medir('similitud.normalizacion'):
+            texto1_norm = self._normalizar_texto(texto1)
+            texto2_norm = self._normalizar_texto(texto2)
         
-        sim_keywords, keywords_comunes = self._similitud_keywords(texto1_norm, texto2_norm)
-        sim_secuencia = self._similitud_secuencia(texto1_norm, texto2_norm)
-        sim_ngramas = self._similitud_ngramas(texto1_norm, texto2_norm, n=2)
-        sim_jaccard = self._similitud_jaccard(texto1_norm, texto2_norm)
-        boost_importantes = self._boost_keywords_importantes(texto1_norm, texto2_norm)
+        with cronometro.medir('similitud.keywords'):
+            sim_keywords, keywords_comunes = self._similitud_keywords(texto1_norm, texto2_norm)
+        plazo.verificar('similitud')
+        with cronometro.medir('similitud.secuencia'):
+            sim_secuencia = self._similitud_secuencia(texto1_norm, texto2_norm)
+        plazo.verificar('similitud')
+        with cronometro.medir('similitud.ngramas'):
+            sim_ngramas = self._similitud_ngramas(texto1_norm, texto2_norm, n=2)
+        plazo.verificar('similitud')
+        with cronometro.medir('similitud.jaccard'):
+            sim_jaccard = self._similitud_jaccard(texto1_norm, texto2_norm)
+        with cronometro.medir('similitud.importantes'):
+            boost_importantes = self._boost_keywords_importantes(texto1_norm, texto2_norm)
         
         similitud_total = (
-            sim_keywords * 0.50 +
-            sim_secuencia * 0.10 +
-            sim_ngramas * 0.20 +
-            sim_jaccard * 0.10 +
-            boost_importantes * 0.10
+            sim_keywords * self.PESOS['keywords'] +
+            sim_secuencia * self.PESOS['secuencia'] +
+            sim_ngramas * self.PESOS['ngramas'] +
+            sim_jaccard * self.PESOS['jaccard'] +
+            boost_importantes * self.PESOS['importantes']
         )
         
         detalle = {
@@ -68,18 +155,39 @@ class ComparadorTextos:
         
         return similitud_total, detalle
     
-    def comparar_con_contexto(self, objeto_social: str, actividades_secundarias: str, objeto_contrato: str) -> dict:
-        """Compare business object + activities vs contract object"""
+    def comparar_con_contexto(
+        self,
+        objeto_social: str,
+        actividades_secundarias: str,
+        objeto_contrato: str,
+        plazo: Optional[Plazo] = None,
+        cronometro: Optional[Cronometro] = None
+    ) -> dict:
+        """
+        Compare business object + activities vs contract object.
         
+        If the deadline passes after the business object comparison, the
+        comparison with secondary activities is skipped and the result is
+        marked 'incompleto'. Metric timings of both comparisons add up in
+        the cronometro.
+        
+        Raises:
+            PlazoVencido: If the deadline passes during the business object comparison
+        """
+        plazo = plazo or SIN_PLAZO
         texto_empresa = f"{objeto_social} {actividades_secundarias}"
         
         similitud_principal, detalle_principal = self.calcular_similitud_completa(
-            objeto_social, objeto_contrato, incluir_detalle=True
+            objeto_social, objeto_contrato, incluir_detalle=True, plazo=plazo, cronometro=cronometro
         )
         
-        similitud_completa, detalle_completa = self.calcular_similitud_completa(
-            texto_empresa, objeto_contrato, incluir_detalle=True
-        )
+        incompleto = plazo.vencido()
+        if incompleto:
+            similitud_completa, detalle_completa = similitud_principal, detalle_principal
+        else:
+            similitud_completa, detalle_completa = self.calcular_similitud_completa(
+                texto_empresa, objeto_contrato, incluir_detalle=True, plazo=plazo, cronometro=cronometro
+            )
         
         mejor_similitud = max(similitud_principal, similitud_completa)
         fuente_mejor = 'objeto_social' if similitud_principal >= similitud_completa else 'con_actividades_secundarias'
@@ -95,26 +203,170 @@ class ComparadorTextos:
             'recomendacion': self._generar_recomendacion(
                 similitud_principal, similitud_completa,
                 detalle_completa.get('keywords_comunes', set())
+            ),
+            'incompleto': incompleto
+        }
+    
+    def preparar_tokens(self, texto: str) -> List[str]:
+        """Normalized, stopword-filtered and stemmed tokens of a text"""
+        return self._extraer_palabras(self._normalizar_texto(texto))
+    
+    def buscar_top_k(
+        self,
+        objeto_social: str,
+        actividades_secundarias: str,
+        objetos_contrato: Dict[str, str],
+        k: int = 10,
+        plazo: Optional[Plazo] = None
+    ) -> dict:
+        """
+        Find the K tenders that best match a company.
+        
+        Each candidate gets an upper bound on similitud_total from the cheap
+        keyword, Jaccard and important-keyword components (sequence and
+        bigram terms are bounded by difflib's real_quick_ratio and by 1.0
+        when any keyword is shared). Candidates are visited by decreasing
+        bound and the scan stops once no remaining bound can enter the
+        current top K, so bigram and sequence metrics only run for
+        candidates that can still make it (MaxScore-style pruning).
+        
+        The deadline is checked before each candidate; on expiry the best
+        of the candidates evaluated so far are returned, with 'incompleto' set.
+        The metadata counts as 'podados' only candidates skipped by the bound
+        check, and as 'no_evaluados' those left unscanned by the deadline.
+        
+        Args:
+            objeto_social: Company business object
+            actividades_secundarias: Company secondary activities
+            objetos_contrato: Mapping of tender id to contract object
+            k: Number of results to return
+            plazo: Request deadline
+        
+        Returns:
+            dict with ranked 'resultados', 'incompleto' and pruning 'metadata'
+        """
+        inicio = time.perf_counter()
+        plazo = plazo or SIN_PLAZO
+        incompleto = False
+        
+        variantes = [self._normalizar_texto(objeto_social)]
+        if actividades_secundarias:
+            variantes.append(self._normalizar_texto(f"{objeto_social} {actividades_secundarias}"))
+        
+        candidatos = []
+        for id_aviso, objeto_contrato in objetos_contrato.items():
+            if plazo.vencido():
+                incompleto = True
+                break
+            texto_aviso = self._normalizar_texto(objeto_contrato)
+            parciales = [self._componentes_rapidos(v, texto_aviso) for v in variantes]
+            cota = max(
+                self._cota_superior(v, texto_aviso, parcial)
+                for v, parcial in zip(variantes, parciales)
             )
+            candidatos.append((cota, id_aviso, texto_aviso, parciales))
+        
+        candidatos.sort(key=lambda c: c[0], reverse=True)
+        
+        mejores = []  # min-heap of (similitud, orden, id_aviso, fuente)
+        evaluados = 0
+        podados = 0
+        for orden, (cota, id_aviso, texto_aviso, parciales) in enumerate(candidatos):
+            if k <= 0 or (len(mejores) >= k and cota <= mejores[0][0]):
+                # Sorted by bound: no remaining candidate can enter the top K
+                podados = len(candidatos) - orden
+                break
+            if plazo.vencido():
+                incompleto = True
+                break
+            
+            evaluados += 1
+            similitudes = [
+                self._similitud_desde_parcial(v, texto_aviso, parcial)
+                for v, parcial in zip(variantes, parciales)
+            ]
+            similitud = max(similitudes)
+            fuente = 'objeto_social' if similitudes[0] >= similitud else 'con_actividades_secundarias'
+            
+            entrada = (similitud, -orden, id_aviso, fuente)
+            if len(mejores) < k:
+                heapq.heappush(mejores, entrada)
+            elif similitud > mejores[0][0]:
+                heapq.heapreplace(mejores, entrada)
+        
+        resultados = [
+            {
+                'id': id_aviso,
+                'similitud': similitud,
+                'nivel': self._clasificar_similitud(similitud),
+                'fuente_mejor': fuente
+            }
+            for similitud, _, id_aviso, fuente in sorted(mejores, reverse=True)
+        ]
+        
+        total = len(objetos_contrato)
+        return {
+            'resultados': resultados,
+            'incompleto': incompleto,
+            'metadata': {
+                'candidatos': total,
+                'evaluados': evaluados,
+                'podados': podados,
+                'no_evaluados': total - evaluados - podados,
+                'tasa_poda': podados / total if total else 0.0,
+                'tiempo_ms': round((time.perf_counter() - inicio) * 1000, 3)
+            }
         }
     
+    def _componentes_rapidos(self, texto1: str, texto2: str) -> Tuple[float, bool]:
+        """Weighted sum of the cheap set-based metrics (keywords, Jaccard, important keywords)"""
+        sim_keywords, comunes = self._similitud_keywords(texto1, texto2)
+        parcial = (
+            sim_keywords * self.PESOS['keywords'] +
+            self._similitud_jaccard(texto1, texto2) * self.PESOS['jaccard'] +
+            self._boost_keywords_importantes(texto1, texto2) * self.PESOS['importantes']
+        )
+        # Bigrams can only match if at least one keyword is shared
+        return parcial, bool(comunes)
+    
+    def _cota_superior(self, texto1: str, texto2: str, parcial: Tuple[float, bool]) -> float:
+        """Upper bound on similitud_total given the cheap components"""
+        suma_rapida, hay_comunes = parcial
+        cota_secuencia = SequenceMatcher(None, texto1, texto2).real_quick_ratio()
+        cota_ngramas = 1.0 if hay_comunes else 0.0
+        return (
+            suma_rapida +
+            cota_secuencia * self.PESOS['secuencia'] +
+            cota_ngramas * self.PESOS['ngramas']
+        )
+    
+    def _similitud_desde_parcial(self, texto1: str, texto2: str, parcial: Tuple[float, bool]) -> float:
+        """Complete similitud_total by adding the sequence and bigram metrics"""
+        suma_rapida, hay_comunes = parcial
+        sim_ngramas = self._similitud_ngramas(texto1, texto2, n=2) if hay_comunes else 0.0
+        return (
+            suma_rapida +
+            self._similitud_secuencia(texto1, texto2) * self.PESOS['secuencia'] +
+            sim_ngramas * self.PESOS['ngramas']
+        )
+    
     def _normalizar_texto(self, texto: str) -> str:
         """Normalize text"""
         if not texto:
             return ""
-        texto = texto.lower()
-        texto = re.sub(r'[^\w\s]', ' ', texto)
-        texto = re.sub(r'\s+', ' ', texto)
+        texto = plegar_acentos(texto.lower())
+        texto = self._PATRON_PUNTUACION.sub(' ', texto)
+        texto = self._PATRON_ESPACIOS.sub(' ', texto)
         return texto.strip()
     
     def _extraer_palabras(self, texto: str, remover_stopwords: bool = True):
-        """Extract words from text"""
+        """Extract stemmed words from normalized text"""
         palabras = texto.split()
         
         if remover_stopwords:
-            palabras = [p for p in palabras if p not in self.STOP_WORDS and len(p) > 2]
+            palabras = [p for p in palabras if p not in self._STOP_WORDS_NORM and len(p) > 2]
         
-        return palabras
+        return [raiz_palabra(p) for p in palabras]
     
     def _similitud_keywords(self, texto1: str, texto2: str) -> Tuple[float, Set[str]]:
         """Calculate keyword similarity"""
@@ -170,8 +422,8 @@ class ComparadorTextos:
         palabras1 = set(self._extraer_palabras(texto1, remover_stopwords=False))
         palabras2 = set(self._extraer_palabras(texto2, remover_stopwords=False))
         
-        importantes_en_1 = palabras1.intersection(self.KEYWORDS_IMPORTANTES)
-        importantes_en_2 = palabras2.intersection(self.KEYWORDS_IMPORTANTES)
+        importantes_en_1 = palabras1.intersection(self._KEYWORDS_NORM)
+        importantes_en_2 = palabras2.intersection(self._KEYWORDS_NORM)
         
         if not importantes_en_2:
             return 0.0
@@ -0,0 +1,36 @@
+"""Per-stage timing of an analysis"""
+
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+
+class Cronometro:
+    """
+    Monotonic, high-resolution timer accumulating milliseconds per stage.
+    
+    A stage measured more than once (e.g. a similarity metric computed for
+    the business object and again with secondary activities) adds up.
+    Picklable, so a timer started in the API process can be handed to a
+    process worker (perf_counter is system-wide on a host) and its timings
+    travel back with the result.
+    """
+    
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.tiempos_ms: Dict[str, float] = {}
+    
+    @contextmanager
+    def medir(self, etapa: str) -> Iterator[None]:
+        """Time the enclosed block under the given stage name"""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.tiempos_ms[etapa] = self.tiempos_ms.get(etapa, 0.0) + (time.perf_counter() - inicio) * 1000
+    
+    def resumen(self) -> Dict[str, float]:
+        """Stage timings rounded to microseconds, plus 'total' since the timer was created"""
+        tiempos = {etapa: round(ms, 3) for etapa, ms in self.tiempos_ms.items()}
+        tiempos['total'] = round((time.perf_counter() - self.inicio) * 1000, 3)
+        return tiempos
@@ -1,13 +1,109 @@
 """Document data extraction for certificates, RUT, and notices"""
 
 import re
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, List, Optional, Tuple
 from datetime import datetime
 
+from core.plazo import Plazo, SIN_PLAZO
 
-class ExtractorCertificado:
+# Values meaning a field was not found
+_VALORES_VACIOS = (None, '', [], 'DESCONOCIDO')
+
+
+class ExtractorIncremental:
+    """Base for extractors that can stop reading a document once they have what they need"""
+    
+    # Field -> method extracting it, for every field extraer() returns;
+    # reading stops once all are found
+    CAMPOS_REQUERIDOS: Dict[str, str] = {}
+    # Fields gathered from the whole text (e.g. every requirement mentioned):
+    # never complete, so reading only stops early at PATRON_FIN_SECCION
+    CAMPOS_ACUMULATIVOS: Tuple[str, ...] = ()
+    # Required fields a later page can still change once found (status
+    # patterns are checked by priority, so a 'cancelada' after a 'vigente'
+    # wins): like CAMPOS_ACUMULATIVOS they keep reading up to PATRON_FIN_SECCION
+    CAMPOS_SENSIBLES_AL_ORDEN: Tuple[str, ...] = ()
+    # Heading after which none of the required fields are expected
+    PATRON_FIN_SECCION: Optional[str] = None
+    
+    def extraer(self, texto: str) -> Dict:
+        raise NotImplementedError
+    
+    def _normalizar_texto(self, texto: str) -> str:
+        return texto
+    
+    def extraer_incremental(self, paginas: Iterable[Tuple[int, str]], plazo: Optional[Plazo] = None) -> Dict:
+        """
+        Extract data from pages as they are decoded, stopping early.
+        
+        After each page the still missing required fields are searched in
+        that page plus the previous one (fields may span a page break), so
+        the check costs one page of work. Reading stops when every field of
+        extraer() has been found (never with CAMPOS_ACUMULATIVOS or
+        CAMPOS_SENSIBLES_AL_ORDEN), the page
+        contains PATRON_FIN_SECCION or the deadline has passed; with a lazy
+        page iterator the remaining pages are never decoded. The final data
+        is extracted from all pages read, so it matches extraer() on the
+        whole text unless a field only appears after the section boundary.
+        
+        Args:
+            paginas: (page number, text) in document order, e.g. from
+                ManejadorDocumentos.iterar_paginas
+            plazo: Request deadline, checked after each page
+            
+        Returns:
+            dict with 'datos', 'paginas_leidas' and 'parada' ('completo',
+            'fin_seccion', 'plazo' or None when every page was read)
+        """
+        plazo = plazo or SIN_PLAZO
+        leidas = []
+        pendientes = dict(self.CAMPOS_REQUERIDOS)
+        parada = None
+        anterior = ''
+        
+        for _, pagina in paginas:
+            leidas.append(pagina)
+            ventana = self._normalizar_texto(anterior + '\n' + pagina)
+            for campo, metodo in list(pendientes.items()):
+                if getattr(self, metodo)(ventana) not in _VALORES_VACIOS:
+                    del pendientes[campo]
+            anterior = pagina
+            
+            if not pendientes and not self.CAMPOS_ACUMULATIVOS and not self.CAMPOS_SENSIBLES_AL_ORDEN:
+                parada = 'completo'
+                break
+            if self.PATRON_FIN_SECCION and re.search(self.PATRON_FIN_SECCION, pagina, re.IGNORECASE):
+                parada = 'fin_seccion'
+                break
+            if plazo.vencido():
+                parada = 'plazo'
+                break
+        
+        return {
+            'datos': self.extraer('\n'.join(leidas)),
+            'paginas_leidas': len(leidas),
+            'parada': parada
+        }
+
+
+class ExtractorCertificado(ExtractorIncremental):
     """Extracts data from Chamber of Commerce Certificate"""
     
+    CAMPOS_REQUERIDOS = {
+        'nit': '_extraer_nit',
+        'razon_social': '_extraer_razon_social',
+        'objeto_social': '_extraer_objeto_social',
+        'actividades_secundarias': '_extraer_actividades_secundarias',
+        'activos': '_extraer_activos',
+        'patrimonio': '_extraer_patrimonio',
+        'fecha_expedicion': '_extraer_fecha_expedicion',
+        'representante_legal': '_extraer_representante',
+        'municipio': '_extraer_municipio',
+        'estado': '_determinar_estado'
+    }
+    CAMPOS_SENSIBLES_AL_ORDEN = ('estado',)
+    PATRON_FIN_SECCION = r'REFORMAS\s+(?:DE\s+)?ESTATUT|CERTIFICAS\s+ESPECIALES|INFORMACI[OÓ]N\s+COMPLEMENTARIA'
+    
     def extraer(self, texto: str) -> Dict:
         """Extract data from certificate text"""
         texto = self._normalizar_texto(texto)
@@ -216,9 +312,17 @@ class ExtractorCertificado:
         return None
 
 
-class ExtractorRUT:
+class ExtractorRUT(ExtractorIncremental):
     """Extracts data from RUT (Tax Registration)"""
     
+    CAMPOS_REQUERIDOS = {
+        'nit': '_extraer_nit',
+        'razon_social': '_extraer_razon_social',
+        'actividad_economica': '_extraer_actividad',
+        'estado': '_determinar_estado'
+    }
+    CAMPOS_SENSIBLES_AL_ORDEN = ('estado',)
+    
     def extraer(self, texto: str) -> Dict:
         """Extract data from RUT text"""
         return {
@@ -263,9 +367,20 @@ class ExtractorRUT:
         return 'DESCONOCIDO'
 
 
-class ExtractorAviso:
+class ExtractorAviso(ExtractorIncremental):
     """Extracts data from tender notice"""
     
+    CAMPOS_REQUERIDOS = {
+        'numero_proceso': '_extraer_numero_proceso',
+        'entidad': '_extraer_entidad',
+        'objeto_contrato': '_extraer_objeto',
+        'descripcion': '_extraer_descripcion',
+        'valor_estimado': '_extraer_valor',
+        'plazo': '_extraer_plazo'
+    }
+    CAMPOS_ACUMULATIVOS = ('requisitos_mencionados',)
+    PATRON_FIN_SECCION = r'CRONOGRAMA\s+DEL\s+PROCESO|MINUTA\s+DEL\s+CONTRATO|ANEXOS?\s+T[EÉ]CNICOS?'
+    
     def extraer(self, texto: str) -> Dict:
         """Extract data from tender notice text"""
         return {
@@ -0,0 +1,58 @@
+"""Cooperative request deadlines checked between units of analysis work"""
+
+import time
+from typing import Callable, Optional
+
+
+class PlazoVencido(Exception):
+    """Raised by Plazo.verificar once the deadline has passed"""
+    
+    def __init__(self, etapa: str):
+        super().__init__(f"Deadline exceeded before {etapa}")
+        self.etapa = etapa
+
+
+class Plazo:
+    """
+    Deadline of one request.
+    
+    Nothing is interrupted mid-operation: each stage checks the deadline
+    between its units of work (a page, a candidate, a similarity metric)
+    and stops there, so an expired request stops using CPU instead of
+    running every remaining stage for a client that gave up.
+    
+    Based on time.monotonic, which is shared by the processes of one host,
+    so a Plazo can be pickled into process pool workers.
+    """
+    
+    def __init__(self, segundos: Optional[float] = None, reloj: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            segundos: Time budget from now (None = never expires)
+            reloj: Time source (monotonic seconds)
+        """
+        self._reloj = reloj
+        self.vence_en = None if segundos is None else reloj() + segundos
+    
+    def restante(self) -> Optional[float]:
+        """Seconds left (never negative), or None without a deadline"""
+        if self.vence_en is None:
+            return None
+        return max(0.0, self.vence_en - self._reloj())
+    
+    def vencido(self) -> bool:
+        return self.vence_en is not None and self._reloj() >= self.vence_en
+    
+    def verificar(self, etapa: str) -> None:
+        """
+        Check the deadline before starting a unit of work.
+        
+        Raises:
+            PlazoVencido: If the deadline has passed, naming the stage not started
+        """
+        if self.vencido():
+            raise PlazoVencido(etapa)
+
+
+# Default for callers that do not set a deadline
+SIN_PLAZO = Plazo()
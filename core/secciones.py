@@ -0,0 +1,75 @@
+"""Section indexing of documents streamed page by page"""
+
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Section headings per document type
+PATRONES_SECCIONES: Dict[str, Dict[str, str]] = {
+    'certificado': {
+        'objeto_social': r'OBJETO\s+SOCIAL',
+        'capital': r'\bCAPITAL\s+(?:AUTORIZADO|SUSCRITO|PAGADO)',
+        'representacion_legal': r'REPRESENTACI[OÓ]N\s+LEGAL|REPRESENTANTE\s+LEGAL',
+        'nombramientos': r'NOMBRAMIENTOS',
+        'reformas': r'REFORMAS\s+(?:DE\s+)?ESTATUT',
+        'informacion_financiera': r'INFORMACI[OÓ]N\s+FINANCIERA',
+    },
+    'rut': {
+        'identificacion': r'IDENTIFICACI[OÓ]N',
+        'ubicacion': r'UBICACI[OÓ]N',
+        'clasificacion': r'CLASIFICACI[OÓ]N|ACTIVIDAD\s+ECON[OÓ]MICA',
+        'responsabilidades': r'RESPONSABILIDADES',
+    },
+    'aviso': {
+        'objeto': r'OBJETO\s+(?:DEL?\s+CONTRAT|DE\s+LA\s+CONTRATACI)',
+        'valor': r'(?:PRESUPUESTO|VALOR)\s+(?:OFICIAL|ESTIMADO)',
+        'plazo': r'PLAZO\s+DE\s+EJECUCI[OÓ]N',
+        'requisitos_habilitantes': r'REQUISITOS\s+HABILITANTES',
+        'cronograma': r'CRONOGRAMA',
+        'anexos': r'ANEXOS?\s+T[EÉ]CNICOS?',
+    },
+}
+
+
+class IndexadorSecciones:
+    """
+    Maps section headings to the pages where they appear.
+    
+    Works on a (page number, text) stream and keeps only the index, never
+    the pages, so memory does not grow with the document.
+    """
+    
+    def __init__(self, tipo: Optional[str] = None, patrones: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            tipo: Document type with predefined headings ('certificado', 'rut', 'aviso')
+            patrones: Custom section name -> heading regex (overrides tipo)
+        """
+        if patrones is None:
+            patrones = PATRONES_SECCIONES.get(tipo, {})
+        self._patrones = {
+            nombre: re.compile(patron, re.IGNORECASE) for nombre, patron in patrones.items()
+        }
+        self.secciones: Dict[str, List[int]] = {}
+    
+    def agregar(self, numero: int, texto: str) -> None:
+        """Index one page"""
+        for nombre, patron in self._patrones.items():
+            if patron.search(texto):
+                self.secciones.setdefault(nombre, []).append(numero)
+    
+    def observar(self, paginas: Iterable[Tuple[int, str]]) -> Iterator[Tuple[int, str]]:
+        """Index pages while passing them through to another consumer"""
+        for numero, texto in paginas:
+            self.agregar(numero, texto)
+            yield numero, texto
+    
+    def indexar(self, paginas: Iterable[Tuple[int, str]]) -> Dict[str, List[int]]:
+        """
+        Index a whole page stream.
+        
+        Returns:
+            Section name -> page numbers (0-based) where its heading appears
+        """
+        for numero, texto in paginas:
+            self.agregar(numero, texto)
+        return self.secciones
@@ -1,14 +1,36 @@
 """Document validation and scoring"""
 
 from typing import Tuple, List, Optional, Dict
-from datetime import datetime
+from datetime import datetime, timedelta
+
+
+# Certificates older than this many days raise a renewal alert
+DIAS_VIGENCIA_CERTIFICADO = 90
+
+
+def parsear_fecha_expedicion(fecha_exp) -> Optional[datetime]:
+    """Parse a DD/MM/YYYY expedition date as returned by ExtractorCertificado"""
+    if not isinstance(fecha_exp, str):
+        return None
+    try:
+        partes = fecha_exp.split('/')
+        if len(partes) == 3:
+            dia, mes, anio = int(partes[0]), int(partes[1]), int(partes[2])
+            return datetime(anio, mes, dia)
+    except (ValueError, TypeError):
+        pass
+    return None
 
 
 class ValidadorEstructural:
     """Validates structural completeness of documents"""
     
-    def validar_certificado(self, datos_cert: Dict) -> Tuple[int, List[str]]:
-        """Validate certificate data completeness"""
+    def validar_certificado(
+        self,
+        datos_cert: Dict,
+        fecha_referencia: Optional[datetime] = None
+    ) -> Tuple[int, List[str]]:
+        """Validate certificate data completeness (date rules evaluated at fecha_referencia, default now)"""
         puntos = 0
         alertas = []
         
@@ -41,18 +63,11 @@ class ValidadorEstructural:
         if fecha_exp:
             puntos += 5
             # Check if expired (more than 90 days)
-            try:
-                if isinstance(fecha_exp, str):
-                    # Try to parse date
-                    partes = fecha_exp.split('/')
-                    if len(partes) == 3:
-                        dia, mes, anio = int(partes[0]), int(partes[1]), int(partes[2])
-                        fecha_dt = datetime(anio, mes, dia)
-                        dias_desde = (datetime.now() - fecha_dt).days
-                        if dias_desde > 90:
-                            alertas.append(f"Certificado muy antiguo ({dias_desde} días). Renovar.")
-            except:
-                pass
+            fecha_dt = parsear_fecha_expedicion(fecha_exp)
+            if fecha_dt:
+                dias_desde = ((fecha_referencia or datetime.now()) - fecha_dt).days
+                if dias_desde > DIAS_VIGENCIA_CERTIFICADO:
+                    alertas.append(f"Certificado muy antiguo ({dias_desde} días). Renovar.")
         else:
             alertas.append("No se pudo verificar fecha de expedición")
         
@@ -71,6 +86,34 @@ class ValidadorEstructural:
         
         return puntos, alertas
     
+    def proximo_cambio_certificado(
+        self,
+        datos_cert: Dict,
+        fecha_referencia: Optional[datetime] = None
+    ) -> Optional[datetime]:
+        """
+        Next instant at which validar_certificado would return a different result.
+        
+        Before the validity window ends, that is the day the certificate
+        turns too old; afterwards the alert reports the age in days, so it
+        changes at every day boundary.
+        
+        Args:
+            datos_cert: Extracted certificate data
+            fecha_referencia: Evaluation instant (default now)
+            
+        Returns:
+            datetime of the next change, or None if the result has no date dependency
+        """
+        fecha_dt = parsear_fecha_expedicion(datos_cert.get('fecha_expedicion'))
+        if not fecha_dt:
+            return None
+        
+        dias_desde = ((fecha_referencia or datetime.now()) - fecha_dt).days
+        if dias_desde <= DIAS_VIGENCIA_CERTIFICADO:
+            return fecha_dt + timedelta(days=DIAS_VIGENCIA_CERTIFICADO + 1)
+        return fecha_dt + timedelta(days=dias_desde + 1)
+    
     def validar_rut(self, datos_rut: Dict) -> Tuple[int, List[str]]:
         """Validate RUT data completeness"""
         puntos = 0
@@ -0,0 +1,144 @@
+"""Stored responses for Idempotency-Key retries (memory LRU + SQLite)"""
+
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, NamedTuple, Optional
+
+
+RUTA_POR_DEFECTO = Path(__file__).parent / "idempotencia.db"
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS respuestas (
+    clave TEXT PRIMARY KEY,
+    huella TEXT NOT NULL,
+    estado_http INTEGER NOT NULL,
+    tipo_contenido TEXT,
+    cuerpo BLOB NOT NULL,
+    creado_en REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_respuestas_creado_en ON respuestas (creado_en);
+"""
+
+
+class RespuestaGuardada(NamedTuple):
+    """Response stored for an idempotency key"""
+    huella: str
+    estado_http: int
+    tipo_contenido: Optional[str]
+    cuerpo: bytes
+
+
+class AlmacenIdempotencia:
+    """
+    Bounded store of responses by idempotency key.
+    
+    Recent responses are served from an in-memory LRU; every response is
+    also written to SQLite so retries still replay after a restart or when
+    they reach another worker process. Entries expire after the TTL and the
+    table is trimmed to max_entradas_disco, oldest first.
+    """
+    
+    def __init__(
+        self,
+        ruta=RUTA_POR_DEFECTO,
+        ttl: float = 24 * 3600,
+        max_entradas_memoria: int = 1000,
+        max_entradas_disco: int = 100_000,
+        reloj: Callable[[], float] = time.time
+    ):
+        """
+        Args:
+            ruta: Database path (':memory:' for tests)
+            ttl: Seconds a stored response can be replayed
+            max_entradas_memoria: Responses kept in the in-memory LRU
+            max_entradas_disco: Responses kept in SQLite
+            reloj: Time source (unix seconds)
+        """
+        self.ruta = str(ruta)
+        self.ttl = ttl
+        self.max_entradas_memoria = max_entradas_memoria
+        self.max_entradas_disco = max_entradas_disco
+        self._reloj = reloj
+        self._memoria: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conexion = sqlite3.connect(self.ruta, check_same_thread=False)
+        if self.ruta != ':memory:':
+            self._conexion.execute("PRAGMA journal_mode=WAL")
+        self._conexion.executescript(_ESQUEMA)
+        self.aciertos_memoria = 0
+        self.aciertos_disco = 0
+        self.fallos = 0
+        self.guardadas = 0
+    
+    def obtener(self, clave: str) -> Optional[RespuestaGuardada]:
+        """Get the stored response for a key, if it has not expired"""
+        limite = self._reloj() - self.ttl
+        with self._lock:
+            entrada = self._memoria.get(clave)
+            if entrada is not None:
+                creado_en, respuesta = entrada
+                if creado_en >= limite:
+                    self._memoria.move_to_end(clave)
+                    self.aciertos_memoria += 1
+                    return respuesta
+                del self._memoria[clave]
+            
+            fila = self._conexion.execute(
+                "SELECT huella, estado_http, tipo_contenido, cuerpo, creado_en FROM respuestas "
+                "WHERE clave = ? AND creado_en >= ?",
+                (clave, limite)
+            ).fetchone()
+            if fila is None:
+                self.fallos += 1
+                return None
+            respuesta = RespuestaGuardada(fila[0], fila[1], fila[2], bytes(fila[3]))
+            self._recordar(clave, fila[4], respuesta)
+            self.aciertos_disco += 1
+            return respuesta
+    
+    def guardar(self, clave: str, respuesta: RespuestaGuardada) -> None:
+        """Store a response, dropping expired and excess entries"""
+        ahora = self._reloj()
+        with self._lock:
+            self._recordar(clave, ahora, respuesta)
+            with self._conexion:
+                self._conexion.execute(
+                    "INSERT OR REPLACE INTO respuestas "
+                    "(clave, huella, estado_http, tipo_contenido, cuerpo, creado_en) VALUES (?, ?, ?, ?, ?, ?)",
+                    (clave, respuesta.huella, respuesta.estado_http, respuesta.tipo_contenido,
+                     respuesta.cuerpo, ahora)
+                )
+                self._conexion.execute(
+                    "DELETE FROM respuestas WHERE creado_en < ?", (ahora - self.ttl,)
+                )
+                self._conexion.execute(
+                    "DELETE FROM respuestas WHERE clave IN ("
+                    "SELECT clave FROM respuestas ORDER BY creado_en DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entradas_disco,)
+                )
+            self.guardadas += 1
+    
+    def _recordar(self, clave: str, creado_en: float, respuesta: RespuestaGuardada) -> None:
+        """Put a response in the memory LRU (lock held)"""
+        self._memoria[clave] = (creado_en, respuesta)
+        self._memoria.move_to_end(clave)
+        while len(self._memoria) > self.max_entradas_memoria:
+            self._memoria.popitem(last=False)
+    
+    def estadisticas(self) -> Dict:
+        """Replay hits by tier, misses and stored responses"""
+        return {
+            'aciertos_memoria': self.aciertos_memoria,
+            'aciertos_disco': self.aciertos_disco,
+            'fallos': self.fallos,
+            'guardadas': self.guardadas,
+            'entradas_memoria': len(self._memoria)
+        }
+    
+    def cerrar(self) -> None:
+        """Close the underlying connection"""
+        with self._lock:
+            self._conexion.close()
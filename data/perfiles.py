@@ -0,0 +1,192 @@
+"""Persistent company profile store keyed by NIT (SQLite)"""
+
+import json
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from core.validador import DIAS_VIGENCIA_CERTIFICADO, parsear_fecha_expedicion
+
+
+RUTA_POR_DEFECTO = Path(__file__).parent / "perfiles.db"
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS perfiles (
+    nit TEXT PRIMARY KEY,
+    razon_social TEXT,
+    datos_cert TEXT NOT NULL,
+    datos_rut TEXT NOT NULL,
+    tokens_similitud TEXT NOT NULL,
+    puntos_estructura INTEGER NOT NULL,
+    alertas_estructura TEXT NOT NULL,
+    hash_certificado TEXT,
+    hash_rut TEXT,
+    fecha_expedicion TEXT,
+    actualizado_en TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_perfiles_fecha_expedicion ON perfiles (fecha_expedicion);
+CREATE INDEX IF NOT EXISTS idx_perfiles_hash_certificado ON perfiles (hash_certificado);
+"""
+
+_COLUMNAS = (
+    'nit', 'razon_social', 'datos_cert', 'datos_rut', 'tokens_similitud',
+    'puntos_estructura', 'alertas_estructura', 'hash_certificado', 'hash_rut',
+    'fecha_expedicion', 'actualizado_en'
+)
+
+_UPSERT = f"""
+INSERT INTO perfiles ({', '.join(_COLUMNAS)})
+VALUES ({', '.join('?' for _ in _COLUMNAS)})
+ON CONFLICT(nit) DO UPDATE SET
+    {', '.join(f'{c} = excluded.{c}' for c in _COLUMNAS if c != 'nit')}
+"""
+
+_COLUMNAS_JSON = ('datos_cert', 'datos_rut', 'tokens_similitud', 'alertas_estructura')
+
+
+def construir_perfil(
+    empresa: Dict,
+    tokens_similitud: Dict[str, List[str]],
+    hash_certificado: Optional[str] = None,
+    hash_rut: Optional[str] = None
+) -> Optional[Dict]:
+    """
+    Build a storable profile from DemoEngine.preparar_empresa output.
+    
+    Args:
+        empresa: Prepared company (datos_cert, datos_rut, points, alerts)
+        tokens_similitud: Prepared similarity tokens per company text
+        hash_certificado: Content hash of the certificate document
+        hash_rut: Content hash of the RUT document
+        
+    Returns:
+        Profile dict, or None if no NIT could be extracted
+    """
+    datos_cert = empresa['datos_cert']
+    datos_rut = empresa['datos_rut']
+    nit = datos_cert.get('nit') or datos_rut.get('nit')
+    if not nit:
+        return None
+    
+    return {
+        'nit': nit,
+        'razon_social': datos_cert.get('razon_social') or datos_rut.get('razon_social'),
+        'datos_cert': datos_cert,
+        'datos_rut': datos_rut,
+        'tokens_similitud': tokens_similitud,
+        'puntos_estructura': empresa['puntos_estructura'],
+        'alertas_estructura': empresa['alertas_estructura'],
+        'hash_certificado': hash_certificado,
+        'hash_rut': hash_rut,
+    }
+
+
+class AlmacenPerfiles:
+    """SQLite-backed company profile store"""
+    
+    def __init__(self, ruta=RUTA_POR_DEFECTO):
+        self.ruta = str(ruta)
+        self._lock = threading.Lock()
+        self._conexion = sqlite3.connect(self.ruta, check_same_thread=False)
+        self._conexion.row_factory = sqlite3.Row
+        if self.ruta != ':memory:':
+            self._conexion.execute("PRAGMA journal_mode=WAL")
+        self._conexion.executescript(_ESQUEMA)
+    
+    def guardar(self, perfil: Dict) -> None:
+        """Insert or update one profile"""
+        self.guardar_varios([perfil])
+    
+    def guardar_varios(self, perfiles: Iterable[Dict]) -> int:
+        """
+        Bulk upsert profiles in a single transaction.
+        
+        Args:
+            perfiles: Profiles as returned by construir_perfil
+            
+        Returns:
+            Number of profiles written
+        """
+        ahora = datetime.now().isoformat()
+        filas = [self._a_fila(perfil, ahora) for perfil in perfiles if perfil]
+        with self._lock, self._conexion:
+            self._conexion.executemany(_UPSERT, filas)
+        return len(filas)
+    
+    def obtener(self, nit: str) -> Optional[Dict]:
+        """Get a profile by NIT"""
+        with self._lock:
+            fila = self._conexion.execute(
+                "SELECT * FROM perfiles WHERE nit = ?", (nit,)
+            ).fetchone()
+        return self._de_fila(fila) if fila else None
+    
+    def obtener_por_hash(self, hash_certificado: str) -> Optional[Dict]:
+        """Get the profile built from a given certificate document"""
+        with self._lock:
+            fila = self._conexion.execute(
+                "SELECT * FROM perfiles WHERE hash_certificado = ?", (hash_certificado,)
+            ).fetchone()
+        return self._de_fila(fila) if fila else None
+    
+    def eliminar(self, nit: str) -> bool:
+        """Delete a profile by NIT"""
+        with self._lock, self._conexion:
+            cursor = self._conexion.execute("DELETE FROM perfiles WHERE nit = ?", (nit,))
+        return cursor.rowcount > 0
+    
+    def nits_vencidos(
+        self,
+        dias: int = DIAS_VIGENCIA_CERTIFICADO,
+        referencia: Optional[datetime] = None
+    ) -> List[str]:
+        """
+        NITs whose certificate is older than the freshness window.
+        
+        Profiles without a known expedition date are included, since their
+        freshness cannot be verified.
+        """
+        referencia = referencia or datetime.now()
+        limite = (referencia - timedelta(days=dias)).date().isoformat()
+        with self._lock:
+            filas = self._conexion.execute(
+                "SELECT nit FROM perfiles WHERE fecha_expedicion IS NULL OR fecha_expedicion < ?",
+                (limite,)
+            ).fetchall()
+        return [fila['nit'] for fila in filas]
+    
+    def cerrar(self) -> None:
+        """Close the underlying connection"""
+        with self._lock:
+            self._conexion.close()
+    
+    @staticmethod
+    def es_vigente(
+        perfil: Dict,
+        dias: int = DIAS_VIGENCIA_CERTIFICADO,
+        referencia: Optional[datetime] = None
+    ) -> bool:
+        """Check whether the profile's certificate is within the freshness window"""
+        if not perfil.get('fecha_expedicion'):
+            return False
+        fecha = datetime.fromisoformat(perfil['fecha_expedicion'])
+        return ((referencia or datetime.now()) - fecha).days <= dias
+    
+    def _a_fila(self, perfil: Dict, ahora: str) -> tuple:
+        """Serialize a profile to a table row"""
+        fecha = parsear_fecha_expedicion(perfil['datos_cert'].get('fecha_expedicion'))
+        valores = dict(perfil)
+        valores['fecha_expedicion'] = fecha.date().isoformat() if fecha else None
+        valores['actualizado_en'] = ahora
+        for columna in _COLUMNAS_JSON:
+            valores[columna] = json.dumps(valores[columna], ensure_ascii=False)
+        return tuple(valores.get(columna) for columna in _COLUMNAS)
+    
+    def _de_fila(self, fila: sqlite3.Row) -> Dict:
+        """Deserialize a table row to a profile"""
+        perfil = dict(fila)
+        for columna in _COLUMNAS_JSON:
+            perfil[columna] = json.loads(perfil[columna])
+        return perfil
@@ -0,0 +1,287 @@
+"""Durable analysis job queue (SQLite)"""
+
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+
+RUTA_POR_DEFECTO = Path(__file__).parent / "trabajos.db"
+
+# Job states
+PENDIENTE = 'pendiente'
+EN_PROCESO = 'en_proceso'
+COMPLETADO = 'completado'
+FALLIDO = 'fallido'
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS trabajos (
+    id TEXT PRIMARY KEY,
+    tipo TEXT NOT NULL,
+    prioridad INTEGER NOT NULL,
+    estado TEXT NOT NULL,
+    parametros TEXT NOT NULL,
+    resultado TEXT,
+    error TEXT,
+    codigo_error INTEGER,
+    intentos INTEGER NOT NULL DEFAULT 0,
+    creado_en REAL NOT NULL,
+    iniciado_en REAL,
+    terminado_en REAL,
+    vence_en REAL
+);
+CREATE INDEX IF NOT EXISTS idx_trabajos_cola ON trabajos (estado, prioridad DESC, creado_en);
+CREATE INDEX IF NOT EXISTS idx_trabajos_terminado_en ON trabajos (terminado_en);
+"""
+
+# Highest priority first, FIFO within a priority; expired leases are jobs
+# whose worker died (crash or restart) and are claimed again
+_TOMAR = """
+UPDATE trabajos
+SET estado = 'en_proceso', iniciado_en = :ahora, vence_en = :vence_en, intentos = intentos + 1
+WHERE id = (
+    SELECT id FROM trabajos
+    WHERE estado = 'pendiente'
+       OR (estado = 'en_proceso' AND vence_en < :ahora AND intentos < :max_intentos)
+    ORDER BY prioridad DESC, creado_en
+    LIMIT 1
+)
+RETURNING *
+"""
+
+_COLUMNAS_JSON = ('parametros', 'resultado')
+
+
+class ColaTrabajos:
+    """
+    SQLite-backed priority queue of analysis jobs.
+    
+    Claims are leases: a job taken by a worker that never finishes it
+    (process killed, server restarted) becomes claimable again once the
+    lease expires, up to max_intentos attempts. Workers renew the lease
+    while the job runs, so long jobs are not claimed twice.
+    """
+    
+    def __init__(
+        self,
+        ruta=RUTA_POR_DEFECTO,
+        duracion_reserva: float = 900,
+        max_intentos: int = 3,
+        reloj: Callable[[], float] = time.time
+    ):
+        """
+        Args:
+            ruta: Database path (':memory:' for tests)
+            duracion_reserva: Seconds a claimed job stays reserved to its worker
+            max_intentos: Claims allowed before an abandoned job is marked failed
+            reloj: Time source (unix seconds)
+        """
+        self.ruta = str(ruta)
+        self.duracion_reserva = duracion_reserva
+        self.max_intentos = max_intentos
+        self._reloj = reloj
+        self._lock = threading.Lock()
+        self._conexion = sqlite3.connect(self.ruta, check_same_thread=False)
+        self._conexion.row_factory = sqlite3.Row
+        if self.ruta != ':memory:':
+            self._conexion.execute("PRAGMA journal_mode=WAL")
+        self._conexion.executescript(_ESQUEMA)
+    
+    def encolar(
+        self,
+        tipo: str,
+        parametros: Dict,
+        prioridad: int = 0,
+        id_trabajo: Optional[str] = None
+    ) -> str:
+        """
+        Add a pending job.
+        
+        Args:
+            tipo: Job type, used by the worker to dispatch it
+            parametros: JSON-serializable job inputs
+            prioridad: Higher runs first
+            id_trabajo: Job id (default a new UUID)
+            
+        Returns:
+            Job id
+        """
+        id_trabajo = id_trabajo or uuid.uuid4().hex
+        with self._lock, self._conexion:
+            self._conexion.execute(
+                "INSERT INTO trabajos (id, tipo, prioridad, estado, parametros, creado_en) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (id_trabajo, tipo, prioridad, PENDIENTE,
+                 json.dumps(parametros, ensure_ascii=False), self._reloj())
+            )
+        return id_trabajo
+    
+    def tomar(self) -> Optional[Dict]:
+        """
+        Claim the next job for this worker.
+        
+        Returns:
+            The claimed job (state en_proceso), or None if the queue is empty
+        """
+        ahora = self._reloj()
+        with self._lock, self._conexion:
+            # Abandoned jobs out of attempts will never be claimed again
+            self._conexion.execute(
+                "UPDATE trabajos SET estado = ?, error = ?, terminado_en = ? "
+                "WHERE estado = ? AND vence_en < ? AND intentos >= ?",
+                (FALLIDO, "Job abandoned after maximum attempts", ahora,
+                 EN_PROCESO, ahora, self.max_intentos)
+            )
+            filas = self._conexion.execute(_TOMAR, {
+                'ahora': ahora,
+                'vence_en': ahora + self.duracion_reserva,
+                'max_intentos': self.max_intentos
+            }).fetchall()
+        return self._de_fila(filas[0]) if filas else None
+    
+    def renovar(self, id_trabajo: str) -> bool:
+        """
+        Extend the lease of a running job by duracion_reserva from now.
+        
+        Returns:
+            False if the job is no longer running (finished, released or purged)
+        """
+        with self._lock, self._conexion:
+            cursor = self._conexion.execute(
+                "UPDATE trabajos SET vence_en = ? WHERE id = ? AND estado = ?",
+                (self._reloj() + self.duracion_reserva, id_trabajo, EN_PROCESO)
+            )
+        return cursor.rowcount > 0
+    
+    def completar(self, id_trabajo: str, resultado: Dict) -> None:
+        """Store the result of a claimed job"""
+        with self._lock, self._conexion:
+            self._conexion.execute(
+                "UPDATE trabajos SET estado = ?, resultado = ?, terminado_en = ?, vence_en = NULL "
+                "WHERE id = ?",
+                (COMPLETADO, json.dumps(resultado, ensure_ascii=False, default=str),
+                 self._reloj(), id_trabajo)
+            )
+    
+    def fallar(self, id_trabajo: str, error: str, codigo_error: int = 500) -> None:
+        """Mark a claimed job as failed"""
+        with self._lock, self._conexion:
+            self._conexion.execute(
+                "UPDATE trabajos SET estado = ?, error = ?, codigo_error = ?, terminado_en = ?, "
+                "vence_en = NULL WHERE id = ?",
+                (FALLIDO, error, codigo_error, self._reloj(), id_trabajo)
+            )
+    
+    def liberar(self, id_trabajo: str) -> None:
+        """Return an interrupted job (e.g. on shutdown) to the queue without spending an attempt"""
+        with self._lock, self._conexion:
+            self._conexion.execute(
+                "UPDATE trabajos SET estado = ?, vence_en = NULL, intentos = MAX(intentos - 1, 0) "
+                "WHERE id = ? AND estado = ?",
+                (PENDIENTE, id_trabajo, EN_PROCESO)
+            )
+    
+    def obtener(self, id_trabajo: str) -> Optional[Dict]:
+        """Get a job by id"""
+        with self._lock:
+            fila = self._conexion.execute(
+                "SELECT * FROM trabajos WHERE id = ?", (id_trabajo,)
+            ).fetchone()
+        return self._de_fila(fila) if fila else None
+    
+    def posicion(self, id_trabajo: str) -> Optional[int]:
+        """Pending jobs that run before this one (None if it is not pending)"""
+        with self._lock:
+            trabajo = self._conexion.execute(
+                "SELECT prioridad, creado_en FROM trabajos WHERE id = ? AND estado = ?",
+                (id_trabajo, PENDIENTE)
+            ).fetchone()
+            if trabajo is None:
+                return None
+            return self._conexion.execute(
+                "SELECT COUNT(*) FROM trabajos WHERE estado = ? AND "
+                "(prioridad > ? OR (prioridad = ? AND creado_en < ?))",
+                (PENDIENTE, trabajo['prioridad'], trabajo['prioridad'], trabajo['creado_en'])
+            ).fetchone()[0]
+    
+    def purgar(self, antiguedad: float) -> List[str]:
+        """
+        Delete finished jobs older than the retention window.
+        
+        Args:
+            antiguedad: Seconds a finished job (and its result) is kept
+            
+        Returns:
+            Ids of the deleted jobs
+        """
+        limite = self._reloj() - antiguedad
+        with self._lock, self._conexion:
+            filas = self._conexion.execute(
+                "DELETE FROM trabajos WHERE estado IN (?, ?) AND terminado_en < ? RETURNING id",
+                (COMPLETADO, FALLIDO, limite)
+            ).fetchall()
+        return [fila['id'] for fila in filas]
+    
+    def ids(self) -> List[str]:
+        """Ids of every stored job"""
+        with self._lock:
+            filas = self._conexion.execute("SELECT id FROM trabajos").fetchall()
+        return [fila['id'] for fila in filas]
+    
+    def estadisticas(self, ventana: float = 300) -> Dict:
+        """
+        Queue depth, throughput and latency.
+        
+        Args:
+            ventana: Seconds of finished jobs used for throughput and latency
+            
+        Returns:
+            dict with jobs per state, pending jobs per priority, jobs finished
+            per minute, and mean/max queue wait and run time in the window (ms)
+        """
+        desde = self._reloj() - ventana
+        with self._lock:
+            por_estado = dict(self._conexion.execute(
+                "SELECT estado, COUNT(*) FROM trabajos GROUP BY estado"
+            ).fetchall())
+            por_prioridad = dict(self._conexion.execute(
+                "SELECT prioridad, COUNT(*) FROM trabajos WHERE estado = ? GROUP BY prioridad",
+                (PENDIENTE,)
+            ).fetchall())
+            ventana_fila = self._conexion.execute(
+                "SELECT COUNT(*), SUM(estado = ?), "
+                "AVG(iniciado_en - creado_en), MAX(iniciado_en - creado_en), "
+                "AVG(terminado_en - iniciado_en), MAX(terminado_en - iniciado_en) "
+                "FROM trabajos WHERE terminado_en >= ? AND iniciado_en IS NOT NULL",
+                (FALLIDO, desde)
+            ).fetchone()
+        terminados, fallidos, espera_media, espera_max, ejecucion_media, ejecucion_max = ventana_fila
+        
+        def _ms(segundos):
+            return round(segundos * 1000, 1) if segundos is not None else None
+        
+        return {
+            'por_estado': {estado: por_estado.get(estado, 0) for estado in (PENDIENTE, EN_PROCESO, COMPLETADO, FALLIDO)},
+            'pendientes_por_prioridad': por_prioridad,
+            'ventana_segundos': ventana,
+            'terminados_por_minuto': round(terminados * 60 / ventana, 3) if ventana else None,
+            'fallidos_en_ventana': fallidos or 0,
+            'espera_cola_ms': {'media': _ms(espera_media), 'max': _ms(espera_max)},
+            'ejecucion_ms': {'media': _ms(ejecucion_media), 'max': _ms(ejecucion_max)}
+        }
+    
+    def cerrar(self) -> None:
+        """Close the underlying connection"""
+        with self._lock:
+            self._conexion.close()
+    
+    def _de_fila(self, fila: sqlite3.Row) -> Dict:
+        """Deserialize a table row to a job"""
+        trabajo = dict(fila)
+        for columna in _COLUMNAS_JSON:
+            if trabajo[columna] is not None:
+                trabajo[columna] = json.loads(trabajo[columna])
+        return trabajo
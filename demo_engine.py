@@ -3,8 +3,13 @@ Main DEMO analysis engine
 Professional version without AI
 """
 
+import logging
+import threading
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Callable, Dict, Optional
+
+from core.cronometro import Cronometro
+from core.plazo import Plazo, PlazoVencido, SIN_PLAZO
 
 # Local imports
 try:
@@ -19,6 +24,36 @@ except ImportError:
     MODULOS_COMPLETOS = False
 
 
+logger = logging.getLogger(__name__)
+
+# Progress callback: (event name, partial result) -> None
+Notificador = Callable[[str, Dict], None]
+
+
+def _sin_notificar(evento: str, datos: Dict) -> None:
+    pass
+
+# Sample documents used to warm extractors, regex caches and similarity tables
+_CERTIFICADO_MUESTRA = """
+NIT: 900123456-1
+Razón Social: EMPRESA DE MUESTRA PARA CALENTAMIENTO S.A.S. Sigla: EMC
+OBJETO SOCIAL: Prestación de servicios de consultoría, construcción de obras civiles y gestión ambiental
+CAPITAL
+ACTIVOS: $150,000,000 PATRIMONIO: $80,000,000
+Fecha expedición: 01/01/2024
+REPRESENTANTE LEGAL: PERSONA DE MUESTRA
+Estado: ACTIVA
+"""
+_RUT_MUESTRA = "NIT: 900123456 RAZON SOCIAL: EMPRESA DE MUESTRA\nACTIVIDAD ECONOMICA: 7110 Consultoría técnica\nEstado: ACTIVO"
+_AVISO_MUESTRA = """
+PROCESO: LP-0000-000
+ENTIDAD: ENTIDAD DE MUESTRA
+OBJETO DEL CONTRATO: Consultoría para la construcción de obras civiles con gestión ambiental en comunidades
+VALOR ESTIMADO: $200,000,000
+PLAZO: 6 meses
+"""
+
+
 class DemoEngine:
     """Main DEMO analysis engine"""
     
@@ -34,12 +69,20 @@ class DemoEngine:
             self.determinador_semaforo = DeterminadorSemaforo()
             self.generador_recomendaciones = GeneradorRecomendaciones()
     
+    def calentar(self) -> None:
+        """Run one analysis on sample documents to warm regex and similarity caches"""
+        self.analizar(_CERTIFICADO_MUESTRA, _RUT_MUESTRA, _AVISO_MUESTRA)
+    
     def analizar(
         self,
         certificado_texto: str,
         rut_texto: str,
         aviso_texto: str,
-        valor_proceso: Optional[float] = None
+        valor_proceso: Optional[float] = None,
+        fecha_referencia: Optional[datetime] = None,
+        notificar: Optional[Notificador] = None,
+        plazo: Optional[Plazo] = None,
+        cronometro: Optional[Cronometro] = None
     ) -> Dict:
         """
         Complete professional analysis.
@@ -49,12 +92,21 @@ class DemoEngine:
             rut_texto: RUT text
             aviso_texto: Tender notice text
             valor_proceso: Optional process value
+            fecha_referencia: Date at which date rules are evaluated (default now)
+            notificar: Called with each stage's partial result as soon as it
+                exists: 'extraccion' (per document), 'validacion_estructural',
+                'similitud', 'validacion_financiera', 'score', 'semaforo'
+            plazo: Request deadline, checked between stages; on expiry the
+                stages done so far are returned with 'incompleto' set
+            cronometro: Stage timer; stage times in milliseconds are returned
+                in metadata['tiempos_etapas_ms'] (one is created if omitted)
             
         Returns:
             Complete analysis results
         """
         
         timestamp_inicio = datetime.now()
+        cronometro = cronometro or Cronometro()
         
         if not MODULOS_COMPLETOS:
             # Fallback to basic analysis
@@ -62,65 +114,295 @@ class DemoEngine:
                 certificado_texto, rut_texto, aviso_texto, valor_proceso
             )
         
+        try:
+            empresa = self.preparar_empresa(
+                certificado_texto, rut_texto, fecha_referencia, notificar, plazo, cronometro
+            )
+        except PlazoVencido as e:
+            return self._resultado_incompleto(e.etapa, None, {}, valor_proceso, timestamp_inicio, cronometro)
+        return self.analizar_aviso(
+            empresa, aviso_texto, valor_proceso, timestamp_inicio, notificar, plazo, cronometro
+        )
+    
+    def extractor_documento(self, tipo: str):
+        """
+        Get the extractor for one document type.
+        
+        Args:
+            tipo: 'certificado', 'rut' or 'aviso'
+            
+        Returns:
+            ExtractorIncremental for the document type
+        """
+        extractores = {
+            'certificado': self.extractor_cert,
+            'rut': self.extractor_rut,
+            'aviso': self.extractor_aviso
+        }
+        if tipo not in extractores:
+            raise ValueError(f"Unknown document type: {tipo}")
+        return extractores[tipo]
+    
+    def extraer_documento(self, tipo: str, texto: str) -> Dict:
+        """
+        Extract the fields of one document.
+        
+        Args:
+            tipo: 'certificado', 'rut' or 'aviso'
+            texto: Document text
+            
+        Returns:
+            Extracted fields
+        """
+        return self.extractor_documento(tipo).extraer(texto)
+    
+    def preparar_empresa(
+        self,
+        certificado_texto: str,
+        rut_texto: str,
+        fecha_referencia: Optional[datetime] = None,
+        notificar: Optional[Notificador] = None,
+        plazo: Optional[Plazo] = None,
+        cronometro: Optional[Cronometro] = None
+    ) -> Dict:
+        """
+        Extract and validate the company documents.
+        
+        The result only depends on the certificate and RUT, so it can be
+        reused to analyze the same company against many tenders.
+        
+        Args:
+            certificado_texto: Certificate text
+            rut_texto: RUT text
+            fecha_referencia: Date at which date rules are evaluated (default now)
+            notificar: Progress callback (see analizar)
+            plazo: Request deadline, checked before each extraction
+            cronometro: Stage timer (see analizar)
+            
+        Returns:
+            Company data with structural validation points and alerts
+            
+        Raises:
+            PlazoVencido: If the deadline passes before an extraction
+        """
+        notificar = notificar or _sin_notificar
+        plazo = plazo or SIN_PLAZO
+        cronometro = cronometro or Cronometro()
+        
         # === STEP 1: DATA EXTRACTION ===
-        datos_cert = self.extractor_cert.extraer(certificado_texto)
-        datos_rut = self.extractor_rut.extraer(rut_texto)
-        datos_aviso = self.extractor_aviso.extraer(aviso_texto)
+        plazo.verificar('extraccion')
+        with cronometro.medir('extraccion_certificado'):
+            datos_cert = self.extractor_cert.extraer(certificado_texto)
+        notificar('extraccion', {'documento': 'certificado', 'datos': datos_cert})
+        plazo.verificar('extraccion')
+        with cronometro.medir('extraccion_rut'):
+            datos_rut = self.extractor_rut.extraer(rut_texto)
+        notificar('extraccion', {'documento': 'rut', 'datos': datos_rut})
         
-        # If value not provided, try to extract from notice
-        if not valor_proceso:
-            valor_proceso = datos_aviso.get('valor_estimado')
+        return self.validar_empresa(datos_cert, datos_rut, fecha_referencia, notificar, cronometro)
+    
+    def validar_empresa(
+        self,
+        datos_cert: Dict,
+        datos_rut: Dict,
+        fecha_referencia: Optional[datetime] = None,
+        notificar: Optional[Notificador] = None,
+        cronometro: Optional[Cronometro] = None
+    ) -> Dict:
+        """
+        Run structural validation on already extracted company data.
+        
+        Args:
+            datos_cert: Extracted certificate data
+            datos_rut: Extracted RUT data
+            fecha_referencia: Date at which date rules are evaluated (default now)
+            notificar: Progress callback (see analizar)
+            cronometro: Stage timer (see analizar)
+            
+        Returns:
+            Company data with structural validation points, alerts and the
+            instant until which date-based validation stays unchanged
+        """
+        cronometro = cronometro or Cronometro()
         
         # === STEP 2: STRUCTURAL VALIDATION ===
-        puntos_cert, alertas_cert = self.validador_estructural.validar_certificado(datos_cert)
-        puntos_rut, alertas_rut = self.validador_estructural.validar_rut(datos_rut)
+        with cronometro.medir('validacion_estructural'):
+            puntos_cert, alertas_cert = self.validador_estructural.validar_certificado(
+                datos_cert, fecha_referencia
+            )
+            puntos_rut, alertas_rut = self.validador_estructural.validar_rut(datos_rut)
         
-        puntos_estructura = puntos_cert + puntos_rut
-        alertas_estructura = alertas_cert + alertas_rut
+        (notificar or _sin_notificar)('validacion_estructural', {
+            'nit': datos_cert.get('nit'),
+            'razon_social': datos_cert.get('razon_social'),
+            'estado_certificado': datos_cert.get('estado'),
+            'estado_rut': datos_rut.get('estado'),
+            'puntos_estructura': puntos_cert + puntos_rut,
+            'alertas_estructura': alertas_cert + alertas_rut
+        })
         
-        # === STEP 3: SIMILARITY COMPARISON ===
-        similitud_resultado = self.comparador.comparar_con_contexto(
-            datos_cert.get('objeto_social', ''),
-            datos_cert.get('actividades_secundarias', ''),
-            datos_aviso.get('objeto_contrato', '')
+        return {
+            'datos_cert': datos_cert,
+            'datos_rut': datos_rut,
+            'puntos_estructura': puntos_cert + puntos_rut,
+            'alertas_estructura': alertas_cert + alertas_rut,
+            'vigente_hasta': self.validador_estructural.proximo_cambio_certificado(
+                datos_cert, fecha_referencia
+            )
+        }
+    
+    def analizar_aviso(
+        self,
+        empresa: Dict,
+        aviso_texto: str,
+        valor_proceso: Optional[float] = None,
+        timestamp_inicio: Optional[datetime] = None,
+        notificar: Optional[Notificador] = None,
+        plazo: Optional[Plazo] = None,
+        cronometro: Optional[Cronometro] = None
+    ) -> Dict:
+        """
+        Analyze a prepared company against one tender notice.
+        
+        Args:
+            empresa: Result of preparar_empresa / validar_empresa
+            aviso_texto: Tender notice text
+            valor_proceso: Optional process value
+            timestamp_inicio: Start time used for the processing time
+            notificar: Progress callback (see analizar)
+            plazo: Request deadline (see analizar)
+            cronometro: Stage timer (see analizar)
+            
+        Returns:
+            Complete analysis results
+        """
+        timestamp_inicio = timestamp_inicio or datetime.now()
+        plazo = plazo or SIN_PLAZO
+        cronometro = cronometro or Cronometro()
+        if plazo.vencido():
+            return self._resultado_incompleto('extraccion', empresa, {}, valor_proceso, timestamp_inicio, cronometro)
+        
+        with cronometro.medir('extraccion_aviso'):
+            datos_aviso = self.extractor_aviso.extraer(aviso_texto)
+        (notificar or _sin_notificar)('extraccion', {'documento': 'aviso', 'datos': datos_aviso})
+        
+        return self.evaluar_aviso(
+            empresa, datos_aviso, valor_proceso, timestamp_inicio, notificar, plazo, cronometro
         )
+    
+    def evaluar_aviso(
+        self,
+        empresa: Dict,
+        datos_aviso: Dict,
+        valor_proceso: Optional[float] = None,
+        timestamp_inicio: Optional[datetime] = None,
+        notificar: Optional[Notificador] = None,
+        plazo: Optional[Plazo] = None,
+        cronometro: Optional[Cronometro] = None
+    ) -> Dict:
+        """
+        Score a prepared company against already extracted tender data.
+        
+        Args:
+            empresa: Result of preparar_empresa / validar_empresa
+            datos_aviso: Extracted tender notice data
+            valor_proceso: Optional process value
+            timestamp_inicio: Start time used for the processing time
+            notificar: Progress callback (see analizar)
+            plazo: Request deadline (see analizar)
+            cronometro: Stage timer (see analizar)
+            
+        Returns:
+            Complete analysis results
+        """
+        timestamp_inicio = timestamp_inicio or datetime.now()
+        notificar = notificar or _sin_notificar
+        plazo = plazo or SIN_PLAZO
+        cronometro = cronometro or Cronometro()
+        
+        datos_cert = empresa['datos_cert']
+        datos_rut = empresa['datos_rut']
+        puntos_estructura = empresa['puntos_estructura']
+        alertas_estructura = list(empresa['alertas_estructura'])
+        
+        # If value not provided, try to extract from notice
+        if not valor_proceso:
+            valor_proceso = datos_aviso.get('valor_estimado')
+        
+        # === STEP 3: SIMILARITY COMPARISON ===
+        try:
+            plazo.verificar('similitud')
+            with cronometro.medir('similitud'):
+                similitud_resultado = self.comparador.comparar_con_contexto(
+                    datos_cert.get('objeto_social', ''),
+                    datos_cert.get('actividades_secundarias', ''),
+                    datos_aviso.get('objeto_contrato', ''),
+                    plazo=plazo,
+                    cronometro=cronometro
+                )
+        except PlazoVencido as e:
+            return self._resultado_incompleto(
+                e.etapa, empresa, datos_aviso, valor_proceso, timestamp_inicio, cronometro
+            )
         
         similitud = similitud_resultado['mejor_similitud']
         puntos_encaje = int(similitud * 40)
+        notificar('similitud', {
+            'similitud': similitud,
+            'nivel': similitud_resultado.get('nivel', 'DESCONOCIDO'),
+            'puntos_encaje': puntos_encaje
+        })
         
         # === STEP 4: FINANCIAL VALIDATION ===
-        puntos_financiero, alerta_financiera = self.validador_financiero.validar_capacidad(
-            datos_cert.get('activos'),
-            valor_proceso,
-            patrimonio=datos_cert.get('patrimonio')
-        )
+        if plazo.vencido():
+            return self._resultado_incompleto(
+                'validacion_financiera', empresa, datos_aviso, valor_proceso, timestamp_inicio,
+                cronometro, similitud_resultado
+            )
+        with cronometro.medir('validacion_financiera'):
+            puntos_financiero, alerta_financiera = self.validador_financiero.validar_capacidad(
+                datos_cert.get('activos'),
+                valor_proceso,
+                patrimonio=datos_cert.get('patrimonio')
+            )
         
         alertas_financieras = [alerta_financiera] if alerta_financiera else []
+        notificar('validacion_financiera', {
+            'valor_proceso': valor_proceso,
+            'puntos_financiero': puntos_financiero,
+            'alertas_financieras': alertas_financieras
+        })
         
         # === STEP 5: SCORE CALCULATION ===
-        score_detalle = self.calculador_score.calcular(
-            puntos_estructura,
-            puntos_encaje,
-            puntos_financiero
-        )
+        with cronometro.medir('score'):
+            score_detalle = self.calculador_score.calcular(
+                puntos_estructura,
+                puntos_encaje,
+                puntos_financiero
+            )
         
         score_total = score_detalle['score_total']
+        notificar('score', score_detalle)
         
         # === STEP 6: IDENTIFY MISSING ITEMS ===
-        faltantes = self._identificar_faltantes_simple(
-            datos_cert, datos_rut, datos_aviso, alertas_estructura
-        )
+        with cronometro.medir('faltantes'):
+            faltantes = self._identificar_faltantes_simple(
+                datos_cert, datos_rut, datos_aviso, alertas_estructura
+            )
         
         # === STEP 7: DETERMINE TRAFFIC LIGHT ===
         todas_alertas = alertas_estructura + alertas_financieras
-        semaforo = self.determinador_semaforo.determinar(
-            score_total, todas_alertas, similitud
-        )
+        with cronometro.medir('semaforo'):
+            semaforo = self.determinador_semaforo.determinar(
+                score_total, todas_alertas, similitud
+            )
         
         # === STEP 8: GENERATE RECOMMENDATION ===
-        recomendacion = self.generador_recomendaciones.generar(
-            semaforo, score_total, similitud, faltantes, todas_alertas
-        )
+        with cronometro.medir('recomendacion'):
+            recomendacion = self.generador_recomendaciones.generar(
+                semaforo, score_total, similitud, faltantes, todas_alertas
+            )
+        notificar('semaforo', {'semaforo': semaforo, 'score': score_total, 'recomendacion': recomendacion})
         
         # === RESULT ===
         timestamp_fin = datetime.now()
@@ -134,25 +416,84 @@ class DemoEngine:
             'faltantes': faltantes[:5],
             'alertas': todas_alertas,
             'score_detalle': score_detalle,
-            'analisis_similitud': {
-                'similitud_principal': similitud_resultado.get('similitud_principal', similitud),
-                'nivel': similitud_resultado.get('nivel', 'DESCONOCIDO'),
-                'recomendacion_similitud': similitud_resultado.get('recomendacion', '')
-            },
-            'datos_extraidos': {
-                'nit': datos_cert.get('nit'),
-                'razon_social': datos_cert.get('razon_social'),
-                'activos': datos_cert.get('activos'),
-                'estado_certificado': datos_cert.get('estado'),
-                'estado_rut': datos_rut.get('estado'),
-                'valor_proceso': valor_proceso
-            },
+            'analisis_similitud': self._analisis_similitud(similitud_resultado),
+            'datos_extraidos': self._datos_extraidos(datos_cert, datos_rut, valor_proceso),
+            'incompleto': False,
             'metadata': {
                 'timestamp': timestamp_fin.isoformat(),
                 'tiempo_procesamiento_segundos': round(tiempo_procesamiento, 2),
                 'version': '2.0.0',
                 'tipo_analisis': 'DEMO_PROFESIONAL',
-                'costo_tokens': 0
+                'costo_tokens': 0,
+                'vigente_hasta': empresa['vigente_hasta'].isoformat() if empresa.get('vigente_hasta') else None,
+                'tiempos_etapas_ms': cronometro.resumen()
+            }
+        }
+    
+    @staticmethod
+    def _analisis_similitud(similitud_resultado: Dict) -> Dict:
+        return {
+            'similitud_principal': similitud_resultado.get(
+                'similitud_principal', similitud_resultado['mejor_similitud']
+            ),
+            'nivel': similitud_resultado.get('nivel', 'DESCONOCIDO'),
+            'recomendacion_similitud': similitud_resultado.get('recomendacion', '')
+        }
+    
+    @staticmethod
+    def _datos_extraidos(datos_cert: Dict, datos_rut: Dict, valor_proceso: Optional[float]) -> Dict:
+        return {
+            'nit': datos_cert.get('nit'),
+            'razon_social': datos_cert.get('razon_social'),
+            'activos': datos_cert.get('activos'),
+            'estado_certificado': datos_cert.get('estado'),
+            'estado_rut': datos_rut.get('estado'),
+            'valor_proceso': valor_proceso
+        }
+    
+    def _resultado_incompleto(
+        self,
+        etapa: str,
+        empresa: Optional[Dict],
+        datos_aviso: Dict,
+        valor_proceso: Optional[float],
+        timestamp_inicio: datetime,
+        cronometro: Cronometro,
+        similitud_resultado: Optional[Dict] = None
+    ) -> Dict:
+        """
+        Partial result of an analysis stopped at its deadline.
+        
+        Same keys as a complete result; stages not reached are None (no
+        traffic light or score is guessed), 'etapa_interrumpida' names the
+        first stage not run and 'incompleto' is True.
+        """
+        empresa = empresa or {}
+        datos_cert = empresa.get('datos_cert', {})
+        if not valor_proceso:
+            valor_proceso = datos_aviso.get('valor_estimado')
+        timestamp_fin = datetime.now()
+        
+        return {
+            'semaforo': None,
+            'score': None,
+            'similitud': similitud_resultado['mejor_similitud'] if similitud_resultado else None,
+            'recomendacion': 'Análisis incompleto: el tiempo límite de la solicitud se agotó. Intenta de nuevo.',
+            'faltantes': [],
+            'alertas': list(empresa.get('alertas_estructura', [])),
+            'score_detalle': None,
+            'analisis_similitud': self._analisis_similitud(similitud_resultado) if similitud_resultado else None,
+            'datos_extraidos': self._datos_extraidos(datos_cert, empresa.get('datos_rut', {}), valor_proceso),
+            'incompleto': True,
+            'etapa_interrumpida': etapa,
+            'metadata': {
+                'timestamp': timestamp_fin.isoformat(),
+                'tiempo_procesamiento_segundos': round((timestamp_fin - timestamp_inicio).total_seconds(), 2),
+                'version': '2.0.0',
+                'tipo_analisis': 'DEMO_PROFESIONAL',
+                'costo_tokens': 0,
+                'vigente_hasta': None,
+                'tiempos_etapas_ms': cronometro.resumen()
             }
         }
     
@@ -225,6 +566,60 @@ class DemoEngine:
         return faltantes
 
 
+class RegistroMotores:
+    """
+    Thread-safe holder of the shared DemoEngine.
+    
+    Callers take a reference with obtener() and keep using it for the whole
+    request; recargar() builds and warms a replacement before swapping it
+    in, so in-flight requests finish on the engine they started with.
+    """
+    
+    def __init__(self, fabrica: Callable[[], DemoEngine] = DemoEngine):
+        self._fabrica = fabrica
+        self._lock = threading.Lock()
+        self._motor: Optional[DemoEngine] = None
+        self.version = 0
+    
+    def obtener(self) -> DemoEngine:
+        """Get the current engine, creating it on first use"""
+        motor = self._motor
+        if motor is None:
+            with self._lock:
+                if self._motor is None:
+                    self._motor = self._fabrica()
+                    self.version += 1
+                motor = self._motor
+        return motor
+    
+    def calentar(self) -> DemoEngine:
+        """Create the engine if needed and warm it"""
+        motor = self.obtener()
+        motor.calentar()
+        return motor
+    
+    def recargar(self, fabrica: Optional[Callable[[], DemoEngine]] = None) -> int:
+        """
+        Build, warm and swap in a new engine.
+        
+        Args:
+            fabrica: Optional new engine factory (default: keep current one)
+            
+        Returns:
+            New engine version
+        """
+        fabrica = fabrica or self._fabrica
+        nuevo = fabrica()
+        nuevo.calentar()
+        with self._lock:
+            self._fabrica = fabrica
+            self._motor = nuevo
+            self.version += 1
+            version = self.version
+        logger.info(f"Analysis engine reloaded (version {version})")
+        return version
+
+
 def generar_mensaje_whatsapp(resultado: Dict) -> str:
     """Generate professional WhatsApp message"""
     
@@ -4,10 +4,14 @@ Configuración de logging para LicitIA
 Configura el sistema de logging con rotación de archivos y diferentes niveles.
 """
 
+import atexit
+import copy
 import logging
+import queue
 import sys
+import threading
 from pathlib import Path
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from datetime import datetime
 
 # Crear directorio de logs si no existe
@@ -21,30 +25,96 @@ LOG_FILE = LOGS_DIR / "licitia.log"
 LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 LOG_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
 
+# Listener del modo cola (None si los handlers escriben directamente)
+_listener = None
+
+class ColaDescartable(QueueHandler):
+    """
+    QueueHandler que nunca bloquea a quien registra.
+    
+    Con la cola llena el registro se descarta y se cuenta; cuando vuelve a
+    haber espacio se encola un aviso con los registros perdidos. Solo se
+    resuelve el mensaje (por si los argumentos cambian después): el formato
+    y la escritura los hace el hilo del QueueListener.
+    """
+    
+    def __init__(self, cola: queue.Queue):
+        super().__init__(cola)
+        self._lock_descartes = threading.Lock()
+        self.descartados = 0
+        self._sin_avisar = 0
+    
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+    
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock_descartes:
+                self.descartados += 1
+                self._sin_avisar += 1
+            return
+        
+        if self._sin_avisar:
+            with self._lock_descartes:
+                perdidos, self._sin_avisar = self._sin_avisar, 0
+            aviso = logging.LogRecord(
+                __name__, logging.WARNING, __file__, 0,
+                f"Logging queue full: {perdidos} log records dropped", None, None
+            )
+            try:
+                self.queue.put_nowait(aviso)
+            except queue.Full:
+                with self._lock_descartes:
+                    self._sin_avisar += perdidos
+
+class ListenerCola(QueueListener):
+    """QueueListener que espera sitio para su centinela, así stop() funciona con la cola llena"""
+    
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
 def setup_logging(
     level=logging.INFO,
     log_to_file=True,
     log_to_console=True,
     max_bytes=10*1024*1024,  # 10MB
-    backup_count=5
+    backup_count=5,
+    use_queue=False,
+    queue_size=10000
 ):
     """
     Configura el sistema de logging.
     
+    En modo cola el root logger solo tiene un ColaDescartable: formatear,
+    escribir en consola y escribir/rotar el archivo ocurre en el hilo de un
+    QueueListener, así que registrar nunca hace I/O en el event loop. Si la
+    cola se llena, los registros se descartan y se cuentan (dropped_log_records).
+    
     Args:
         level: Nivel de logging (DEBUG, INFO, WARNING, ERROR, CRITICAL)
         log_to_file: Si True, guarda logs en archivo
         log_to_console: Si True, muestra logs en consola
         max_bytes: Tamaño máximo del archivo de log antes de rotar
         backup_count: Número de archivos de respaldo a mantener
+        use_queue: Si True, escribe los logs desde un hilo en segundo plano
+        queue_size: Registros en espera antes de empezar a descartar
     """
     
+    # Detener el listener de una configuración anterior (vacía su cola)
+    stop_logging()
+    
     # Crear logger root
     root_logger = logging.getLogger()
     root_logger.setLevel(level)
     
     # Limpiar handlers existentes
     root_logger.handlers.clear()
+    handlers = []
     
     # Formato
     formatter = logging.Formatter(LOG_FORMAT, LOG_DATE_FORMAT)
@@ -59,14 +129,24 @@ def setup_logging(
         )
         file_handler.setLevel(level)
         file_handler.setFormatter(formatter)
-        root_logger.addHandler(file_handler)
+        handlers.append(file_handler)
     
     # Handler para consola
     if log_to_console:
         console_handler = logging.StreamHandler(sys.stdout)
         console_handler.setLevel(level)
         console_handler.setFormatter(formatter)
-        root_logger.addHandler(console_handler)
+        handlers.append(console_handler)
+    
+    if use_queue:
+        global _listener
+        cola_handler = ColaDescartable(queue.Queue(maxsize=queue_size))
+        root_logger.addHandler(cola_handler)
+        _listener = ListenerCola(cola_handler.queue, *handlers, respect_handler_level=True)
+        _listener.start()
+    else:
+        for handler in handlers:
+            root_logger.addHandler(handler)
     
     # Reducir verbosidad de librerías externas
     logging.getLogger("uvicorn.access").setLevel(logging.WARNING)
@@ -74,6 +154,31 @@ def setup_logging(
     
     return root_logger
 
+def stop_logging():
+    """
+    Detiene el listener del modo cola tras escribir los registros pendientes.
+    
+    Se llama al salir del proceso; sin modo cola no hace nada.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+atexit.register(stop_logging)
+
+def dropped_log_records():
+    """
+    Registros descartados por la cola llena desde que se configuró el modo cola.
+    
+    Returns:
+        Número de registros descartados (0 sin modo cola)
+    """
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, ColaDescartable):
+            return handler.descartados
+    return 0
+
 def get_logger(name):
     """
     Obtiene un logger con el nombre especificado.
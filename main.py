@@ -1,9 +1,19 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Request
+from fastapi import FastAPI, APIRouter, Depends, Header, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from typing import Dict, Any, Optional
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from typing import Any, Awaitable, Callable, Dict, Optional, Union
+from datetime import datetime
+import asyncio
+import functools
+import hashlib
+import hmac
+import json
 import time
 import logging
+import os
+import shutil
+import tempfile
+import uuid
 
 from models import (
     PricingRequest,
@@ -13,7 +23,12 @@ from models import (
     PackagePricingResponse,
     CompleteQuoteResponse,
     ErrorResponse,
-    UserTypeEnum
+    UserTypeEnum,
+    TenderMatchRequest,
+    BatchAnalysisRequest,
+    CompanyProfileRequest,
+    ProfileAnalysisRequest,
+    AdmissionLimitsRequest
 )
 from pricing_calculator import (
     calculate_plus_price,
@@ -22,11 +37,17 @@ from pricing_calculator import (
     get_subscription_plans,
     calculate_complete_quote
 )
-from pricing_config import UserType
-from logging_config import setup_logging, get_logger
+from pricing_config import PRICING_MODE_CAPPED, PRICING_MODE_ENTERPRISE, UserType
+from logging_config import dropped_log_records, setup_logging, get_logger
+from analysis_config import ADMISSION, DATABASES, IDEMPOTENCY, METRICS
+from data.idempotencia import AlmacenIdempotencia, RespuestaGuardada
+from starlette.datastructures import UploadFile as ArchivoFormulario
+from utils.admision import identificar_cliente
+from utils.cargas import hash_carga
+from utils.metricas import AgregadorMultiproceso, MiddlewareMetricas, RegistroMetricas, TIPO_CONTENIDO, exposicion
 
-# Configurar logging
-setup_logging(level=logging.INFO, log_to_file=True, log_to_console=True)
+# Configurar logging (formato y escritura en un hilo aparte; cola acotada)
+setup_logging(level=logging.INFO, log_to_file=True, log_to_console=True, use_queue=True)
 logger = get_logger(__name__)
 
 
@@ -54,14 +75,150 @@ app = FastAPI(
     version="2.0.0"
 )
 
-# CORS middleware configuration
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=['*'],
-    allow_credentials=True,
-    allow_methods=['*'],
-    allow_headers=['*']
+# Responses stored by Idempotency-Key, replayed to client retries
+almacen_idempotencia = AlmacenIdempotencia(
+    os.path.join(DATABASES['directorio'], DATABASES['idempotencia']),
+    ttl=IDEMPOTENCY['ttl_horas'] * 3600,
+    max_entradas_memoria=IDEMPOTENCY['max_entradas_memoria'],
+    max_entradas_disco=IDEMPOTENCY['max_entradas_disco']
+)
+claves_en_curso = set()
+
+# Request counts and latencies, cache hits, executor queues and PDF pages,
+# exposed on /metrics (merged across the workers of the server)
+metricas = RegistroMetricas()
+ETIQUETAS_HTTP = ('method', 'route', 'status', 'pricing_mode')
+metricas.contador('licitia_http_requests_total', 'HTTP requests', ETIQUETAS_HTTP)
+metricas.histograma(
+    'licitia_http_request_duration_seconds', 'HTTP request latency until the last byte is sent',
+    METRICS['limites_latencia_ms'], ETIQUETAS_HTTP
+)
+metricas.contador('licitia_cache_hits_total', 'Cache hits', ('cache',))
+metricas.contador('licitia_cache_misses_total', 'Cache misses', ('cache',))
+metricas.indicador('licitia_cache_entries', 'Entries held in memory', ('cache',))
+metricas.contador('licitia_log_records_dropped_total', 'Log records dropped because the logging queue was full')
+
+
+def _metricas_idempotencia():
+    estadisticas = almacen_idempotencia.estadisticas()
+    yield 'licitia_cache_hits_total', ('idempotency',), estadisticas['aciertos_memoria'] + estadisticas['aciertos_disco']
+    yield 'licitia_cache_misses_total', ('idempotency',), estadisticas['fallos']
+    yield 'licitia_cache_entries', ('idempotency',), estadisticas['entradas_memoria']
+
+
+metricas.agregar_colector(_metricas_idempotencia)
+metricas.agregar_colector(lambda: [('licitia_log_records_dropped_total', (), dropped_log_records())])
+agregador_metricas = (
+    AgregadorMultiproceso(METRICS['directorio_multiproceso'], METRICS['vigencia_segundos'])
+    if METRICS['directorio_multiproceso'] else None
 )
+tarea_volcado_metricas: Optional[asyncio.Task] = None
+
+
+def _es_formulario(request: Request) -> bool:
+    return request.headers.get('content-type', '').startswith('multipart/form-data')
+
+
+async def _hashes_formulario(request: Request) -> Dict[str, str]:
+    """SHA-256 of each uploaded file of a form, hashed off the event loop"""
+    loop = asyncio.get_running_loop()
+    async with request.form() as formulario:
+        return {
+            campo: await loop.run_in_executor(None, hash_carga, valor.file)
+            for campo, valor in formulario.multi_items() if isinstance(valor, ArchivoFormulario)
+        }
+
+
+async def _huella_solicitud(request: Request, cargas: Optional[Dict[str, str]] = None) -> str:
+    """
+    Fingerprint of the request a key was first used for.
+    
+    Method, path and query string, plus the body for JSON requests or the
+    SHA-256 of each uploaded file for form uploads. Uploads are never
+    buffered in memory: a first request takes the hashes its endpoint
+    computed while spooling (`cargas`), and a retry parses its form (files
+    are spooled to disk) and hashes the files in a thread.
+    """
+    partes = [request.method, request.url.path, request.url.query]
+    if request.headers.get('content-type', '').startswith('application/json'):
+        partes.append(hashlib.sha256(await request.body()).hexdigest())
+    elif _es_formulario(request):
+        if cargas is None:
+            cargas = await _hashes_formulario(request)
+        partes.extend(f"{campo}={cargas[campo]}" for campo in sorted(cargas))
+    return hashlib.sha256('\n'.join(partes).encode('utf-8')).hexdigest()
+
+
+# Idempotency middleware (registered before logging, so replays are logged too)
+@app.middleware("http")
+async def replay_idempotent_requests(request: Request, call_next):
+    """
+    Replay the stored response for a repeated Idempotency-Key.
+    
+    Only POSTs to IDEMPOTENCY['rutas'] carrying the header are affected.
+    Keys belong to the client that sent them (same identity as admission
+    control), so clients never see each other's responses. A replay
+    returns the stored bytes without running the endpoint. A key still
+    being processed answers 409 (retry later); a key reused for a different
+    request answers 422. Server errors (5xx), partial analyses
+    (X-Analysis-Incomplete) and form uploads whose endpoint did not report
+    the upload hashes are not stored, so they can be retried.
+    """
+    clave = request.headers.get('idempotency-key')
+    if clave is None or request.method != 'POST' or request.url.path not in IDEMPOTENCY['rutas']:
+        return await call_next(request)
+    if not clave or len(clave) > IDEMPOTENCY['max_longitud_clave']:
+        return JSONResponse(status_code=400, content={"detail": "Invalid Idempotency-Key header"})
+    
+    clave = f"{identificar_cliente(request.scope, ADMISSION['usar_x_forwarded_for'])} {clave}"
+    loop = asyncio.get_running_loop()
+    guardada = await loop.run_in_executor(None, almacen_idempotencia.obtener, clave)
+    if guardada is not None:
+        if guardada.huella != await _huella_solicitud(request):
+            return JSONResponse(
+                status_code=422,
+                content={"detail": "Idempotency-Key was already used for a different request"}
+            )
+        return Response(
+            content=guardada.cuerpo,
+            status_code=guardada.estado_http,
+            media_type=guardada.tipo_contenido,
+            headers={"Idempotent-Replayed": "true"}
+        )
+    
+    if clave in claves_en_curso:
+        return JSONResponse(
+            status_code=409,
+            content={"detail": "A request with this Idempotency-Key is still being processed"},
+            headers={"Retry-After": "1"}
+        )
+    
+    claves_en_curso.add(clave)
+    try:
+        # Form uploads are fingerprinted from the hashes the endpoint reports
+        huella = None if _es_formulario(request) else await _huella_solicitud(request)
+        response = await call_next(request)
+        cuerpo = b''.join([fragmento async for fragmento in response.body_iterator])
+        if huella is None and hasattr(request.state, 'hashes_cargas'):
+            huella = await _huella_solicitud(request, request.state.hashes_cargas)
+        if (
+            huella is not None
+            and response.status_code < 500
+            and len(cuerpo) <= IDEMPOTENCY['max_bytes_respuesta']
+            and 'x-analysis-incomplete' not in response.headers
+        ):
+            await loop.run_in_executor(None, almacen_idempotencia.guardar, clave, RespuestaGuardada(
+                huella, response.status_code, response.headers.get('content-type'), cuerpo
+            ))
+    finally:
+        claves_en_curso.discard(clave)
+    
+    return Response(
+        content=cuerpo,
+        status_code=response.status_code,
+        headers=dict(response.headers)
+    )
+
 
 # Request logging middleware
 @app.middleware("http")
@@ -112,6 +269,55 @@ async def shutdown_event():
     logger.info("LicitIA API Server Shutting Down")
     logger.info("=" * 60)
 
+async def _volcar_metricas_periodicamente():
+    """Write this worker's metrics snapshot for the other workers' scrapes"""
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(METRICS['intervalo_volcado_segundos'])
+        try:
+            await loop.run_in_executor(None, lambda: agregador_metricas.volcar(metricas.instantanea()))
+        except Exception as e:
+            logger.warning(f"Could not write metrics snapshot: {str(e)}")
+
+
+@app.on_event("startup")
+async def iniciar_volcado_metricas():
+    """Start sharing this worker's metrics with the other workers"""
+    global tarea_volcado_metricas
+    if agregador_metricas is not None:
+        tarea_volcado_metricas = asyncio.create_task(_volcar_metricas_periodicamente())
+
+
+@app.on_event("shutdown")
+async def detener_volcado_metricas():
+    """Stop sharing metrics; this worker's values leave the merged totals"""
+    if tarea_volcado_metricas is not None:
+        tarea_volcado_metricas.cancel()
+        agregador_metricas.retirar()
+
+
+def _exposicion_metricas() -> str:
+    instantanea = metricas.instantanea()
+    if agregador_metricas is not None:
+        agregador_metricas.volcar(instantanea)
+        instantanea = agregador_metricas.combinar(instantanea)
+    return exposicion(instantanea)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """
+    Metrics in the Prometheus text exposition format.
+    
+    Request counts and latency histograms by route, status and pricing
+    mode, cache hits and misses, executor queue depth, PDF pages and
+    analysis stage latencies. With several workers, whichever worker
+    answers merges the snapshots of all of them.
+    """
+    loop = asyncio.get_running_loop()
+    return Response(content=await loop.run_in_executor(None, _exposicion_metricas), media_type=TIPO_CONTENIDO)
+
+
 # Routers
 pricing_router = APIRouter(prefix="/api/pricing", tags=["pricing"])
 legacy_router = APIRouter(tags=["legacy"])
@@ -120,7 +326,7 @@ legacy_router = APIRouter(tags=["legacy"])
 # ==================== PRICING ENDPOINTS ====================
 
 @pricing_router.post("/plus", response_model=PlusPricingResponse)
-async def calculate_plus(request: PricingRequest):
+async def calculate_plus(request: PricingRequest, http_request: Request):
     """
     Calculate PLUS tier pricing (quick validation).
     
@@ -140,6 +346,8 @@ async def calculate_plus(request: PricingRequest):
         
         user_type = _convert_user_type(request.user_type)
         pricing_mode = request.pricing_mode.value if request.pricing_mode else "enterprise"
+        # Label of the request metrics (the mode is in the body, not the query)
+        http_request.state.pricing_mode = pricing_mode
         
         result = calculate_plus_price(
             assets=request.assets,
@@ -156,7 +364,7 @@ async def calculate_plus(request: PricingRequest):
 
 
 @pricing_router.post("/pro", response_model=ProPricingResponse)
-async def calculate_pro(request: PricingRequest):
+async def calculate_pro(request: PricingRequest, http_request: Request):
     """
     Calculate PRO tier pricing (complete analysis).
     
@@ -174,6 +382,7 @@ async def calculate_pro(request: PricingRequest):
     try:
         user_type = _convert_user_type(request.user_type)
         pricing_mode = request.pricing_mode.value if request.pricing_mode else "enterprise"
+        http_request.state.pricing_mode = pricing_mode
         
         result = calculate_pro_price(
             assets=request.assets,
@@ -229,6 +438,7 @@ async def get_subscription_plans_endpoint():
 @pricing_router.post("/quote", response_model=CompleteQuoteResponse)
 async def get_complete_quote(
     request: PricingRequest,
+    http_request: Request,
     include_subscription: bool = True
 ):
     """
@@ -243,6 +453,7 @@ async def get_complete_quote(
     try:
         user_type = _convert_user_type(request.user_type)
         pricing_mode = request.pricing_mode.value if request.pricing_mode else "enterprise"
+        http_request.state.pricing_mode = pricing_mode
         
         result = calculate_complete_quote(
             assets=request.assets,
@@ -304,8 +515,25 @@ async def root():
 # ==================== ANALYSIS ENDPOINTS ====================
 
 try:
-    from demo_engine import DemoEngine, generar_mensaje_whatsapp
+    from demo_engine import generar_mensaje_whatsapp, MODULOS_COMPLETOS, Notificador
+    from data.perfiles import AlmacenPerfiles, construir_perfil
+    from data.trabajos import ColaTrabajos, COMPLETADO, FALLIDO
+    from core.cronometro import Cronometro
+    from core.plazo import Plazo
+    from utils.cache_resultados import CacheResultados
+    from utils.coalescencia import CoalescedorSolicitudes
+    from utils.ejecutores import CapaEjecucion
+    from analysis_config import (
+        ADMIN, ADMISSION, BUNDLES, DEADLINES, JOBS, PDF_BACKENDS, PDF_EXTRACTION, PROCESS_WORKERS, STAGE_TIMINGS, UPLOADS
+    )
+    from utils import backends_pdf, tareas
+    from utils.admision import ControlAdmision, LimitadorTokens, MiddlewareAdmision
+    from utils.cargas import ArchivoCargado, ArchivoDemasiadoGrande, guardar_carga, verificar_tamano
+    from utils.histogramas import HistogramasEtapas
+    from utils.memoria_compartida import compartir
+    from utils.paquetes import PaqueteInvalido
     from utils.pdf_handler import ManejadorDocumentos
+    from utils.trabajos import PoolTrabajos
     from fastapi import UploadFile, File
     ANALYSIS_AVAILABLE = True
 except ImportError:
@@ -315,13 +543,455 @@ except ImportError:
 if ANALYSIS_AVAILABLE:
     analysis_router = APIRouter(prefix="/api/analysis", tags=["analysis"])
     
+    # Company profiles keyed by NIT, reused to skip document extraction
+    almacen_perfiles = AlmacenPerfiles(os.path.join(DATABASES['directorio'], DATABASES['perfiles']))
+    
+    # Analysis results, expiring when their date-based validation changes
+    cache_resultados = CacheResultados(max_entradas=1000)
+    
+    # Identical concurrent requests (same documents and parameters) share one computation
+    coalescedor = CoalescedorSolicitudes()
+    tareas_fondo = []
+    
+    # Admission control: per-client token buckets (429) and a global cap on
+    # concurrent analyses with a bounded wait queue (503); pricing is not limited
+    limitador_clientes = LimitadorTokens(
+        ADMISSION['tasa_por_cliente'], ADMISSION['rafaga_por_cliente'], ADMISSION['max_clientes']
+    )
+    control_admision = ControlAdmision(
+        ADMISSION['max_concurrentes'], ADMISSION['max_en_espera'], ADMISSION['espera_maxima_segundos']
+    )
+    app.add_middleware(
+        MiddlewareAdmision,
+        limitador=limitador_clientes,
+        control=control_admision,
+        prefijo=analysis_router.prefix,
+        rutas_exentas=ADMISSION['rutas_exentas'],
+        usar_x_forwarded_for=ADMISSION['usar_x_forwarded_for']
+    )
+    
+    # Thread/process pools that keep PDF and analysis work off the event loop;
+    # process workers import and warm the analysis modules once
+    capa_ejecucion = CapaEjecucion(inicializador=tareas.inicializar_trabajador)
+    
+    # Shared engine for work done in this process (thread stages, cache re-scoring)
+    registro_motores = tareas.registro
+    
+    # Latency per analysis stage of the analyses computed by this process
+    histogramas_etapas = HistogramasEtapas(STAGE_TIMINGS['limites_ms'])
+    
+    metricas.indicador('licitia_executor_queue_depth', 'Tasks waiting for a worker', ('stage',))
+    metricas.indicador('licitia_executor_running', 'Tasks running', ('stage',))
+    metricas.contador('licitia_executor_tasks_total', 'Finished tasks', ('stage', 'outcome'))
+    metricas.contador('licitia_admission_rejected_total', 'Analysis requests rejected by admission control', ('reason',))
+    metricas.contador('licitia_pdf_documents_total', 'PDF documents read', ('document',))
+    metricas.contador('licitia_pdf_pages_total', 'PDF pages: in the documents (total) and decoded (read)', ('document', 'kind'))
+    metricas.histograma(
+        'licitia_analysis_stage_duration_seconds', 'Analysis stage latency',
+        STAGE_TIMINGS['limites_ms'], ('stage',)
+    )
+    
+    
+    def _metricas_analisis():
+        cache = cache_resultados.estadisticas()
+        yield 'licitia_cache_hits_total', ('result',), cache['aciertos']
+        yield 'licitia_cache_misses_total', ('result',), cache['fallos']
+        yield 'licitia_cache_entries', ('result',), cache['entradas']
+        for etapa, estadisticas in capa_ejecucion.estadisticas().items():
+            yield 'licitia_executor_queue_depth', (etapa,), estadisticas['en_cola']
+            yield 'licitia_executor_running', (etapa,), estadisticas['en_ejecucion']
+            yield 'licitia_executor_tasks_total', (etapa, 'completed'), estadisticas['completadas']
+            yield 'licitia_executor_tasks_total', (etapa, 'error'), estadisticas['errores']
+        concurrencia = control_admision.estadisticas()
+        yield 'licitia_admission_rejected_total', ('rate_limit',), limitador_clientes.rechazadas
+        yield 'licitia_admission_rejected_total', ('queue_full',), concurrencia['rechazadas_cola_llena']
+        yield 'licitia_admission_rejected_total', ('wait_timeout',), concurrencia['rechazadas_espera']
+    
+    
+    metricas.agregar_colector(_metricas_analisis)
+    
+    # Durable queue of asynchronous analysis jobs (drained by pool_trabajos, below)
+    cola_trabajos = ColaTrabajos(
+        os.path.join(DATABASES['directorio'], DATABASES['trabajos']),
+        duracion_reserva=JOBS['duracion_reserva'],
+        max_intentos=JOBS['max_intentos']
+    )
+    
+    
+    @app.on_event("startup")
+    async def iniciar_recalculo_cache():
+        """Start the background re-scoring of cached analyses"""
+        tareas_fondo.append(asyncio.create_task(cache_resultados.programar_recalculo()))
+    
+    
+    @app.on_event("startup")
+    async def calibrar_backends_pdf():
+        """Pick the fastest PDF backend that meets the quality threshold on the local corpus"""
+        corpus = PDF_BACKENDS['corpus_calibracion']
+        if PDF_BACKENDS['calibrar_al_iniciar'] and os.path.isdir(corpus):
+            loop = asyncio.get_running_loop()
+            calibracion = await loop.run_in_executor(
+                None, lambda: backends_pdf.calibrar(backends_pdf.cargar_corpus(corpus))
+            )
+            if calibracion['elegido'] is not None:
+                # Registered before iniciar_ejecutores so every worker process starts with the choice
+                capa_ejecucion.establecer_inicializador(
+                    functools.partial(tareas.inicializar_trabajador, calibracion['elegido'])
+                )
+    
+    
+    @app.on_event("startup")
+    async def iniciar_ejecutores():
+        """Warm the shared engine and start the analysis worker pools"""
+        if PROCESS_WORKERS['precalentar']:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, registro_motores.calentar)
+            await loop.run_in_executor(None, capa_ejecucion.iniciar, tareas.calentar_trabajador)
+    
+    
+    @app.on_event("startup")
+    async def iniciar_trabajos():
+        """Drop uploads of jobs that no longer exist and start the job workers"""
+        await asyncio.get_running_loop().run_in_executor(None, pool_trabajos.limpiar_huerfanos)
+        pool_trabajos.iniciar()
+    
+    
+    @app.on_event("shutdown")
+    async def detener_recalculo_cache():
+        """Stop background analysis tasks"""
+        pool_trabajos.detener(timeout=0)
+        for tarea in tareas_fondo:
+            tarea.cancel()
+        capa_ejecucion.cerrar(esperar=False)
+    
+    
+    def _vigente_hasta(resultado: Dict[str, Any]) -> Optional[datetime]:
+        """Instant until which an analysis result stays valid"""
+        vigente_hasta = resultado.get('metadata', {}).get('vigente_hasta')
+        return datetime.fromisoformat(vigente_hasta) if vigente_hasta else None
+    
+    
+    def _recalculo_demo(certificado: str, rut: str, aviso: str, valor_proceso: Optional[float]):
+        """Build the cache re-scoring callback for a text analysis"""
+        def recalcular(fecha_referencia):
+            resultado = registro_motores.obtener().analizar(
+                certificado, rut, aviso, valor_proceso, fecha_referencia
+            )
+            return resultado, _vigente_hasta(resultado)
+        return recalcular
+    
+    
+    def _hash_texto(texto: str) -> str:
+        """SHA-256 content hash of a document text"""
+        return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+    
+    
+    def _resumen_perfil(perfil: Dict[str, Any]) -> Dict[str, Any]:
+        """Public summary of a stored company profile"""
+        return {
+            'nit': perfil['nit'],
+            'razon_social': perfil['razon_social'],
+            'puntos_estructura': perfil['puntos_estructura'],
+            'alertas_estructura': perfil['alertas_estructura'],
+            'fecha_expedicion': perfil['fecha_expedicion'],
+            'vigente': AlmacenPerfiles.es_vigente(perfil),
+            'actualizado_en': perfil['actualizado_en']
+        }
+    
+    
+    # Uploaded document types and their labels in error messages
+    ETIQUETAS_DOCUMENTOS = {'certificado': 'Certificate', 'rut': 'RUT', 'aviso': 'Notice'}
+    
+    
+    def _plazo_solicitud(
+        x_request_timeout: Optional[float] = Header(
+            None, gt=0, description="Seconds the client waits for the analysis"
+        )
+    ) -> Plazo:
+        """Deadline of one analysis request: X-Request-Timeout (capped) or the configured default"""
+        if x_request_timeout is None:
+            return Plazo(DEADLINES['segundos_por_defecto'])
+        return Plazo(min(x_request_timeout, DEADLINES['maximo_segundos']))
+    
+    
+    def _marcar_incompleto(response: Response, resultado: Dict[str, Any]) -> Dict[str, Any]:
+        """Flag a partial result (stopped at its deadline) in the response headers"""
+        if resultado.get('incompleto'):
+            response.headers['X-Analysis-Incomplete'] = 'true'
+        return resultado
+    
+    
+    def _registrar_tiempos(resultado: Dict[str, Any]) -> Dict[str, Any]:
+        """Add the stage timings of a freshly computed analysis to the histograms"""
+        tiempos = resultado.get('metadata', {}).get('tiempos_etapas_ms')
+        if tiempos:
+            histogramas_etapas.registrar(tiempos)
+            for etapa, ms in tiempos.items():
+                metricas.observar('licitia_analysis_stage_duration_seconds', etapa, ms=ms)
+        return resultado
+    
+    
+    def _contar_paginas(documento: str, resultado: Dict[str, Any]) -> None:
+        """Add a read PDF document to the page metrics"""
+        metricas.incrementar('licitia_pdf_documents_total', documento)
+        metricas.incrementar('licitia_pdf_pages_total', documento, 'total', valor=resultado.get('num_paginas') or 0)
+        metricas.incrementar('licitia_pdf_pages_total', documento, 'read', valor=resultado.get('paginas_procesadas') or 0)
+    
+    
+    def _con_tiempos(resultado: Dict[str, Any], include_timings: bool) -> Dict[str, Any]:
+        """
+        Keep metadata['tiempos_etapas_ms'] only when the client asked for it.
+        
+        Returns a copy without the timings otherwise; the result itself may
+        be shared with the cache and coalesced requests and is not modified.
+        """
+        metadata = resultado.get('metadata')
+        if include_timings or not metadata or 'tiempos_etapas_ms' not in metadata:
+            return resultado
+        return {
+            **resultado,
+            'metadata': {clave: valor for clave, valor in metadata.items() if clave != 'tiempos_etapas_ms'}
+        }
+    
+    
+    async def _guardar_documentos(directorio: str, **archivos: UploadFile) -> Dict[str, ArchivoCargado]:
+        """
+        Spool uploads to disk concurrently, hashing them as they stream.
+        
+        The caller owns the directory and removes it when done; a spool still
+        running after that fails harmlessly instead of leaking a file.
+        
+        Args:
+            directorio: Folder for the spooled files
+            archivos: UploadFile per document type
+            
+        Returns:
+            ArchivoCargado (path, size, SHA-256) per document type
+        """
+        async def guardar(tipo: str, archivo: UploadFile):
+            try:
+                verificar_tamano(archivo.size)
+                return tipo, await capa_ejecucion.ejecutar(
+                    'lectura', guardar_carga, archivo.file, directorio=directorio
+                )
+            except ArchivoDemasiadoGrande as e:
+                raise HTTPException(status_code=413, detail=f"{ETIQUETAS_DOCUMENTOS[tipo]} PDF: {str(e)}")
+        
+        return dict(await asyncio.gather(*(guardar(tipo, archivo) for tipo, archivo in archivos.items())))
+    
+    
+    def _tramo_plazo(plazo: Optional[Plazo]) -> Optional[int]:
+        """
+        Deadline window for coalescing keys.
+        
+        A coalesced computation runs with its leader's deadline, so callers
+        only share it with callers whose deadlines fall in the same window
+        (DEADLINES['ventana_coalescencia_segundos']).
+        """
+        if plazo is None or plazo.vence_en is None:
+            return None
+        return int(plazo.vence_en // DEADLINES['ventana_coalescencia_segundos'])
+    
+    
+    def _clave_solicitud(operacion: str, cargas: Dict[str, ArchivoCargado], *parametros) -> str:
+        """Coalescing key: the operation, the content hash of each document and the parameters"""
+        hashes = {tipo: carga.sha256 for tipo, carga in cargas.items()}
+        return _hash_texto(json.dumps([operacion, hashes, parametros], sort_keys=True))
+    
+    
+    async def _procesar_coalescido(
+        operacion: str,
+        archivos: Dict[str, UploadFile],
+        parametros: tuple,
+        calcular: Callable[[Dict[str, str]], Awaitable[Dict[str, Any]]],
+        http_request: Optional[Request] = None,
+        plazo: Optional[Plazo] = None
+    ) -> Dict[str, Any]:
+        """
+        Spool uploads, then join an identical computation in flight or start one.
+        
+        Uploads are hashed while spooling (cheap I/O) so identical requests
+        find each other before any PDF or analysis work. The computation owns
+        the spooled files of the request that started it; requests that join
+        it drop their copies right away.
+        
+        Args:
+            operacion: Endpoint name (part of the key)
+            archivos: UploadFile per document type
+            parametros: Request parameters the result depends on
+            calcular: Computes the result from the spooled path per document type
+            http_request: Request whose state receives the upload hashes
+                (`hashes_cargas`, for the Idempotency-Key fingerprint)
+            plazo: Deadline `calcular` runs with; only requests whose
+                deadlines fall in the same window share the computation
+            
+        Returns:
+            Result of the shared computation
+        """
+        directorio = tempfile.mkdtemp(prefix='licitia-', dir=UPLOADS['directorio'])
+        cargas: Dict[str, ArchivoCargado] = {}
+        lider = False
+        
+        def liderar():
+            # Set before the computation is scheduled: from here on it owns the directory
+            nonlocal lider
+            lider = True
+        
+        async def calcular_y_limpiar():
+            try:
+                return await calcular({tipo: carga.ruta for tipo, carga in cargas.items()})
+            finally:
+                shutil.rmtree(directorio, ignore_errors=True)
+        
+        try:
+            cargas = await _guardar_documentos(directorio, **archivos)
+            if http_request is not None:
+                http_request.state.hashes_cargas = {tipo: carga.sha256 for tipo, carga in cargas.items()}
+            return await coalescedor.ejecutar(
+                _clave_solicitud(operacion, cargas, _tramo_plazo(plazo), *parametros),
+                calcular_y_limpiar,
+                al_liderar=liderar
+            )
+        finally:
+            if not lider:
+                shutil.rmtree(directorio, ignore_errors=True)
+    
+    
+    async def _extraer_documentos(
+        notificar: Optional[Notificador] = None,
+        plazo: Optional[Plazo] = None,
+        cronometro: Optional[Cronometro] = None,
+        **archivos: Union[UploadFile, str]
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Read, extract text and extract fields from uploaded PDFs concurrently.
+        
+        Each document is pipelined independently (spool to disk -> text ->
+        fields), so total latency approaches the slowest document and no
+        upload is ever fully buffered in memory. Oversized files are rejected
+        with 413 from their declared size when available, or while spooling.
+        The first failing document raises and cancels the others.
+        
+        Args:
+            notificar: Progress callback, called with an 'extraccion' event
+                as each document finishes
+            plazo: Request deadline; documents still being read when it
+                passes keep the fields found so far ('incompleto')
+            cronometro: Stage timer; each document's reading and extraction
+                is timed as 'extraccion_<tipo>'
+            archivos: UploadFile per document type ('certificado', 'rut', 'aviso'),
+                or the path of an upload already spooled
+            
+        Returns:
+            procesar_carga result per document type
+        """
+        if not MODULOS_COMPLETOS:
+            raise HTTPException(status_code=503, detail="Analysis modules not available")
+        cronometro = cronometro or Cronometro()
+        
+        async def procesar(tipo: str, archivo: Union[UploadFile, str]):
+            try:
+                if isinstance(archivo, str):
+                    # Already spooled (queued job or coalesced request); its owner removes the file
+                    tarea, fuente = tareas.procesar_documento, archivo
+                else:
+                    verificar_tamano(archivo.size)
+                    tarea, fuente = tareas.procesar_carga, archivo.file
+                # Orchestrated from a thread: page ranges fan out to the PDF process pool
+                with cronometro.medir(f'extraccion_{tipo}'):
+                    resultado = await capa_ejecucion.ejecutar(
+                        'lectura', tarea, tipo, fuente,
+                        ejecutor_paginas=capa_ejecucion.etapa('pdf'),
+                        max_paginas=PDF_EXTRACTION['max_paginas'],
+                        plazo=plazo
+                    )
+            except ArchivoDemasiadoGrande as e:
+                raise HTTPException(status_code=413, detail=f"{ETIQUETAS_DOCUMENTOS[tipo]} PDF: {str(e)}")
+            if not resultado['exito']:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"{ETIQUETAS_DOCUMENTOS[tipo]} PDF error: {resultado['error']}"
+                )
+            _contar_paginas(tipo, resultado)
+            return tipo, resultado
+        
+        pendientes = [asyncio.ensure_future(procesar(tipo, archivo)) for tipo, archivo in archivos.items()]
+        try:
+            documentos = {}
+            for siguiente in asyncio.as_completed(pendientes):
+                tipo, resultado = await siguiente
+                documentos[tipo] = resultado
+                if notificar is not None:
+                    notificar('extraccion', {
+                        'documento': tipo,
+                        'datos': resultado['datos'],
+                        'num_paginas': resultado.get('num_paginas'),
+                        'paginas_procesadas': resultado.get('paginas_procesadas')
+                    })
+            return documentos
+        finally:
+            for tarea in pendientes:
+                tarea.cancel()
+    
+    
+    def _evento_sse(evento: str, datos: Any) -> str:
+        """Format one server-sent event"""
+        return f"event: {evento}\ndata: {json.dumps(datos, ensure_ascii=False, default=str)}\n\n"
+    
+    
+    def _respuesta_sse(producir: Callable[[Notificador], Awaitable[Dict[str, Any]]]) -> StreamingResponse:
+        """
+        Stream an analysis as server-sent events.
+        
+        Every progress event is sent as soon as its stage finishes (from the
+        event loop or from executor threads), then a final 'resultado' event
+        with the complete result, or an 'error' event with status and detail.
+        
+        Args:
+            producir: Coroutine function running the analysis with the given callback
+        """
+        async def generar_eventos():
+            loop = asyncio.get_running_loop()
+            eventos: asyncio.Queue = asyncio.Queue()
+            
+            def notificar(evento: str, datos: Dict) -> None:
+                loop.call_soon_threadsafe(eventos.put_nowait, (evento, datos))
+            
+            tarea = asyncio.ensure_future(producir(notificar))
+            # Queued after every event already scheduled by the analysis
+            tarea.add_done_callback(lambda _: loop.call_soon_threadsafe(eventos.put_nowait, None))
+            try:
+                while True:
+                    evento = await eventos.get()
+                    if evento is None:
+                        break
+                    yield _evento_sse(*evento)
+                
+                try:
+                    yield _evento_sse('resultado', tarea.result())
+                except HTTPException as e:
+                    yield _evento_sse('error', {'status_code': e.status_code, 'detail': e.detail})
+                except Exception as e:
+                    yield _evento_sse('error', {'status_code': 500, 'detail': f"Analysis error: {str(e)}"})
+            finally:
+                tarea.cancel()
+        
+        return StreamingResponse(
+            generar_eventos(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+    
     
     @analysis_router.post("/demo")
     async def analyze_demo_text(
+        response: Response,
         certificado: str,
         rut: str,
         aviso: str,
-        valor_proceso: Optional[float] = None
+        valor_proceso: Optional[float] = None,
+        include_timings: bool = False,
+        plazo: Plazo = Depends(_plazo_solicitud)
     ):
         """
         DEMO analysis using text inputs.
@@ -331,24 +1001,239 @@ if ANALYSIS_AVAILABLE:
             rut: RUT text
             aviso: Tender notice text
             valor_proceso: Optional process value
+            include_timings: Include per-stage timings in metadata (default: False)
             
         Returns:
             Complete analysis with score, traffic light, and recommendations
         """
         try:
-            engine = DemoEngine()
-            resultado = engine.analizar(certificado, rut, aviso, valor_proceso)
-            return resultado
+            clave = _hash_texto(json.dumps([certificado, rut, aviso, valor_proceso]))
+            resultado = cache_resultados.obtener(clave)
+            if resultado is None:
+                async def calcular():
+                    # Large texts reach the worker process through shared memory
+                    with compartir(certificado, rut, aviso) as textos:
+                        resultado = _registrar_tiempos(await capa_ejecucion.ejecutar(
+                            'analisis', tareas.analizar_textos, *textos, valor_proceso, plazo=plazo
+                        ))
+                    if not resultado.get('incompleto'):
+                        cache_resultados.guardar(
+                            clave,
+                            resultado,
+                            _vigente_hasta(resultado),
+                            _recalculo_demo(certificado, rut, aviso, valor_proceso)
+                        )
+                    return resultado
+                
+                # Concurrent cache misses for the same texts and deadline window share one analysis
+                resultado = await coalescedor.ejecutar(
+                    _hash_texto(json.dumps([clave, _tramo_plazo(plazo)])), calcular
+                )
+            return _marcar_incompleto(response, _con_tiempos(resultado, include_timings))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Analysis error: {str(e)}")
+    
+    
+    @analysis_router.post("/demo-stream")
+    async def analyze_demo_text_stream(
+        certificado: str,
+        rut: str,
+        aviso: str,
+        valor_proceso: Optional[float] = None,
+        include_timings: bool = False,
+        plazo: Plazo = Depends(_plazo_solicitud)
+    ):
+        """
+        DEMO analysis using text inputs, streamed as server-sent events.
+        
+        Events: 'extraccion' (per document), 'validacion_estructural',
+        'similitud', 'validacion_financiera', 'score', 'semaforo', then
+        'resultado' (same body as /demo) or 'error'.
+        """
+        if not MODULOS_COMPLETOS:
+            raise HTTPException(status_code=503, detail="Analysis modules not available")
+        
+        async def producir(notificar):
+            resultado = await capa_ejecucion.ejecutar(
+                'lectura', tareas.analizar_textos, certificado, rut, aviso, valor_proceso,
+                notificar=notificar, plazo=plazo
+            )
+            return _con_tiempos(_registrar_tiempos(resultado), include_timings)
+        
+        return _respuesta_sse(producir)
+    
+    
+    @analysis_router.post("/demo-batch")
+    async def analyze_demo_batch(
+        request: BatchAnalysisRequest,
+        include_timings: bool = False,
+        plazo: Plazo = Depends(_plazo_solicitud)
+    ):
+        """
+        DEMO analysis of one company against many tenders.
+        
+        The certificate and RUT are extracted and validated once; only the
+        notice extraction, similarity, financial validation and traffic
+        light steps run per tender, in parallel. Results are streamed as
+        NDJSON, one line per tender in completion order.
+        
+        Returns:
+            NDJSON stream of {"indice", "id", "resultado"} or {"indice", "id", "error"}
+        """
+        if not MODULOS_COMPLETOS:
+            raise HTTPException(status_code=503, detail="Analysis modules not available")
+        
+        try:
+            with compartir(request.certificado, request.rut) as textos:
+                empresa = await capa_ejecucion.ejecutar('analisis', tareas.preparar_empresa, *textos)
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Analysis error: {str(e)}")
+        
+        async def analizar_indice(indice, aviso):
+            try:
+                with compartir(aviso.aviso) as (texto,):
+                    resultado = await capa_ejecucion.ejecutar(
+                        'analisis', tareas.analizar_aviso, empresa, texto, aviso.valor_proceso, plazo
+                    )
+                _registrar_tiempos(resultado)
+                return {'indice': indice, 'id': aviso.id, 'resultado': _con_tiempos(resultado, include_timings)}
+            except Exception as e:
+                return {'indice': indice, 'id': aviso.id, 'error': f"Analysis error: {str(e)}"}
+        
+        async def generar_lineas():
+            pendientes = [
+                asyncio.ensure_future(analizar_indice(indice, aviso))
+                for indice, aviso in enumerate(request.avisos)
+            ]
+            try:
+                for siguiente in asyncio.as_completed(pendientes):
+                    item = await siguiente
+                    yield json.dumps(item, ensure_ascii=False, default=str) + "\n"
+            finally:
+                for tarea in pendientes:
+                    tarea.cancel()
+        
+        return StreamingResponse(generar_lineas(), media_type="application/x-ndjson")
+    
+    
+    @analysis_router.post("/profiles")
+    async def create_company_profile(request: CompanyProfileRequest):
+        """
+        Extract, validate and store a company profile keyed by NIT.
+        
+        Later analyses can reference the profile by NIT and skip the
+        certificate and RUT extraction entirely.
+        """
+        if not MODULOS_COMPLETOS:
+            raise HTTPException(status_code=503, detail="Analysis modules not available")
+        
+        try:
+            with compartir(request.certificado, request.rut) as textos:
+                empresa = await capa_ejecucion.ejecutar('analisis', tareas.preparar_empresa, *textos)
+            comparador = registro_motores.obtener().comparador
+            tokens = {
+                'objeto_social': comparador.preparar_tokens(
+                    empresa['datos_cert'].get('objeto_social') or ''
+                ),
+                'actividades_secundarias': comparador.preparar_tokens(
+                    empresa['datos_cert'].get('actividades_secundarias') or ''
+                )
+            }
+            perfil = construir_perfil(
+                empresa,
+                tokens,
+                hash_certificado=_hash_texto(request.certificado),
+                hash_rut=_hash_texto(request.rut)
+            )
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Analysis error: {str(e)}")
+        
+        if perfil is None:
+            raise HTTPException(status_code=422, detail="NIT not found in certificate or RUT")
+        
+        # SQLite calls run on the 'lectura' threads, never on the event loop
+        await capa_ejecucion.ejecutar('lectura', almacen_perfiles.guardar, perfil)
+        guardado = await capa_ejecucion.ejecutar('lectura', almacen_perfiles.obtener, perfil['nit'])
+        return _resumen_perfil(guardado)
+    
+    
+    @analysis_router.get("/profiles/{nit}")
+    async def get_company_profile(nit: str):
+        """Get a stored company profile summary"""
+        perfil = await capa_ejecucion.ejecutar('lectura', almacen_perfiles.obtener, nit)
+        if perfil is None:
+            raise HTTPException(status_code=404, detail=f"Profile not found: {nit}")
+        return _resumen_perfil(perfil)
+    
+    
+    @analysis_router.post("/profiles/{nit}/demo")
+    async def analyze_profile_demo(
+        response: Response,
+        nit: str,
+        request: ProfileAnalysisRequest,
+        include_timings: bool = False,
+        plazo: Plazo = Depends(_plazo_solicitud)
+    ):
+        """
+        DEMO analysis of a stored company profile against a tender notice.
+        
+        Structural validation is re-run on the stored fields so date-based
+        alerts reflect today's date; no document extraction happens.
+        """
+        perfil = await capa_ejecucion.ejecutar('lectura', almacen_perfiles.obtener, nit)
+        if perfil is None:
+            raise HTTPException(status_code=404, detail=f"Profile not found: {nit}")
+        
+        try:
+            with compartir(request.aviso) as (texto,):
+                resultado = await capa_ejecucion.ejecutar(
+                    'analisis', tareas.analizar_perfil,
+                    perfil['datos_cert'], perfil['datos_rut'], texto, request.valor_proceso, plazo
+                )
+            _registrar_tiempos(resultado)
+            return _marcar_incompleto(response, _con_tiempos(resultado, include_timings))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Analysis error: {str(e)}")
+    
+    
+    @analysis_router.post("/match")
+    async def match_tenders(
+        request: TenderMatchRequest,
+        response: Response,
+        plazo: Plazo = Depends(_plazo_solicitud)
+    ):
+        """
+        Rank tenders by similarity to the company business object.
+        
+        Returns the top K tenders; candidates that cannot enter the top K
+        are pruned before the expensive similarity metrics run. Pruning
+        rate and latency are reported in 'metadata'. At the deadline, the
+        best of the tenders scored so far are returned ('incompleto').
+        """
+        try:
+            avisos = {aviso.id: aviso.objeto_contrato for aviso in request.avisos}
+            resultado = await capa_ejecucion.ejecutar(
+                'analisis', tareas.buscar_top_k,
+                request.objeto_social,
+                request.actividades_secundarias or '',
+                avisos,
+                request.k,
+                plazo
+            )
+            return _marcar_incompleto(response, resultado)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Matching error: {str(e)}")
     
     
     @analysis_router.post("/demo-files")
     async def analyze_demo_files(
+        response: Response,
         certificado: UploadFile = File(...),
         rut: UploadFile = File(...),
         aviso: UploadFile = File(...),
-        valor_proceso: Optional[float] = None
+        valor_proceso: Optional[float] = None,
+        include_timings: bool = False,
+        plazo: Plazo = Depends(_plazo_solicitud)
     ):
         """
         DEMO analysis using file uploads (PDF).
@@ -360,53 +1245,129 @@ if ANALYSIS_AVAILABLE:
             rut: RUT PDF file
             aviso: Tender notice PDF file
             valor_proceso: Optional process value
+            include_timings: Include per-stage timings in metadata (default: False)
             
         Returns:
             Complete analysis with score, traffic light, and recommendations
         """
-        try:
-            manejador = ManejadorDocumentos()
-            
-            # Extract text from PDFs
-            cert_bytes = await certificado.read()
-            rut_bytes = await rut.read()
-            aviso_bytes = await aviso.read()
-            
-            cert_result = manejador.procesar_pdf(cert_bytes, tipo='bytes')
-            rut_result = manejador.procesar_pdf(rut_bytes, tipo='bytes')
-            aviso_result = manejador.procesar_pdf(aviso_bytes, tipo='bytes')
-            
-            if not cert_result['exito']:
-                raise HTTPException(status_code=400, detail=f"Certificate PDF error: {cert_result['error']}")
-            if not rut_result['exito']:
-                raise HTTPException(status_code=400, detail=f"RUT PDF error: {rut_result['error']}")
-            if not aviso_result['exito']:
-                raise HTTPException(status_code=400, detail=f"Notice PDF error: {aviso_result['error']}")
+        async def calcular(rutas: Dict[str, str]) -> Dict[str, Any]:
+            # Extract text and fields from the three PDFs concurrently
+            timestamp_inicio = datetime.now()
+            cronometro = Cronometro()
+            documentos = await _extraer_documentos(plazo=plazo, cronometro=cronometro, **rutas)
             
             # Analyze
-            engine = DemoEngine()
-            resultado = engine.analizar(
-                cert_result['texto'],
-                rut_result['texto'],
-                aviso_result['texto'],
-                valor_proceso
+            return _registrar_tiempos(await capa_ejecucion.ejecutar(
+                'analisis', tareas.evaluar_documentos,
+                documentos['certificado']['datos'],
+                documentos['rut']['datos'],
+                documentos['aviso']['datos'],
+                valor_proceso,
+                timestamp_inicio,
+                plazo=plazo,
+                cronometro=cronometro
+            ))
+        
+        try:
+            # Identical uploads in flight (same documents and value) share one analysis
+            resultado = await _procesar_coalescido(
+                'demo-files',
+                {'certificado': certificado, 'rut': rut, 'aviso': aviso},
+                (valor_proceso,),
+                calcular,
+                plazo=plazo
             )
-            
-            return resultado
+            return _marcar_incompleto(response, _con_tiempos(resultado, include_timings))
         except HTTPException:
             raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Analysis error: {str(e)}")
     
     
+    async def _analizar_y_cotizar(
+        documentos: Dict[str, Dict[str, Any]],
+        valor_proceso: Optional[float],
+        include_pricing: bool,
+        pricing_mode: str,
+        timestamp_inicio: datetime,
+        num_anexos: int = 10,
+        paginas_anexos: Optional[int] = None,
+        notificar: Optional[Notificador] = None,
+        plazo: Optional[Plazo] = None,
+        cronometro: Optional[Cronometro] = None
+    ) -> Dict[str, Any]:
+        """
+        Analyze extracted documents and attach the pricing quote and WhatsApp message.
+        
+        Args:
+            documentos: procesar_documento result per document type
+            valor_proceso: Optional process value
+            include_pricing: Include pricing quote
+            pricing_mode: "enterprise" or "capped"
+            timestamp_inicio: Request start (for processing time)
+            num_anexos: Annex files for the PRO quote
+            paginas_anexos: Total annex pages, when counted
+            notificar: Progress callback for the analysis stages
+            plazo: Request deadline for the analysis stages
+            cronometro: Stage timer holding the extraction times
+            
+        Returns:
+            Analysis results (+ pricing quote); the stage timings are added
+            to the histograms
+        """
+        # Analyze; progress callbacks cannot reach a worker process, so a
+        # streamed analysis is scored on a thread with the shared engine
+        resultado_analisis = await capa_ejecucion.ejecutar(
+            'analisis' if notificar is None else 'lectura', tareas.evaluar_documentos,
+            documentos['certificado']['datos'],
+            documentos['rut']['datos'],
+            documentos['aviso']['datos'],
+            valor_proceso,
+            timestamp_inicio,
+            notificar=notificar,
+            plazo=plazo,
+            cronometro=cronometro
+        )
+        _registrar_tiempos(resultado_analisis)
+        
+        # Add pricing if requested
+        if include_pricing and valor_proceso:
+            from pricing_calculator import calculate_complete_quote
+            from pricing_config import UserType
+            
+            activos = resultado_analisis['datos_extraidos'].get('activos')
+            
+            if activos:
+                pricing_quote = calculate_complete_quote(
+                    assets=activos,
+                    process_value=valor_proceso,
+                    num_annexes=num_anexos,
+                    user_type=UserType.REGULAR,
+                    include_subscription=True,
+                    pricing_mode=pricing_mode,
+                    annex_pages=paginas_anexos
+                )
+                resultado_analisis['pricing'] = pricing_quote
+        
+        # Generate WhatsApp message (a partial analysis has no traffic light to report)
+        if not resultado_analisis.get('incompleto'):
+            resultado_analisis['whatsapp_message'] = generar_mensaje_whatsapp(resultado_analisis)
+        
+        return resultado_analisis
+    
+    
     @analysis_router.post("/process")
     async def process_complete(
+        http_request: Request,
+        response: Response,
         certificado: UploadFile = File(...),
         rut: UploadFile = File(...),
         aviso: UploadFile = File(...),
         valor_proceso: Optional[float] = None,
         include_pricing: bool = True,
-        pricing_mode: str = "enterprise"
+        pricing_mode: str = "enterprise",
+        include_timings: bool = False,
+        plazo: Plazo = Depends(_plazo_solicitud)
     ):
         """
         Complete process: Analysis + Pricing quote.
@@ -420,75 +1381,442 @@ if ANALYSIS_AVAILABLE:
             valor_proceso: Optional process value
             include_pricing: Include pricing quote (default: True)
             pricing_mode: "enterprise" or "capped" (default: "enterprise")
+            include_timings: Include per-stage timings in metadata (default: False)
             
         Returns:
             Analysis results + pricing quote
         """
-        try:
-            manejador = ManejadorDocumentos()
+        async def calcular(rutas: Dict[str, str]) -> Dict[str, Any]:
+            # Extract text and fields from the three PDFs concurrently
+            timestamp_inicio = datetime.now()
+            cronometro = Cronometro()
+            documentos = await _extraer_documentos(plazo=plazo, cronometro=cronometro, **rutas)
             
-            # Extract text from PDFs
-            cert_bytes = await certificado.read()
-            rut_bytes = await rut.read()
-            aviso_bytes = await aviso.read()
-            
-            cert_result = manejador.procesar_pdf(cert_bytes, tipo='bytes')
-            rut_result = manejador.procesar_pdf(rut_bytes, tipo='bytes')
-            aviso_result = manejador.procesar_pdf(aviso_bytes, tipo='bytes')
+            # Annexes are not uploaded in this mode; quote the default count
+            return await _analizar_y_cotizar(
+                documentos, valor_proceso, include_pricing, pricing_mode, timestamp_inicio,
+                plazo=plazo, cronometro=cronometro
+            )
+        
+        try:
+            # Identical uploads in flight (same documents, value and pricing) share one computation
+            resultado = await _procesar_coalescido(
+                'process',
+                {'certificado': certificado, 'rut': rut, 'aviso': aviso},
+                (valor_proceso, include_pricing, pricing_mode),
+                calcular,
+                http_request,
+                plazo
+            )
+            return _marcar_incompleto(response, _con_tiempos(resultado, include_timings))
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Processing error: {str(e)}")
+    
+    
+    @analysis_router.post("/process-stream")
+    async def process_complete_stream(
+        certificado: UploadFile = File(...),
+        rut: UploadFile = File(...),
+        aviso: UploadFile = File(...),
+        valor_proceso: Optional[float] = None,
+        include_pricing: bool = True,
+        pricing_mode: str = "enterprise",
+        include_timings: bool = False,
+        plazo: Plazo = Depends(_plazo_solicitud)
+    ):
+        """
+        Complete process streamed as server-sent events.
+        
+        Same inputs as /process. Partial results are sent as each stage
+        finishes, so the certificate status is available long before the
+        similarity step: 'extraccion' (per document, in completion order),
+        'validacion_estructural', 'similitud', 'validacion_financiera',
+        'score', 'semaforo', then 'resultado' (same body as /process) or
+        'error' with the status code /process would have returned.
+        """
+        async def producir(notificar):
+            timestamp_inicio = datetime.now()
+            cronometro = Cronometro()
+            documentos = await _extraer_documentos(
+                notificar, plazo, cronometro, certificado=certificado, rut=rut, aviso=aviso
+            )
+            resultado = await _analizar_y_cotizar(
+                documentos, valor_proceso, include_pricing, pricing_mode, timestamp_inicio,
+                notificar=notificar, plazo=plazo, cronometro=cronometro
+            )
+            return _con_tiempos(resultado, include_timings)
+        
+        return _respuesta_sse(producir)
+    
+    
+    @analysis_router.post("/process-bundle")
+    async def process_bundle(
+        response: Response,
+        certificado: UploadFile = File(...),
+        rut: UploadFile = File(...),
+        paquete: UploadFile = File(...),
+        valor_proceso: Optional[float] = None,
+        include_pricing: bool = True,
+        pricing_mode: str = "enterprise",
+        include_timings: bool = False,
+        plazo: Plazo = Depends(_plazo_solicitud)
+    ):
+        """
+        Complete process with a ZIP bundle of the tender notice and its annexes.
+        
+        The bundle is read entry by entry: the notice (first PDF named like
+        pliego/aviso/convocatoria) is analyzed, annexes are counted, sized and
+        summarized in parallel, and the real annex count and page total feed
+        the PRO quote.
+        
+        Args:
+            certificado: Certificate PDF file
+            rut: RUT PDF file
+            paquete: ZIP with the tender notice PDF and annex files
+            valor_proceso: Optional process value
+            include_pricing: Include pricing quote (default: True)
+            pricing_mode: "enterprise" or "capped" (default: "enterprise")
+            include_timings: Include per-stage timings in metadata (default: False)
             
-            if not cert_result['exito']:
-                raise HTTPException(status_code=400, detail=f"Certificate PDF error: {cert_result['error']}")
-            if not rut_result['exito']:
-                raise HTTPException(status_code=400, detail=f"RUT PDF error: {rut_result['error']}")
-            if not aviso_result['exito']:
-                raise HTTPException(status_code=400, detail=f"Notice PDF error: {aviso_result['error']}")
+        Returns:
+            Analysis results + pricing quote + bundle summary
+        """
+        try:
+            timestamp_inicio = datetime.now()
+            try:
+                verificar_tamano(paquete.size, BUNDLES['max_bytes_paquete'])
+            except ArchivoDemasiadoGrande as e:
+                raise HTTPException(status_code=413, detail=f"Bundle: {str(e)}")
             
-            # Analyze
-            engine = DemoEngine()
-            resultado_analisis = engine.analizar(
-                cert_result['texto'],
-                rut_result['texto'],
-                aviso_result['texto'],
-                valor_proceso
-            )
+            cronometro = Cronometro()
             
-            # Add pricing if requested
-            if include_pricing and valor_proceso:
-                from pricing_calculator import calculate_complete_quote
-                from pricing_config import UserType
-                
-                activos = resultado_analisis['datos_extraidos'].get('activos')
-                
-                if activos:
-                    pricing_quote = calculate_complete_quote(
-                        assets=activos,
-                        process_value=valor_proceso,
-                        num_annexes=10,  # Default
-                        user_type=UserType.REGULAR,
-                        include_subscription=True,
-                        pricing_mode=pricing_mode
+            async def leer_paquete():
+                # The notice is extracted while the bundle is read
+                with cronometro.medir('extraccion_paquete'):
+                    return await capa_ejecucion.ejecutar(
+                        'lectura', tareas.procesar_paquete, paquete.file,
+                        ejecutor_paginas=capa_ejecucion.etapa('pdf'),
+                        max_paginas=PDF_EXTRACTION['max_paginas'],
+                        plazo=plazo
                     )
-                    resultado_analisis['pricing'] = pricing_quote
             
-            # Generate WhatsApp message
-            resultado_analisis['whatsapp_message'] = generar_mensaje_whatsapp(resultado_analisis)
+            tarea_paquete = asyncio.ensure_future(leer_paquete())
+            try:
+                documentos = await _extraer_documentos(
+                    plazo=plazo, cronometro=cronometro, certificado=certificado, rut=rut
+                )
+                try:
+                    resumen = await tarea_paquete
+                except PaqueteInvalido as e:
+                    raise HTTPException(status_code=400, detail=str(e))
+                except ArchivoDemasiadoGrande as e:
+                    raise HTTPException(status_code=413, detail=f"Bundle: {str(e)}")
+            finally:
+                tarea_paquete.cancel()
             
-            return resultado_analisis
+            if not resumen['aviso']['exito']:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"{ETIQUETAS_DOCUMENTOS['aviso']} PDF error: {resumen['aviso']['error']}"
+                )
+            documentos['aviso'] = resumen.pop('aviso')
+            _contar_paginas('aviso', documentos['aviso'])
+            for anexo in resumen['anexos']:
+                if anexo['num_paginas']:
+                    _contar_paginas('anexo', anexo)
+            
+            resultado = await _analizar_y_cotizar(
+                documentos, valor_proceso, include_pricing, pricing_mode, timestamp_inicio,
+                num_anexos=resumen['num_anexos'],
+                paginas_anexos=resumen['paginas_anexos'],
+                plazo=plazo,
+                cronometro=cronometro
+            )
+            resultado['paquete'] = resumen
+            return _marcar_incompleto(response, _con_tiempos(resultado, include_timings))
         except HTTPException:
             raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Processing error: {str(e)}")
     
     
+    # Job types accepted by the job API
+    TIPOS_TRABAJO = ('pro', 'demo')
+    
+    
+    def _marca_tiempo(segundos: Optional[float]) -> Optional[str]:
+        return datetime.fromtimestamp(segundos).isoformat() if segundos is not None else None
+    
+    
+    def _estado_trabajo(trabajo: Dict[str, Any]) -> Dict[str, Any]:
+        """Public status of a queued job (queries the queue: run it on the 'lectura' stage)"""
+        return {
+            'job_id': trabajo['id'],
+            'tipo': trabajo['tipo'],
+            'estado': trabajo['estado'],
+            'prioridad': trabajo['prioridad'],
+            'posicion': cola_trabajos.posicion(trabajo['id']),
+            'intentos': trabajo['intentos'],
+            'creado_en': _marca_tiempo(trabajo['creado_en']),
+            'iniciado_en': _marca_tiempo(trabajo['iniciado_en']),
+            'terminado_en': _marca_tiempo(trabajo['terminado_en']),
+            'error': trabajo['error']
+        }
+    
+    
+    async def _ejecutar_trabajo(trabajo: Dict[str, Any]) -> Dict[str, Any]:
+        """Run a queued job through the same pipeline as the synchronous endpoints"""
+        parametros = trabajo['parametros']
+        timestamp_inicio = datetime.now()
+        cronometro = Cronometro()
+        documentos = await _extraer_documentos(cronometro=cronometro, **parametros['archivos'])
+        
+        if trabajo['tipo'] == 'demo':
+            return _registrar_tiempos(await capa_ejecucion.ejecutar(
+                'analisis', tareas.evaluar_documentos,
+                documentos['certificado']['datos'],
+                documentos['rut']['datos'],
+                documentos['aviso']['datos'],
+                parametros['valor_proceso'],
+                timestamp_inicio,
+                cronometro=cronometro
+            ))
+        return await _analizar_y_cotizar(
+            documentos,
+            parametros['valor_proceso'],
+            parametros['include_pricing'],
+            parametros['pricing_mode'],
+            timestamp_inicio,
+            cronometro=cronometro
+        )
+    
+    
+    def _correr_trabajo(trabajo: Dict[str, Any]) -> Dict[str, Any]:
+        """Job worker entry point: run the job on this thread's own event loop"""
+        return asyncio.run(_ejecutar_trabajo(trabajo))
+    
+    
+    pool_trabajos = PoolTrabajos(
+        cola_trabajos,
+        _correr_trabajo,
+        trabajadores=JOBS['trabajadores'],
+        intervalo_sondeo=JOBS['intervalo_sondeo'],
+        retencion=JOBS['retencion_horas'] * 3600,
+        directorio=JOBS['directorio']
+    )
+    
+    
+    @analysis_router.post("/jobs", status_code=202)
+    async def submit_job(
+        certificado: UploadFile = File(...),
+        rut: UploadFile = File(...),
+        aviso: UploadFile = File(...),
+        tipo: str = "pro",
+        valor_proceso: Optional[float] = None,
+        include_pricing: bool = True,
+        pricing_mode: str = "enterprise"
+    ):
+        """
+        Queue an analysis and return immediately with a job id.
+        
+        The uploads are spooled to disk and the job is stored in a durable
+        queue, so it survives restarts. PRO jobs (analysis + pricing, like
+        /process) run ahead of DEMO jobs (analysis only, like /demo-files).
+        Poll GET /jobs/{job_id} and fetch GET /jobs/{job_id}/result.
+        
+        Args:
+            certificado: Certificate PDF file
+            rut: RUT PDF file
+            aviso: Tender notice PDF file
+            tipo: "pro" or "demo" (default: "pro")
+            valor_proceso: Optional process value
+            include_pricing: Include pricing quote in PRO jobs (default: True)
+            pricing_mode: "enterprise" or "capped" (default: "enterprise")
+            
+        Returns:
+            Job status with its id and queue position
+        """
+        if tipo not in TIPOS_TRABAJO:
+            raise HTTPException(status_code=422, detail=f"Unknown job type: {tipo}")
+        
+        id_trabajo = uuid.uuid4().hex
+        directorio = pool_trabajos.directorio_trabajo(id_trabajo)
+        os.makedirs(directorio, exist_ok=True)
+        try:
+            cargas = await _guardar_documentos(directorio, certificado=certificado, rut=rut, aviso=aviso)
+            await capa_ejecucion.ejecutar(
+                'lectura',
+                cola_trabajos.encolar,
+                tipo,
+                {
+                    'archivos': {nombre: carga.ruta for nombre, carga in cargas.items()},
+                    'valor_proceso': valor_proceso,
+                    'include_pricing': include_pricing,
+                    'pricing_mode': pricing_mode
+                },
+                prioridad=JOBS['prioridades'][tipo],
+                id_trabajo=id_trabajo
+            )
+        except BaseException:
+            shutil.rmtree(directorio, ignore_errors=True)
+            raise
+        
+        pool_trabajos.iniciar()
+        pool_trabajos.notificar()
+        trabajo = await capa_ejecucion.ejecutar('lectura', cola_trabajos.obtener, id_trabajo)
+        return await capa_ejecucion.ejecutar('lectura', _estado_trabajo, trabajo)
+    
+    
+    @analysis_router.get("/jobs/metrics")
+    async def get_job_metrics():
+        """Job queue depth, throughput and queue latency"""
+        return await capa_ejecucion.ejecutar('lectura', pool_trabajos.estadisticas, JOBS['ventana_metricas'])
+    
+    
+    @analysis_router.get("/jobs/{job_id}")
+    async def get_job_status(job_id: str):
+        """Get the status of a queued job"""
+        trabajo = await capa_ejecucion.ejecutar('lectura', cola_trabajos.obtener, job_id)
+        if trabajo is None:
+            raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+        return await capa_ejecucion.ejecutar('lectura', _estado_trabajo, trabajo)
+    
+    
+    @analysis_router.get("/jobs/{job_id}/result")
+    async def get_job_result(job_id: str, include_timings: bool = False):
+        """
+        Get the result of a finished job.
+        
+        Returns the analysis result once the job is complete (with per-stage
+        timings in metadata if include_timings), 202 with the job status
+        while it is pending or running, and the job's own error status
+        (e.g. 400 for an unreadable PDF) if it failed.
+        """
+        trabajo = await capa_ejecucion.ejecutar('lectura', cola_trabajos.obtener, job_id)
+        if trabajo is None:
+            raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+        if trabajo['estado'] == COMPLETADO:
+            return _con_tiempos(trabajo['resultado'], include_timings)
+        if trabajo['estado'] == FALLIDO:
+            raise HTTPException(status_code=trabajo['codigo_error'] or 500, detail=trabajo['error'])
+        return JSONResponse(
+            status_code=202, content=await capa_ejecucion.ejecutar('lectura', _estado_trabajo, trabajo)
+        )
+    
+    
+    @analysis_router.get("/timings")
+    async def get_stage_timings():
+        """
+        Latency histograms per analysis stage.
+        
+        Count, mean, max and estimated p50/p95/p99 in milliseconds of every
+        stage (extractors, structural validation, similarity by metric,
+        financial validation, score, traffic light, recommendation, missing
+        items) over the analyses computed by this worker process since it
+        started. Cache hits and coalesced requests are not counted again.
+        """
+        return histogramas_etapas.estadisticas()
+    
+    
+    def _limites_admision() -> Dict:
+        return {
+            "rate_limit": limitador_clientes.estadisticas(),
+            "concurrency": control_admision.estadisticas()
+        }
+    
+    
+    def _requerir_admin(
+        x_admin_token: Optional[str] = Header(None, description="Admin token (ADMIN['variable_token'])")
+    ) -> None:
+        """Reject admin requests unless they carry the configured admin token"""
+        esperado = os.environ.get(ADMIN['variable_token'])
+        if not esperado:
+            raise HTTPException(status_code=403, detail="Admin endpoints disabled: no admin token configured")
+        if x_admin_token is None or not hmac.compare_digest(x_admin_token.encode(), esperado.encode()):
+            raise HTTPException(status_code=401, detail="Invalid admin token")
+    
+    
+    @analysis_router.get("/admin/limits", dependencies=[Depends(_requerir_admin)])
+    async def get_admission_limits():
+        """Current admission limits and rejection counters"""
+        return _limites_admision()
+    
+    
+    @analysis_router.put("/admin/limits", dependencies=[Depends(_requerir_admin)])
+    async def update_admission_limits(request: AdmissionLimitsRequest):
+        """
+        Change admission limits without a restart (omitted fields are kept).
+        
+        Requests already admitted keep their slot; the new limits apply to
+        the next requests of this worker process.
+        """
+        cambios = request.model_dump(exclude_none=True)
+        limitador_clientes.configurar(
+            tasa=cambios.get('tasa_por_cliente'), rafaga=cambios.get('rafaga_por_cliente')
+        )
+        control_admision.configurar(
+            max_concurrentes=cambios.get('max_concurrentes'),
+            max_en_espera=cambios.get('max_en_espera'),
+            espera_maxima=cambios.get('espera_maxima_segundos')
+        )
+        ADMISSION.update(cambios)
+        logger.info(f"Admission limits updated: {cambios}")
+        return _limites_admision()
+    
+    
+    @analysis_router.post("/admin/reload", dependencies=[Depends(_requerir_admin)])
+    async def reload_analysis_engine():
+        """
+        Rebuild and warm the analysis engines after a configuration change.
+        
+        The shared engine is swapped atomically and worker pools are replaced;
+        requests already in flight finish on the previous engine and workers.
+        """
+        try:
+            loop = asyncio.get_running_loop()
+            version = await loop.run_in_executor(None, registro_motores.recargar)
+            await loop.run_in_executor(None, capa_ejecucion.reiniciar, tareas.calentar_trabajador)
+            return {"status": "ok", "engine_version": version}
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Reload error: {str(e)}")
+    
+    
     @analysis_router.get("/health")
     async def analysis_health_check():
         """Health check for analysis system"""
         return {
             "status": "ok",
             "service": "LicitIA Analysis Engine",
-            "modules_loaded": ANALYSIS_AVAILABLE
+            "modules_loaded": ANALYSIS_AVAILABLE,
+            "engine_version": registro_motores.version,
+            "executors": capa_ejecucion.estadisticas(),
+            "result_cache": cache_resultados.estadisticas(),
+            "coalescing": coalescedor.estadisticas(),
+            "idempotency": almacen_idempotencia.estadisticas(),
+            "admission": _limites_admision(),
+            "jobs": await capa_ejecucion.ejecutar('lectura', pool_trabajos.estadisticas, JOBS['ventana_metricas'])
         }
     
     
     # Register analysis router
     app.include_router(analysis_router)
+
+
+# Registered last so it wraps every other middleware (admission rejections are counted too)
+app.add_middleware(
+    MiddlewareMetricas,
+    registro=metricas,
+    modos_precio=(PRICING_MODE_ENTERPRISE, PRICING_MODE_CAPPED)
+)
+
+# CORS middleware configuration, registered last so it is the outermost layer:
+# idempotent replays and admission rejections carry the CORS headers too
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=['*'],
+    allow_credentials=True,
+    allow_methods=['*'],
+    allow_headers=['*']
+)
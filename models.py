@@ -170,3 +170,70 @@ class ErrorResponse(BaseModel):
     """Error response model"""
     error: str
     detail: Optional[str] = None
+
+
+# ==================== ANALYSIS MODELS ====================
+
+class TenderCandidate(BaseModel):
+    """Tender candidate for company matching"""
+    id: str = Field(..., description="Tender identifier")
+    objeto_contrato: str = Field(..., description="Contract object text")
+
+
+class TenderMatchRequest(BaseModel):
+    """Request model for top-K tender matching"""
+    objeto_social: str = Field(..., description="Company business object")
+    actividades_secundarias: Optional[str] = Field(
+        "",
+        description="Company secondary activities"
+    )
+    avisos: List[TenderCandidate] = Field(
+        ...,
+        description="Tender index to match against"
+    )
+    k: int = Field(
+        10,
+        ge=1,
+        le=500,
+        description="Number of best matches to return"
+    )
+
+
+class BatchTender(BaseModel):
+    """Tender notice for batch analysis"""
+    id: Optional[str] = Field(None, description="Tender identifier")
+    aviso: str = Field(..., description="Tender notice text")
+    valor_proceso: Optional[float] = Field(None, description="Optional process value")
+
+
+class BatchAnalysisRequest(BaseModel):
+    """Request model for one company against many tenders"""
+    certificado: str = Field(..., description="Certificate text")
+    rut: str = Field(..., description="RUT text")
+    avisos: List[BatchTender] = Field(
+        ...,
+        min_length=1,
+        max_length=200,
+        description="Tender notices to analyze"
+    )
+
+
+class CompanyProfileRequest(BaseModel):
+    """Request model for storing a company profile"""
+    certificado: str = Field(..., description="Certificate text")
+    rut: str = Field(..., description="RUT text")
+
+
+class ProfileAnalysisRequest(BaseModel):
+    """Request model for analyzing a stored company profile against one tender"""
+    aviso: str = Field(..., description="Tender notice text")
+    valor_proceso: Optional[float] = Field(None, description="Optional process value")
+
+
+class AdmissionLimitsRequest(BaseModel):
+    """Request model for changing analysis admission limits at runtime (omitted fields keep their value)"""
+    tasa_por_cliente: Optional[float] = Field(None, gt=0, description="Requests per second per client")
+    rafaga_por_cliente: Optional[int] = Field(None, ge=1, description="Burst size per client")
+    max_concurrentes: Optional[int] = Field(None, ge=1, description="Concurrent analysis requests")
+    max_en_espera: Optional[int] = Field(None, ge=0, description="Requests waiting for a slot")
+    espera_maxima_segundos: Optional[float] = Field(None, ge=0, description="Max wait for a slot")
@@ -151,7 +151,8 @@ def calculate_pro_price(
     process_value: int,
     num_annexes: int = 0,
     user_type: UserType = UserType.REGULAR,
-    pricing_mode: str = PRICING_MODE_ENTERPRISE
+    pricing_mode: str = PRICING_MODE_ENTERPRISE,
+    annex_pages: Optional[int] = None
 ) -> Dict[str, Any]:
     """
     Calculate PRO tier pricing (complete analysis).
@@ -165,6 +166,8 @@ def calculate_pro_price(
         num_annexes: Number of annex files (first 10 included)
         user_type: Type of user for discount eligibility
         pricing_mode: "enterprise" (full range) or "capped" (20-80K max)
+        annex_pages: Total annex pages, when counted from the uploaded
+            files (reported in the breakdown; does not change the price)
         
     Returns:
         Dictionary with pricing breakdown
@@ -237,7 +240,8 @@ def calculate_pro_price(
         "breakdown": {
             "assets": assets,
             "process_value": process_value,
-            "user_type": user_type.value
+            "user_type": user_type.value,
+            "annex_pages": annex_pages
         }
     }
 
@@ -340,7 +344,8 @@ def calculate_complete_quote(
     num_annexes: int = 0,
     user_type: UserType = UserType.REGULAR,
     include_subscription: bool = True,
-    pricing_mode: str = PRICING_MODE_ENTERPRISE
+    pricing_mode: str = PRICING_MODE_ENTERPRISE,
+    annex_pages: Optional[int] = None
 ) -> Dict[str, Any]:
     """
     Calculate complete quote with PLUS, PRO, and subscription options.
@@ -352,12 +357,13 @@ def calculate_complete_quote(
         user_type: Type of user
         include_subscription: Whether to include subscription plans
         pricing_mode: "enterprise" (full range) or "capped" (20-80K max)
+        annex_pages: Total annex pages, when counted from the uploaded files
         
     Returns:
         Complete quote with all options
     """
     plus_pricing = calculate_plus_price(assets, process_value, user_type, pricing_mode)
-    pro_pricing = calculate_pro_price(assets, process_value, num_annexes, user_type, pricing_mode)
+    pro_pricing = calculate_pro_price(assets, process_value, num_annexes, user_type, pricing_mode, annex_pages)
     
     result = {
         "plus": plus_pricing,
@@ -151,6 +151,22 @@ class TestProPricing:
         assert result["annexes_surcharge"] == 0
         assert result["included_annexes"] == 10
     
+    def test_pro_annex_pages_reported(self):
+        """Test counted annex pages are reported without changing the price"""
+        result = calculate_pro_price(
+            assets=100_000_000,  # A1
+            process_value=50_000_000,  # V1
+            num_annexes=3,
+            annex_pages=120
+        )
+        baseline = calculate_pro_price(
+            assets=100_000_000,
+            process_value=50_000_000,
+            num_annexes=3
+        )
+        assert result["breakdown"]["annex_pages"] == 120
+        assert result["final_price"] == baseline["final_price"]
+    
     def test_pro_package_better_than_individual(self):
         """Test that package pricing is used when better"""
         result = calculate_pro_price(
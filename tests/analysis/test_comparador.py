@@ -0,0 +1,78 @@
+"""Tests for comparador module"""
+
+import pytest
+from core.comparador import ComparadorTextos, plegar_acentos, raiz_palabra
+
+
+def test_plegar_acentos():
+    """Test accent folding"""
+    assert plegar_acentos('gestión técnica marítima') == 'gestion tecnica maritima'
+
+
+def test_raiz_palabra_variantes():
+    """Test light stemmer collapses gender and plural variants"""
+    assert raiz_palabra('pesquero') == raiz_palabra('pesquera')
+    assert raiz_palabra('servicio') == raiz_palabra('servicios')
+    assert raiz_palabra('gestion') == raiz_palabra('gestiones')
+    assert raiz_palabra('obra') == raiz_palabra('obras')
+
+
+def test_normalizacion_acentos_y_stopwords():
+    """Test accented words match and accented stopwords are removed"""
+    comparador = ComparadorTextos()
+    texto = comparador._normalizar_texto('Gestión según los servicios pesqueros')
+    palabras = comparador._extraer_palabras(texto)
+    
+    assert 'segun' not in palabras
+    assert palabras == ['gestion', 'servici', 'pesquer']
+
+
+def test_similitud_con_acentos():
+    """Test accented and unaccented texts are identical after normalization"""
+    comparador = ComparadorTextos()
+    similitud, detalle = comparador.calcular_similitud_completa(
+        'Gestión pesquera artesanal', 'gestion pesquero artesanal'
+    )
+    
+    assert detalle['similitud_keywords'] == 1.0
+    assert detalle['boost_importantes'] == 1.0
+    assert similitud > 0.9
+
+
+def test_buscar_top_k_igual_a_fuerza_bruta():
+    """Test pruned top-K returns the same ranking as exhaustive scoring"""
+    comparador = ComparadorTextos()
+    objeto_social = 'Pesca artesanal y gestión ambiental de comunidades'
+    avisos = {
+        'a1': 'Fortalecimiento de la pesca artesanal',
+        'a2': 'Construcción de obras civiles y vías',
+        'a3': 'Gestión ambiental con comunidades pesqueras',
+        'a4': 'Suministro de alimentos para colegios',
+        'a5': 'Transporte escolar rural',
+    }
+    
+    resultado = comparador.buscar_top_k(objeto_social, '', avisos, k=2)
+    
+    esperado = sorted(
+        avisos, key=lambda a: comparador.calcular_similitud_completa(objeto_social, avisos[a])[0],
+        reverse=True
+    )[:2]
+    assert [r['id'] for r in resultado['resultados']] == esperado
+    assert resultado['metadata']['podados'] > 0
+    assert resultado['metadata']['evaluados'] + resultado['metadata']['podados'] == len(avisos)
+    assert resultado['metadata']['no_evaluados'] == 0
+
+
+def test_buscar_top_k_con_plazo_vencido():
+    """Test an expired deadline stops the scan with a partial, flagged result"""
+    from core.plazo import Plazo
+    avisos = {str(i): f'Construccion de obras civiles lote {i}' for i in range(20)}
+    
+    resultado = ComparadorTextos().buscar_top_k('Construccion de obras civiles', '', avisos, k=3, plazo=Plazo(0))
+    
+    assert resultado['incompleto'] is True
+    assert resultado['resultados'] == []
+    assert resultado['metadata']['evaluados'] == 0
+    assert resultado['metadata']['podados'] == 0
+    assert resultado['metadata']['no_evaluados'] == len(avisos)
+    assert ComparadorTextos().buscar_top_k('Construccion de obras civiles', '', avisos, k=3)['incompleto'] is False
@@ -0,0 +1,120 @@
+"""Tests for the DEMO engine and its shared registry"""
+
+import threading
+import pytest
+from core.plazo import Plazo
+from demo_engine import DemoEngine, RegistroMotores
+
+
+def test_registro_comparte_motor():
+    """Test every caller gets the same engine instance"""
+    registro = RegistroMotores()
+    motores = []
+    hilos = [threading.Thread(target=lambda: motores.append(registro.obtener())) for _ in range(8)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    
+    assert len({id(motor) for motor in motores}) == 1
+    assert registro.version == 1
+
+
+def test_recargar_no_afecta_referencias_en_curso():
+    """Test reload swaps the engine while old references keep working"""
+    registro = RegistroMotores()
+    anterior = registro.calentar()
+    
+    version = registro.recargar()
+    
+    assert version == 2
+    assert registro.obtener() is not anterior
+    resultado = anterior.analizar('NIT: 123456789 Estado: ACTIVA', 'NIT: 123456789 Estado: ACTIVO', 'OBJETO: Obras')
+    assert resultado['semaforo'] in ['VERDE', 'AMARILLO', 'ROJO']
+
+
+def test_recargar_con_nueva_fabrica():
+    """Test reload can install a new engine factory"""
+    class MotorPersonalizado(DemoEngine):
+        pass
+    
+    registro = RegistroMotores()
+    registro.recargar(MotorPersonalizado)
+    
+    assert isinstance(registro.obtener(), MotorPersonalizado)
+
+
+def test_analizar_notifica_etapas():
+    """Test each stage reports its partial result before the analysis returns"""
+    eventos = []
+    resultado = DemoEngine().analizar(
+        'NIT: 123456789 Estado: ACTIVA', 'NIT: 123456789 Estado: ACTIVO', 'OBJETO: Obras',
+        notificar=lambda evento, datos: eventos.append((evento, datos))
+    )
+    
+    assert [evento for evento, _ in eventos] == [
+        'extraccion', 'extraccion', 'validacion_estructural', 'extraccion',
+        'similitud', 'validacion_financiera', 'score', 'semaforo'
+    ]
+    assert [datos['documento'] for evento, datos in eventos if evento == 'extraccion'] == ['certificado', 'rut', 'aviso']
+    assert eventos[2][1]['estado_certificado'] == resultado['datos_extraidos']['estado_certificado']
+    assert eventos[-1][1]['semaforo'] == resultado['semaforo']
+
+
+class _Reloj:
+    def __init__(self):
+        self.ahora = 0.0
+    
+    def __call__(self):
+        return self.ahora
+
+
+def test_plazo_vencido_devuelve_resultado_parcial():
+    """Test stages after the deadline are skipped and the result is flagged incompleto"""
+    reloj = _Reloj()
+    plazo = Plazo(10, reloj=reloj)
+    eventos = []
+    
+    def notificar(evento, datos):
+        eventos.append(evento)
+        if evento == 'similitud':
+            reloj.ahora = 11
+    
+    resultado = DemoEngine().analizar(
+        'NIT: 123456789 Estado: ACTIVA', 'NIT: 123456789 Estado: ACTIVO', 'OBJETO: Obras',
+        valor_proceso=100000000, notificar=notificar, plazo=plazo
+    )
+    
+    assert resultado['incompleto'] is True
+    assert resultado['etapa_interrumpida'] == 'validacion_financiera'
+    assert eventos[-1] == 'similitud'
+    assert resultado['similitud'] is not None
+    assert (resultado['semaforo'], resultado['score']) == (None, None)
+    assert resultado['datos_extraidos']['valor_proceso'] == 100000000
+    
+    vencido = DemoEngine().analizar('NIT: 1', 'NIT: 1', 'OBJETO: Obras', plazo=Plazo(0))
+    assert (vencido['incompleto'], vencido['etapa_interrumpida']) == (True, 'extraccion')
+    
+    completo = DemoEngine().analizar('NIT: 1', 'NIT: 1', 'OBJETO: Obras', plazo=Plazo(60))
+    assert completo['incompleto'] is False
+    assert completo['semaforo'] is not None
+
+
+def test_analizar_mide_etapas():
+    """Test every stage is timed in metadata, similarity broken down by metric"""
+    resultado = DemoEngine().analizar(
+        'NIT: 123456789 Estado: ACTIVA', 'NIT: 123456789 Estado: ACTIVO', 'OBJETO: Obras',
+        valor_proceso=100000000
+    )
+    
+    tiempos = resultado['metadata']['tiempos_etapas_ms']
+    assert {
+        'extraccion_certificado', 'extraccion_rut', 'extraccion_aviso', 'validacion_estructural',
+        'similitud', 'similitud.keywords', 'similitud.secuencia', 'similitud.ngramas',
+        'validacion_financiera', 'score', 'semaforo', 'recomendacion', 'faltantes', 'total'
+    } <= set(tiempos)
+    assert all(ms >= 0 for ms in tiempos.values())
+    assert tiempos['total'] >= tiempos['similitud'] >= tiempos['similitud.keywords']
+    
+    parcial = DemoEngine().analizar('NIT: 1', 'NIT: 1', 'OBJETO: Obras', plazo=Plazo(0))
+    assert 'total' in parcial['metadata']['tiempos_etapas_ms']
@@ -80,3 +80,100 @@ def test_extractor_certificado_missing_data():
     assert resultado['nit'] is None
     assert resultado['razon_social'] is None
     assert resultado['activos'] is None
+
+
+def test_extraccion_incremental_se_detiene_con_campos_completos():
+    """Test incremental extraction with every field found stops at the section boundary"""
+    paginas = [
+        "NIT: 900123456-1\nRazón Social: EMPRESA CONSTRUCTORA DEL CARIBE S.A.S. Sigla: ECC\n"
+        "Fecha expedición: 01/01/2024\nEstado: ACTIVA",
+        "OBJETO SOCIAL: Construcción de obras civiles, consultoría técnica e interventoría de proyectos\n"
+        "CAPITAL\nACTIVOS: $150,000,000\nPATRIMONIO: $90,000,000\nREPRESENTANTE LEGAL: PEDRO PEREZ\n"
+        "Identificacion: CC 1234567\nMunicipio: Barranquilla\n"
+        "Actividades secundarias: Alquiler de maquinaria pesada para obras de ingenieria civil\nFIN",
+        "Página de anexos sin campos\nCERTIFICAS ESPECIALES",
+        "Otra página de anexos",
+    ]
+    
+    resultado = ExtractorCertificado().extraer_incremental(enumerate(paginas))
+    
+    assert resultado['parada'] == 'fin_seccion'
+    assert resultado['paginas_leidas'] == 3
+    assert resultado['datos']['nit'] == '9001234561'
+    assert resultado['datos']['representante_legal'] == 'PEDRO PEREZ'
+
+
+def test_extraccion_incremental_fin_de_seccion():
+    """Test incremental extraction stops at a section boundary"""
+    paginas = [
+        "PROCESO: LP-2024-001\nENTIDAD: GOBERNACION DEL DEPARTAMENTO\n",
+        "CRONOGRAMA DEL PROCESO\nApertura: 01/02/2024",
+        "VALOR ESTIMADO: $200,000,000",
+    ]
+    
+    resultado = ExtractorAviso().extraer_incremental(enumerate(paginas))
+    
+    assert resultado['parada'] == 'fin_seccion'
+    assert resultado['paginas_leidas'] == 2
+    assert resultado['datos']['numero_proceso'] == 'LP-2024-001'
+    assert resultado['datos']['valor_estimado'] is None
+
+
+def test_extraccion_incremental_igual_a_completa():
+    """Test fields beyond the first page are not lost by stopping early"""
+    certificado = [
+        "NIT: 900123456-1\nRazón Social: EMPRESA CONSTRUCTORA DEL CARIBE S.A.S. Sigla: ECC\n"
+        "Fecha expedición: 01/01/2024\nEstado: ACTIVA\n"
+        "OBJETO SOCIAL: Construcción de obras civiles, consultoría técnica e interventoría de proyectos\n"
+        "CAPITAL\nACTIVOS: $150,000,000\nREPRESENTANTE LEGAL: PEDRO PEREZ\nIdentificacion: CC 1234567\n",
+        "Actividades secundarias: Alquiler de maquinaria pesada para obras de ingenieria civil\n"
+        "PATRIMONIO: $90,000,000\nMunicipio: Barranquilla\n",
+    ]
+    aviso = [
+        "PROCESO: LP-2024-001\nENTIDAD: GOBERNACION DEL DEPARTAMENTO\n"
+        "OBJETO DEL CONTRATO: Construcción y mejoramiento de la red vial terciaria del departamento\n"
+        "VALOR ESTIMADO: $200,000,000\nPLAZO: Seis meses\n",
+        "DESCRIPCION: Obras de pavimentación, drenaje y señalización en veinte tramos rurales priorizados\n"
+        "Se exige RUP y experiencia certificada\n",
+    ]
+    
+    for extractor, paginas in ((ExtractorCertificado(), certificado), (ExtractorAviso(), aviso)):
+        resultado = extractor.extraer_incremental(enumerate(paginas))
+        
+        assert resultado['paginas_leidas'] == 2
+        assert resultado['datos'] == extractor.extraer('\n'.join(paginas))
+    
+    datos_certificado = ExtractorCertificado().extraer_incremental(enumerate(certificado))['datos']
+    assert datos_certificado['actividades_secundarias'] is not None
+    assert datos_certificado['patrimonio'] == 90000000
+    assert datos_certificado['municipio'] == 'Barranquilla'
+
+
+def test_extraccion_incremental_estado_posterior():
+    """Test a later cancellation overrides an early 'vigente' as in full extraction"""
+    paginas = [
+        "NIT: 900123456-1\nRazón Social: EMPRESA CONSTRUCTORA DEL CARIBE S.A.S. Sigla: ECC\n"
+        "Fecha expedición: 01/01/2024\nMatrícula vigente\n"
+        "OBJETO SOCIAL: Construcción de obras civiles, consultoría técnica e interventoría de proyectos\n"
+        "CAPITAL\nACTIVOS: $150,000,000\nPATRIMONIO: $90,000,000\nREPRESENTANTE LEGAL: PEDRO PEREZ\n"
+        "Identificacion: CC 1234567\nMunicipio: Barranquilla\n"
+        "Actividades secundarias: Alquiler de maquinaria pesada para obras de ingenieria civil\n",
+        "Sociedad liquidada el 15 de marzo de 2024\n",
+        "REFORMAS DE ESTATUTOS\n",
+        "Página posterior al certificado",
+    ]
+    extractor = ExtractorCertificado()
+    
+    resultado = extractor.extraer_incremental(enumerate(paginas))
+    
+    assert resultado['parada'] == 'fin_seccion'
+    assert resultado['paginas_leidas'] == 3
+    assert resultado['datos']['estado'] == 'INACTIVO'
+    assert resultado['datos'] == extractor.extraer('\n'.join(paginas))
+
+
+def test_campos_requeridos_cubren_extraccion():
+    """Test the early-exit field list covers every field extraer() returns"""
+    for extractor in (ExtractorCertificado(), ExtractorRUT(), ExtractorAviso()):
+        campos = set(extractor.CAMPOS_REQUERIDOS) | set(extractor.CAMPOS_ACUMULATIVOS)
+        assert campos == set(extractor.extraer('texto sin datos'))
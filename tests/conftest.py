@@ -0,0 +1,68 @@
+"""Shared test fixtures"""
+
+import os
+import shutil
+import tempfile
+
+import pytest
+
+
+# Temporary data directory created for this test session (None if LICITIA_DATA_DIR was set)
+_datos_temporales = None
+
+
+def pytest_configure(config):
+    """Keep the app's SQLite databases out of the data directory while main is imported"""
+    global _datos_temporales
+    if not os.environ.get('LICITIA_DATA_DIR'):
+        _datos_temporales = tempfile.mkdtemp(prefix='licitia-pruebas-')
+        os.environ['LICITIA_DATA_DIR'] = _datos_temporales
+
+
+def pytest_unconfigure(config):
+    if _datos_temporales is not None:
+        os.environ.pop('LICITIA_DATA_DIR', None)
+        shutil.rmtree(_datos_temporales, ignore_errors=True)
+
+
+def construir_pdf(paginas):
+    """Build a minimal text PDF with one page per string"""
+    objetos = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # Pages, filled once page ids are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    ids_paginas = []
+    for texto in paginas:
+        lineas = [
+            f"({linea.replace('(', '[').replace(')', ']')}) Tj T*".encode('latin-1')
+            for linea in texto.split('\n')
+        ]
+        contenido = b"BT /F1 10 Tf 14 TL 40 800 Td " + b" ".join(lineas) + b" ET"
+        objetos.append(b"<< /Length %d >>\nstream\n" % len(contenido) + contenido + b"\nendstream")
+        id_contenido = len(objetos)
+        objetos.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % id_contenido
+        )
+        ids_paginas.append(len(objetos))
+    kids = b" ".join(b"%d 0 R" % i for i in ids_paginas)
+    objetos[1] = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % len(ids_paginas)
+    
+    salida = bytearray(b"%PDF-1.4\n")
+    desplazamientos = []
+    for numero, objeto in enumerate(objetos, 1):
+        desplazamientos.append(len(salida))
+        salida += b"%d 0 obj\n" % numero + objeto + b"\nendobj\n"
+    inicio_xref = len(salida)
+    salida += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objetos) + 1)
+    for desplazamiento in desplazamientos:
+        salida += b"%010d 00000 n \n" % desplazamiento
+    salida += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objetos) + 1, inicio_xref)
+    return bytes(salida)
+
+
+@pytest.fixture
+def generar_pdf():
+    """Factory fixture building minimal text PDFs"""
+    return construir_pdf
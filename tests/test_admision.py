@@ -0,0 +1,94 @@
+"""Tests for analysis admission control"""
+
+import asyncio
+
+import pytest
+from utils.admision import ControlAdmision, LimitadorTokens, Sobrecarga
+
+
+class _Reloj:
+    def __init__(self):
+        self.ahora = 0.0
+    
+    def __call__(self):
+        return self.ahora
+
+
+def test_limitador_rafaga_y_recarga():
+    """Test a client gets its burst, then one request per refill interval"""
+    reloj = _Reloj()
+    limitador = LimitadorTokens(tasa=2.0, rafaga=3, reloj=reloj)
+    for _ in range(3):
+        limitador.consumir('a')
+    with pytest.raises(Sobrecarga) as error:
+        limitador.consumir('a')
+    assert error.value.reintentar_en == pytest.approx(0.5)
+    assert error.value.retry_after == '1'
+    
+    # Other clients have their own bucket
+    limitador.consumir('b')
+    
+    reloj.ahora += 0.5
+    limitador.consumir('a')
+    with pytest.raises(Sobrecarga):
+        limitador.consumir('a')
+    assert limitador.estadisticas()['rechazadas'] == 2
+    
+    limitador.reiniciar()
+    for _ in range(3):
+        limitador.consumir('a')
+
+
+def test_limitador_reconfigurado():
+    """Test a lower burst applies to existing buckets"""
+    reloj = _Reloj()
+    limitador = LimitadorTokens(tasa=1.0, rafaga=10, reloj=reloj)
+    limitador.consumir('a')
+    limitador.configurar(rafaga=1)
+    limitador.consumir('a')
+    with pytest.raises(Sobrecarga):
+        limitador.consumir('a')
+
+
+def test_control_limita_concurrencia_y_cola():
+    """Test requests beyond the cap wait in a bounded queue and get slots in order"""
+    async def escenario():
+        control = ControlAdmision(max_concurrentes=1, max_en_espera=1, espera_maxima=5)
+        await control.entrar()
+        
+        esperando = asyncio.ensure_future(control.entrar())
+        await asyncio.sleep(0)
+        assert control.estadisticas()['en_espera'] == 1
+        
+        with pytest.raises(Sobrecarga):
+            await control.entrar()
+        
+        control.salir(duracion=0.2)
+        await asyncio.wait_for(esperando, 1)
+        estadisticas = control.estadisticas()
+        assert (estadisticas['en_curso'], estadisticas['en_espera']) == (1, 0)
+        assert (estadisticas['admitidas'], estadisticas['rechazadas_cola_llena']) == (2, 1)
+        control.salir()
+        assert control.estadisticas()['en_curso'] == 0
+    
+    asyncio.run(escenario())
+
+
+def test_control_espera_maxima_y_ampliacion():
+    """Test a waiter is rejected after the max wait and admitted when the cap is raised"""
+    async def escenario():
+        control = ControlAdmision(max_concurrentes=1, max_en_espera=5, espera_maxima=0.05)
+        await control.entrar()
+        with pytest.raises(Sobrecarga) as error:
+            await control.entrar()
+        assert int(error.value.retry_after) >= 1
+        assert control.estadisticas()['rechazadas_espera'] == 1
+        
+        control.configurar(espera_maxima=5)
+        esperando = asyncio.ensure_future(control.entrar())
+        await asyncio.sleep(0)
+        control.configurar(max_concurrentes=2)
+        await asyncio.wait_for(esperando, 1)
+        assert control.estadisticas()['en_curso'] == 2
+    
+    asyncio.run(escenario())
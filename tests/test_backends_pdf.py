@@ -0,0 +1,65 @@
+"""Tests for pluggable PDF text backends"""
+
+import asyncio
+import functools
+import pytest
+from analysis_config import EXECUTOR_PROCESSES
+from utils import backends_pdf, tareas
+from utils.backends_pdf import BackendPDF, calibrar, establecer_preferido
+from utils.ejecutores import CapaEjecucion
+from utils.pdf_handler import ManejadorDocumentos
+
+
+class _BackendRoto(BackendPDF):
+    """Backend that fails on every document"""
+    nombre = 'roto'
+    disponible = True
+    
+    def abrir(self, stream, ruta=None):
+        raise ValueError('cannot parse')
+
+
+@pytest.fixture
+def backend_roto(monkeypatch):
+    monkeypatch.setitem(backends_pdf.BACKENDS, 'roto', _BackendRoto())
+    monkeypatch.setitem(backends_pdf.PDF_BACKENDS, 'orden', ['roto'] + backends_pdf.PDF_BACKENDS['orden'])
+    yield
+    establecer_preferido(None)
+
+
+def test_respaldo_por_documento(generar_pdf, backend_roto):
+    """Test a document that fails with one backend is retried with the next"""
+    resultado = ManejadorDocumentos().procesar_pdf(generar_pdf(['NIT: 900123456']), tipo='bytes')
+    
+    assert resultado['exito']
+    assert 'NIT: 900123456' in resultado['texto']
+    assert resultado['metodo_extraccion'] != 'roto'
+    assert resultado['errores_backend'][0].startswith('roto:')
+
+
+def test_calibracion_elige_backend_apto(generar_pdf, backend_roto):
+    """Test calibration skips backends below the quality threshold"""
+    corpus = [(generar_pdf(['Objeto social construccion de obras civiles']), 'objeto social construccion obras civiles')]
+    
+    calibracion = calibrar(corpus)
+    
+    assert calibracion['resultados']['roto']['errores'] == 1
+    assert calibracion['elegido'] not in (None, 'roto')
+    assert backends_pdf.backends_disponibles()[0].nombre == calibracion['elegido']
+
+
+def _backend_preferido():
+    """Worker task: the preferred backend seen by the worker process"""
+    return backends_pdf._preferido
+
+
+def test_trabajadores_reciben_backend_calibrado():
+    """Test process workers start with the backend chosen in the parent process"""
+    nombre = backends_pdf.backends_disponibles()[-1].nombre
+    capa = CapaEjecucion({'pdf': {'tipo': EXECUTOR_PROCESSES, 'trabajadores': 1, 'max_concurrencia': 1}})
+    capa.establecer_inicializador(functools.partial(tareas.inicializar_trabajador, nombre))
+    
+    try:
+        assert asyncio.run(capa.ejecutar('pdf', _backend_preferido)) == nombre
+    finally:
+        capa.cerrar()
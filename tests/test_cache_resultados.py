@@ -0,0 +1,81 @@
+"""Tests for the date-aware analysis result cache"""
+
+import pytest
+from datetime import datetime, timedelta
+from core.validador import ValidadorEstructural
+from demo_engine import DemoEngine
+from utils.cache_resultados import CacheResultados
+
+
+CERTIFICADO = """
+NIT: 8060130247
+Razón Social: ASOCIACION DE PROFESIONALES PARA EL DESARROLLO
+Sigla: AGRODASIN
+Fecha expedición: 01/01/2024
+Estado: ACTIVA
+"""
+RUT = "NIT: 8060130247 Estado: ACTIVO"
+AVISO = "PROCESO: LP-1 OBJETO: Fortalecimiento de la pesca artesanal"
+
+
+class Reloj:
+    def __init__(self, ahora):
+        self.ahora = ahora
+    
+    def __call__(self):
+        return self.ahora
+
+
+def _recalculo(llamadas):
+    def recalcular(fecha_referencia):
+        llamadas.append(fecha_referencia)
+        resultado = DemoEngine().analizar(CERTIFICADO, RUT, AVISO, 100_000_000, fecha_referencia)
+        vigente_hasta = resultado['metadata']['vigente_hasta']
+        return resultado, datetime.fromisoformat(vigente_hasta) if vigente_hasta else None
+    return recalcular
+
+
+def test_proximo_cambio_certificado():
+    """Test expiry is derived from the 90-day rule"""
+    validador = ValidadorEstructural()
+    datos = {'fecha_expedicion': '01/01/2024'}
+    
+    assert validador.proximo_cambio_certificado(datos, datetime(2024, 2, 1)) == datetime(2024, 4, 1)
+    assert validador.proximo_cambio_certificado(datos, datetime(2024, 5, 1, 12)) == datetime(2024, 5, 2)
+    assert validador.proximo_cambio_certificado({}, datetime(2024, 2, 1)) is None
+
+
+def test_entrada_expira_en_umbral():
+    """Test entries are not served past their date threshold"""
+    reloj = Reloj(datetime(2024, 3, 31, 23, 0))
+    cache = CacheResultados(reloj=reloj)
+    llamadas = []
+    recalcular = _recalculo(llamadas)
+    
+    resultado, vence_en = recalcular(reloj())
+    cache.guardar('k', resultado, vence_en, recalcular)
+    assert cache.obtener('k') is resultado
+    
+    reloj.ahora = datetime(2024, 4, 1, 0, 1)
+    assert cache.obtener('k') is None
+
+
+def test_recalculo_programado_mantiene_aciertos():
+    """Test re-scoring before the threshold keeps reads as hits with fresh alerts"""
+    reloj = Reloj(datetime(2024, 3, 31, 23, 0))
+    cache = CacheResultados(reloj=reloj)
+    llamadas = []
+    recalcular = _recalculo(llamadas)
+    
+    resultado, vence_en = recalcular(reloj())
+    cache.guardar('k', resultado, vence_en, recalcular)
+    assert not any('antiguo' in a for a in resultado['alertas'])
+    
+    assert cache.recalcular_por_vencer(timedelta(hours=2)) == 1
+    assert llamadas[-1] == datetime(2024, 4, 1)
+    
+    reloj.ahora = datetime(2024, 4, 1, 0, 1)
+    nuevo = cache.obtener('k')
+    assert nuevo is not None
+    assert any('antiguo' in a for a in nuevo['alertas'])
+    assert cache.estadisticas()['fallos'] == 0
@@ -0,0 +1,42 @@
+"""Tests for spooled upload handling"""
+
+import hashlib
+import io
+import os
+
+import pytest
+from core.extractor import ExtractorCertificado
+from utils.cargas import ArchivoDemasiadoGrande, eliminar_carga, guardar_carga, verificar_tamano
+from utils.pdf_handler import ManejadorDocumentos
+
+
+def test_carga_en_bloques_con_hash(generar_pdf, monkeypatch):
+    """Test uploads are spooled chunk by chunk and hashed while streaming"""
+    from analysis_config import UPLOADS
+    monkeypatch.setitem(UPLOADS, 'tamano_bloque', 100)
+    pdf = generar_pdf(['NIT: 900123456-1', 'Estado: ACTIVA'])
+    
+    carga = guardar_carga(io.BytesIO(pdf))
+    try:
+        assert carga.tamano == len(pdf)
+        assert carga.sha256 == hashlib.sha256(pdf).hexdigest()
+        resultado = ManejadorDocumentos().procesar_pdf_incremental(
+            carga.ruta, ExtractorCertificado(), tipo='mmap'
+        )
+        assert resultado['exito']
+        assert resultado['datos']['nit'] == '9001234561'
+    finally:
+        eliminar_carga(carga.ruta)
+    assert not os.path.exists(carga.ruta)
+
+
+def test_carga_excede_limite(tmp_path, monkeypatch):
+    """Test oversized uploads are rejected and leave no temporary file"""
+    from analysis_config import UPLOADS
+    monkeypatch.setitem(UPLOADS, 'directorio', str(tmp_path))
+    
+    with pytest.raises(ArchivoDemasiadoGrande):
+        verificar_tamano(11, limite=10)
+    with pytest.raises(ArchivoDemasiadoGrande):
+        guardar_carga(io.BytesIO(b'x' * 11), limite=10)
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,85 @@
+"""Tests for single-flight request coalescing"""
+
+import asyncio
+
+from utils.coalescencia import CoalescedorSolicitudes
+
+
+def test_solicitudes_identicas_comparten_calculo():
+    """Test concurrent callers with the same key await one computation"""
+    coalescedor = CoalescedorSolicitudes()
+    llamadas = []
+    
+    async def calcular(valor):
+        llamadas.append(valor)
+        await asyncio.sleep(0.05)
+        return {'valor': valor}
+    
+    async def escenario():
+        return await asyncio.gather(
+            *(coalescedor.ejecutar('a', lambda: calcular(1)) for _ in range(5)),
+            coalescedor.ejecutar('b', lambda: calcular(2))
+        )
+    
+    resultados = asyncio.run(escenario())
+    
+    assert llamadas == [1, 2]
+    assert resultados == [{'valor': 1}] * 5 + [{'valor': 2}]
+    assert coalescedor.estadisticas() == {
+        'ejecuciones': 2, 'coalescidas': 4, 'en_curso': 0, 'tasa_ahorro': 0.6667
+    }
+
+
+def test_errores_compartidos_y_lider_cancelado():
+    """Test waiters share the leader's error, and a cancelled leader does not cancel the work"""
+    coalescedor = CoalescedorSolicitudes()
+    
+    async def fallar():
+        await asyncio.sleep(0.02)
+        raise ValueError('PDF invalido')
+    
+    async def lento():
+        await asyncio.sleep(0.05)
+        return 'ok'
+    
+    async def escenario():
+        errores = await asyncio.gather(
+            coalescedor.ejecutar('x', fallar), coalescedor.ejecutar('x', fallar),
+            return_exceptions=True
+        )
+        lider = asyncio.ensure_future(coalescedor.ejecutar('y', lento))
+        await asyncio.sleep(0)
+        seguidor = asyncio.ensure_future(coalescedor.ejecutar('y', lento))
+        await asyncio.sleep(0)
+        lider.cancel()
+        return errores, await seguidor
+    
+    errores, resultado = asyncio.run(escenario())
+    
+    assert [str(error) for error in errores] == ['PDF invalido'] * 2
+    assert resultado == 'ok'
+    assert coalescedor.estadisticas()['ejecuciones'] == 2
+
+
+def test_lider_avisado_antes_de_programar():
+    """Test only the leader is notified, before its computation gets a chance to run"""
+    coalescedor = CoalescedorSolicitudes()
+    avisos = []
+    
+    async def lento():
+        avisos.append('calculo')
+        await asyncio.sleep(0.02)
+        return 'ok'
+    
+    async def escenario():
+        lider = asyncio.ensure_future(coalescedor.ejecutar('z', lento, al_liderar=lambda: avisos.append('lider')))
+        await asyncio.sleep(0)
+        assert avisos == ['lider']
+        seguidor = asyncio.ensure_future(
+            coalescedor.ejecutar('z', lento, al_liderar=lambda: avisos.append('seguidor'))
+        )
+        lider.cancel()
+        return await seguidor
+    
+    assert asyncio.run(escenario()) == 'ok'
+    assert avisos == ['lider', 'calculo']
@@ -0,0 +1,106 @@
+"""Tests for the analysis executor layer"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from analysis_config import EXECUTOR_PROCESSES, EXECUTOR_THREADS
+from utils.ejecutores import CapaEjecucion
+from utils import tareas
+
+
+def _dormir(segundos):
+    time.sleep(segundos)
+    return segundos
+
+
+def test_concurrencia_acotada_y_cola():
+    """Test stage concurrency limit and queue depth metrics"""
+    capa = CapaEjecucion({'lenta': {'tipo': EXECUTOR_THREADS, 'trabajadores': 4, 'max_concurrencia': 2}})
+    
+    async def escenario():
+        return await asyncio.gather(*[capa.ejecutar('lenta', _dormir, 0.05) for _ in range(6)])
+    
+    try:
+        assert asyncio.run(escenario()) == [0.05] * 6
+        estadisticas = capa.estadisticas()['lenta']
+        assert estadisticas['completadas'] == 6
+        assert estadisticas['max_en_cola'] >= 4
+        assert estadisticas['en_cola'] == 0
+        assert estadisticas['en_ejecucion'] == 0
+    finally:
+        capa.cerrar()
+
+
+def test_submit_respeta_concurrencia():
+    """Test the synchronous submit path is bounded by max_concurrencia too"""
+    capa = CapaEjecucion({'pdf': {'tipo': EXECUTOR_THREADS, 'trabajadores': 4, 'max_concurrencia': 2}})
+    etapa = capa.etapa('pdf')
+    activas = []
+    maximo = []
+    lock = threading.Lock()
+    
+    def tarea():
+        with lock:
+            activas.append(1)
+            maximo.append(len(activas))
+        time.sleep(0.02)
+        with lock:
+            activas.pop()
+    
+    try:
+        futuros = [etapa.submit(tarea) for _ in range(8)]
+        for futuro in futuros:
+            futuro.result()
+        assert max(maximo) == 2
+        estadisticas = capa.estadisticas()['pdf']
+        assert estadisticas['completadas'] == 8
+        assert estadisticas['en_cola'] == 0
+        assert estadisticas['en_ejecucion'] == 0
+    finally:
+        capa.cerrar()
+
+
+def test_contadores_con_varios_bucles():
+    """Test counters stay consistent when several threads run their own event loops"""
+    capa = CapaEjecucion({'lectura': {'tipo': EXECUTOR_THREADS, 'trabajadores': 4, 'max_concurrencia': 2}})
+    
+    async def escenario():
+        await asyncio.gather(*[capa.ejecutar('lectura', _dormir, 0) for _ in range(200)])
+    
+    def bucle():
+        asyncio.run(escenario())
+    
+    try:
+        with ThreadPoolExecutor(max_workers=4) as hilos:
+            futuros = [hilos.submit(bucle) for _ in range(4)]
+            futuros += [capa.etapa('lectura').submit(_dormir, 0) for _ in range(200)]
+            for futuro in futuros:
+                futuro.result()
+        estadisticas = capa.estadisticas()['lectura']
+        assert estadisticas['completadas'] == 1000
+        assert estadisticas['en_cola'] == 0
+        assert estadisticas['en_ejecucion'] == 0
+    finally:
+        capa.cerrar()
+
+
+def test_analisis_en_proceso():
+    """Test DEMO analysis runs in a process pool stage"""
+    capa = CapaEjecucion({'analisis': {'tipo': EXECUTOR_PROCESSES, 'trabajadores': 1, 'max_concurrencia': 1}})
+    
+    try:
+        resultado = asyncio.run(capa.ejecutar(
+            'analisis', tareas.analizar_textos,
+            'NIT: 123456789 Estado: ACTIVA', 'NIT: 123456789 Estado: ACTIVO', 'OBJETO: Obras', 100_000_000
+        ))
+        assert resultado['semaforo'] in ['VERDE', 'AMARILLO', 'ROJO']
+    finally:
+        capa.cerrar()
+
+
+def test_etapa_desconocida():
+    """Test unknown stages are rejected"""
+    with pytest.raises(KeyError):
+        CapaEjecucion({}).etapa('pdf')
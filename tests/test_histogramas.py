@@ -0,0 +1,59 @@
+"""Tests for stage timers and latency histograms"""
+
+import pickle
+import threading
+
+from core.cronometro import Cronometro
+from utils.histogramas import Histograma, HistogramasEtapas
+
+
+def test_cronometro_acumula_por_etapa():
+    """Test a stage measured twice adds up and the timer survives pickling"""
+    cronometro = Cronometro()
+    with cronometro.medir('a'):
+        pass
+    primero = cronometro.tiempos_ms['a']
+    with cronometro.medir('a'):
+        pass
+    
+    copia = pickle.loads(pickle.dumps(cronometro))
+    resumen = copia.resumen()
+    
+    assert resumen['a'] >= round(primero, 3)
+    assert resumen['total'] >= resumen['a']
+
+
+def test_histograma_percentiles():
+    """Test percentiles are interpolated inside their bucket and capped at the max"""
+    histograma = Histograma([1, 10, 100])
+    for ms in [0.5] * 50 + [5] * 45 + [50] * 4 + [500]:
+        histograma.observar(ms)
+    
+    assert histograma.acumulados() == [50, 95, 99, 100]
+    assert histograma.percentil(50) == 1
+    assert 1 < histograma.percentil(90) <= 10
+    assert histograma.percentil(100) == 500
+    estadisticas = histograma.estadisticas()
+    assert (estadisticas['total'], estadisticas['max_ms']) == (100, 500)
+    assert estadisticas['media_ms'] == round((25 + 225 + 200 + 500) / 100, 3)
+    assert Histograma([1]).percentil(50) is None
+
+
+def test_histogramas_etapas_concurrentes():
+    """Test timings recorded from several threads are all counted per stage"""
+    histogramas = HistogramasEtapas([1, 10])
+    
+    def registrar():
+        for _ in range(100):
+            histogramas.registrar({'similitud': 2.0, 'total': 20.0})
+    
+    hilos = [threading.Thread(target=registrar) for _ in range(4)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    
+    etapas = histogramas.estadisticas()['etapas']
+    assert list(etapas) == ['similitud', 'total']
+    assert etapas['similitud']['total'] == 400
+    assert etapas['total']['max_ms'] == 20.0
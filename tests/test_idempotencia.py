@@ -0,0 +1,54 @@
+"""Tests for the idempotency response store"""
+
+import pytest
+from data.idempotencia import AlmacenIdempotencia, RespuestaGuardada
+
+
+class _Reloj:
+    def __init__(self):
+        self.ahora = 1000.0
+    
+    def __call__(self):
+        return self.ahora
+
+
+def _respuesta(n):
+    return RespuestaGuardada('huella', 200, 'application/json', b'{"n": %d}' % n)
+
+
+@pytest.fixture
+def reloj():
+    return _Reloj()
+
+
+def test_memoria_y_disco(tmp_path, reloj):
+    """Test responses evicted from memory are still replayed from SQLite, also after a restart"""
+    almacen = AlmacenIdempotencia(tmp_path / "idem.db", max_entradas_memoria=1, reloj=reloj)
+    almacen.guardar('a', _respuesta(1))
+    almacen.guardar('b', _respuesta(2))
+    
+    assert almacen.obtener('b') == _respuesta(2)
+    assert almacen.obtener('a') == _respuesta(1)
+    assert almacen.obtener('c') is None
+    assert almacen.estadisticas()['aciertos_memoria'] == 1
+    assert almacen.estadisticas()['aciertos_disco'] == 1
+    almacen.cerrar()
+    
+    reiniciado = AlmacenIdempotencia(tmp_path / "idem.db", reloj=reloj)
+    assert reiniciado.obtener('b').cuerpo == b'{"n": 2}'
+    reiniciado.cerrar()
+
+
+def test_vencimiento_y_limite_en_disco(tmp_path, reloj):
+    """Test entries expire after the TTL and the table keeps only the newest ones"""
+    almacen = AlmacenIdempotencia(tmp_path / "idem.db", ttl=60, max_entradas_memoria=0, max_entradas_disco=2, reloj=reloj)
+    for n in range(3):
+        almacen.guardar(str(n), _respuesta(n))
+        reloj.ahora += 1
+    
+    assert almacen.obtener('0') is None
+    assert almacen.obtener('2') == _respuesta(2)
+    
+    reloj.ahora += 60
+    assert almacen.obtener('2') is None
+    almacen.cerrar()
@@ -1,5 +1,6 @@
 """Integration tests for combined analysis + pricing system"""
 
+import json
 import pytest
 from fastapi.testclient import TestClient
 from main import app
@@ -7,6 +8,47 @@ from main import app
 client = TestClient(app)
 
 
+@pytest.fixture(autouse=True)
+def cubetas_por_prueba():
+    """Start each test with full rate-limit buckets, as a separate client would"""
+    import main
+    if hasattr(main, "limitador_clientes"):
+        main.limitador_clientes.reiniciar()
+
+
+@pytest.fixture(autouse=True)
+def bases_por_prueba(tmp_path, monkeypatch):
+    """Give each test its own SQLite stores under tmp_path"""
+    import main
+    from data.idempotencia import AlmacenIdempotencia
+    idempotencia = AlmacenIdempotencia(tmp_path / "idempotencia.db")
+    monkeypatch.setattr(main, "almacen_idempotencia", idempotencia)
+    if not hasattr(main, "almacen_perfiles"):
+        yield
+        idempotencia.cerrar()
+        return
+    from data.perfiles import AlmacenPerfiles
+    from data.trabajos import ColaTrabajos
+    perfiles = AlmacenPerfiles(tmp_path / "perfiles.db")
+    monkeypatch.setattr(main, "almacen_perfiles", perfiles)
+    
+    # Job workers outlive the test: hand them back the session queue before closing this one
+    cola = ColaTrabajos(
+        tmp_path / "trabajos.db",
+        duracion_reserva=main.JOBS['duracion_reserva'],
+        max_intentos=main.JOBS['max_intentos']
+    )
+    pool = main.pool_trabajos
+    anteriores = (pool.cola, pool.directorio)
+    monkeypatch.setattr(main, "cola_trabajos", cola)
+    pool.cola, pool.directorio = cola, str(tmp_path / "trabajos")
+    yield
+    pool.cola, pool.directorio = anteriores
+    cola.cerrar()
+    perfiles.cerrar()
+    idempotencia.cerrar()
+
+
 def test_health_endpoints():
     """Test all health check endpoints"""
     # Pricing health
@@ -132,3 +174,428 @@ def test_capped_pricing_mode():
     data = response.json()
     # In capped mode, price should not exceed 80000
     assert data["final_price"] <= 80000
+
+
+def test_analysis_match_top_k():
+    """Test top-K tender matching with pruning metadata"""
+    response = client.post(
+        "/api/analysis/match",
+        json={
+            "objeto_social": "Pesca artesanal y fortalecimiento de comunidades pesqueras",
+            "avisos": [
+                {"id": "A", "objeto_contrato": "Fortalecimiento de la pesca artesanal en comunidades"},
+                {"id": "B", "objeto_contrato": "Construcción de vías terciarias"},
+                {"id": "C", "objeto_contrato": "Suministro de equipos de cómputo"}
+            ],
+            "k": 1
+        }
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert [r["id"] for r in data["resultados"]] == ["A"]
+    assert data["metadata"]["candidatos"] == 3
+    assert data["metadata"]["evaluados"] + data["metadata"]["podados"] == 3
+    assert "tiempo_ms" in data["metadata"]
+
+
+def test_analysis_demo_batch():
+    """Test batch analysis streams one result per tender"""
+    response = client.post(
+        "/api/analysis/demo-batch",
+        json={
+            "certificado": "NIT: 123456789 Razón Social: TEST COMPANY OBJETO SOCIAL: Desarrollo de proyectos Estado: ACTIVA",
+            "rut": "NIT: 123456789 Estado: ACTIVO ACTIVIDAD ECONOMICA: Construcción",
+            "avisos": [
+                {"id": "LP-1", "aviso": "PROCESO: LP-1 OBJETO: Construcción de infraestructura", "valor_proceso": 100000000},
+                {"id": "LP-2", "aviso": "PROCESO: LP-2 OBJETO: Suministro de alimentos"}
+            ]
+        }
+    )
+    assert response.status_code == 200
+    lineas = [json.loads(linea) for linea in response.text.splitlines() if linea]
+    assert sorted(linea["id"] for linea in lineas) == ["LP-1", "LP-2"]
+    for linea in lineas:
+        assert linea["resultado"]["semaforo"] in ["VERDE", "AMARILLO", "ROJO"]
+
+
+def test_company_profile_analysis():
+    """Test storing a company profile and analyzing by NIT"""
+    response = client.post(
+        "/api/analysis/profiles",
+        json={
+            "certificado": "NIT: 987654321 Razón Social: EMPRESA PERFIL DE PRUEBA Sigla: EPP Estado: ACTIVA",
+            "rut": "NIT: 987654321 Estado: ACTIVO ACTIVIDAD ECONOMICA: Construcción"
+        }
+    )
+    assert response.status_code == 200
+    assert response.json()["nit"] == "987654321"
+    
+    response = client.post(
+        "/api/analysis/profiles/987654321/demo",
+        json={"aviso": "PROCESO: LP-9 OBJETO: Construcción de infraestructura", "valor_proceso": 100000000}
+    )
+    assert response.status_code == 200
+    assert response.json()["datos_extraidos"]["nit"] == "987654321"
+    
+    response = client.get("/api/analysis/profiles/000000000")
+    assert response.status_code == 404
+
+
+def test_analysis_demo_files(generar_pdf):
+    """Test PDF upload analysis extracts the three documents"""
+    archivos = {
+        "certificado": ("cert.pdf", generar_pdf(["NIT: 8060130247", "Estado: ACTIVA"]), "application/pdf"),
+        "rut": ("rut.pdf", generar_pdf(["NIT: 8060130247\nEstado: ACTIVO"]), "application/pdf"),
+        "aviso": ("aviso.pdf", generar_pdf(["PROCESO: LP-2024-001\nOBJETO: Construccion de obras"]), "application/pdf"),
+    }
+    response = client.post("/api/analysis/demo-files", files=archivos, params={"valor_proceso": 100000000})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["datos_extraidos"]["nit"] == "8060130247"
+    assert data["semaforo"] in ["VERDE", "AMARILLO", "ROJO"]
+
+
+def test_analysis_demo_files_invalid_pdf(generar_pdf):
+    """Test an invalid upload fails fast with its document label"""
+    archivos = {
+        "certificado": ("cert.pdf", generar_pdf(["NIT: 8060130247"]), "application/pdf"),
+        "rut": ("rut.pdf", b"not a pdf", "application/pdf"),
+        "aviso": ("aviso.pdf", generar_pdf(["OBJETO: Obras"]), "application/pdf"),
+    }
+    response = client.post("/api/analysis/demo-files", files=archivos)
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith("RUT PDF error")
+
+
+def test_analysis_demo_files_too_large(generar_pdf, monkeypatch):
+    """Test uploads above the size limit are rejected with 413"""
+    from analysis_config import UPLOADS
+    monkeypatch.setitem(UPLOADS, "max_bytes_documento", 64)
+    archivos = {
+        "certificado": ("cert.pdf", generar_pdf(["NIT: 8060130247"]), "application/pdf"),
+        "rut": ("rut.pdf", generar_pdf(["NIT: 8060130247"]), "application/pdf"),
+        "aviso": ("aviso.pdf", generar_pdf(["OBJETO: Obras"]), "application/pdf"),
+    }
+    response = client.post("/api/analysis/demo-files", files=archivos)
+    assert response.status_code == 413
+
+
+def test_analysis_process_bundle(generar_pdf):
+    """Test a ZIP bundle feeds the real annex count into the PRO quote"""
+    import io
+    import zipfile
+    paquete = io.BytesIO()
+    with zipfile.ZipFile(paquete, 'w') as archivo:
+        archivo.writestr('aviso.pdf', generar_pdf(["PROCESO: LP-2024-001\nOBJETO: Construccion de obras"]))
+        for i in range(12):
+            archivo.writestr(f'anexo_{i}.pdf', generar_pdf([f"Anexo {i}", "Experiencia"]))
+    archivos = {
+        "certificado": ("cert.pdf", generar_pdf(["NIT: 8060130247\nACTIVOS: $150,000,000", "Estado: ACTIVA"]), "application/pdf"),
+        "rut": ("rut.pdf", generar_pdf(["NIT: 8060130247\nEstado: ACTIVO"]), "application/pdf"),
+        "paquete": ("paquete.zip", paquete.getvalue(), "application/zip"),
+    }
+    response = client.post("/api/analysis/process-bundle", files=archivos, params={"valor_proceso": 100000000})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["paquete"]["num_anexos"] == 12
+    assert data["paquete"]["paginas_anexos"] == 24
+    assert data["pricing"]["pro"]["num_annexes"] == 12
+    assert data["pricing"]["pro"]["breakdown"]["annex_pages"] == 24
+    
+    archivos["paquete"] = ("paquete.zip", b"not a zip", "application/zip")
+    response = client.post("/api/analysis/process-bundle", files=archivos)
+    assert response.status_code == 400
+
+
+def test_analysis_job_queue(generar_pdf):
+    """Test a queued PRO job can be polled and its result fetched"""
+    import time
+    archivos = {
+        "certificado": ("cert.pdf", generar_pdf(["NIT: 8060130247\nACTIVOS: $150,000,000", "Estado: ACTIVA"]), "application/pdf"),
+        "rut": ("rut.pdf", generar_pdf(["NIT: 8060130247\nEstado: ACTIVO"]), "application/pdf"),
+        "aviso": ("aviso.pdf", generar_pdf(["PROCESO: LP-2024-001\nOBJETO: Construccion de obras"]), "application/pdf"),
+    }
+    response = client.post("/api/analysis/jobs", files=archivos, params={"valor_proceso": 100000000})
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+    
+    limite = time.monotonic() + 60
+    while client.get(f"/api/analysis/jobs/{job_id}").json()["estado"] in ("pendiente", "en_proceso"):
+        assert time.monotonic() < limite
+        time.sleep(0.1)
+    
+    response = client.get(f"/api/analysis/jobs/{job_id}/result")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["datos_extraidos"]["nit"] == "8060130247"
+    assert "pricing" in data
+    
+    metricas = client.get("/api/analysis/jobs/metrics").json()
+    assert metricas["por_estado"]["completado"] >= 1
+    assert client.get("/api/analysis/jobs/desconocido").status_code == 404
+    
+    archivos["rut"] = ("rut.pdf", b"not a pdf", "application/pdf")
+    job_id = client.post("/api/analysis/jobs", files=archivos, params={"tipo": "demo"}).json()["job_id"]
+    limite = time.monotonic() + 60
+    while client.get(f"/api/analysis/jobs/{job_id}").json()["estado"] in ("pendiente", "en_proceso"):
+        assert time.monotonic() < limite
+        time.sleep(0.1)
+    response = client.get(f"/api/analysis/jobs/{job_id}/result")
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith("RUT PDF error")
+
+
+def _eventos_sse(texto):
+    eventos = []
+    for bloque in texto.strip().split("\n\n"):
+        campos = dict(linea.split(": ", 1) for linea in bloque.split("\n"))
+        eventos.append((campos["event"], json.loads(campos["data"])))
+    return eventos
+
+
+def test_analysis_process_stream(generar_pdf):
+    """Test the complete process streams stage events before the final result"""
+    archivos = {
+        "certificado": ("cert.pdf", generar_pdf(["NIT: 8060130247\nACTIVOS: $150,000,000", "Estado: ACTIVA"]), "application/pdf"),
+        "rut": ("rut.pdf", generar_pdf(["NIT: 8060130247\nEstado: ACTIVO"]), "application/pdf"),
+        "aviso": ("aviso.pdf", generar_pdf(["PROCESO: LP-2024-001\nOBJETO: Construccion de obras"]), "application/pdf"),
+    }
+    response = client.post("/api/analysis/process-stream", files=archivos, params={"valor_proceso": 100000000})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    eventos = _eventos_sse(response.text)
+    nombres = [nombre for nombre, _ in eventos]
+    
+    assert nombres.count("extraccion") == 3
+    assert nombres[3:] == [
+        "validacion_estructural", "similitud", "validacion_financiera", "score", "semaforo", "resultado"
+    ]
+    assert eventos[3][1]["nit"] == "8060130247"
+    assert eventos[-1][1]["semaforo"] == eventos[-2][1]["semaforo"]
+    assert "pricing" in eventos[-1][1]
+    
+    archivos["rut"] = ("rut.pdf", b"not a pdf", "application/pdf")
+    eventos = _eventos_sse(client.post("/api/analysis/process-stream", files=archivos).text)
+    assert eventos[-1][0] == "error"
+    assert eventos[-1][1]["status_code"] == 400
+
+
+def test_idempotent_quote_replay(monkeypatch):
+    """Test a retried quote with the same Idempotency-Key replays the stored bytes"""
+    import uuid
+    import main
+    cuerpo = {"assets": 200000000, "process_value": 150000000, "num_annexes": 10}
+    cabeceras = {"Idempotency-Key": uuid.uuid4().hex}
+    
+    primera = client.post("/api/pricing/quote", json=cuerpo, headers=cabeceras)
+    assert primera.status_code == 200
+    assert "Idempotent-Replayed" not in primera.headers
+    
+    def no_recalcular(*args, **kwargs):
+        raise AssertionError("replay must not recompute")
+    monkeypatch.setattr(main, "calculate_complete_quote", no_recalcular)
+    
+    repetida = client.post("/api/pricing/quote", json=cuerpo, headers=cabeceras)
+    assert repetida.status_code == 200
+    assert repetida.headers["Idempotent-Replayed"] == "true"
+    assert repetida.content == primera.content
+    
+    otra = client.post("/api/pricing/quote", json={**cuerpo, "num_annexes": 3}, headers=cabeceras)
+    assert otra.status_code == 422
+
+
+def test_idempotent_replay_keeps_cors_headers():
+    """Test replayed responses and idempotency errors carry the CORS headers"""
+    import uuid
+    cuerpo = {"assets": 200000000, "process_value": 150000000, "num_annexes": 10}
+    cabeceras = {"Idempotency-Key": uuid.uuid4().hex, "Origin": "https://app.licitia.co"}
+    
+    primera = client.post("/api/pricing/quote", json=cuerpo, headers=cabeceras)
+    repetida = client.post("/api/pricing/quote", json=cuerpo, headers=cabeceras)
+    otra = client.post("/api/pricing/quote", json={**cuerpo, "num_annexes": 3}, headers=cabeceras)
+    
+    assert repetida.headers["Idempotent-Replayed"] == "true"
+    assert otra.status_code == 422
+    for response in (primera, repetida, otra):
+        assert "access-control-allow-origin" in response.headers
+
+
+def test_idempotent_upload_fingerprint(generar_pdf, monkeypatch):
+    """Test an upload retry replays only for the same files and the same client"""
+    import uuid
+    import main
+    monkeypatch.setitem(main.ADMISSION, "usar_x_forwarded_for", True)
+    archivos = {
+        "certificado": ("cert.pdf", generar_pdf(["NIT: 8060130247", "Estado: ACTIVA"]), "application/pdf"),
+        "rut": ("rut.pdf", generar_pdf(["NIT: 8060130247\nEstado: ACTIVO"]), "application/pdf"),
+        "aviso": ("aviso.pdf", generar_pdf(["PROCESO: LP-7\nOBJETO: Construccion de obras"]), "application/pdf"),
+    }
+    clave = uuid.uuid4().hex
+    
+    def enviar(archivos, cliente):
+        return client.post(
+            "/api/analysis/process", files=archivos, params={"include_pricing": False},
+            headers={"Idempotency-Key": clave, "X-Forwarded-For": cliente}
+        )
+    
+    primera = enviar(archivos, "10.0.0.1")
+    assert primera.status_code == 200
+    assert "Idempotent-Replayed" not in primera.headers
+    
+    repetida = enviar(archivos, "10.0.0.1")
+    assert repetida.headers["Idempotent-Replayed"] == "true"
+    assert repetida.content == primera.content
+    
+    otro_aviso = {**archivos, "aviso": ("aviso.pdf", generar_pdf(["PROCESO: LP-8\nOBJETO: Obras"]), "application/pdf")}
+    assert enviar(otro_aviso, "10.0.0.1").status_code == 422
+    
+    otro_cliente = enviar(archivos, "10.0.0.2")
+    assert otro_cliente.status_code == 200
+    assert "Idempotent-Replayed" not in otro_cliente.headers
+
+
+def test_admin_endpoints_require_token(monkeypatch):
+    """Test admin endpoints are disabled without a configured token and reject wrong tokens"""
+    monkeypatch.delenv("LICITIA_ADMIN_TOKEN", raising=False)
+    assert client.get("/api/analysis/admin/limits").status_code == 403
+    assert client.post("/api/analysis/admin/reload").status_code == 403
+    
+    monkeypatch.setenv("LICITIA_ADMIN_TOKEN", "secreto")
+    assert client.get("/api/analysis/admin/limits").status_code == 401
+    assert client.post("/api/analysis/admin/reload", headers={"X-Admin-Token": "otro"}).status_code == 401
+    cambio = client.put(
+        "/api/analysis/admin/limits", json={"rafaga_por_cliente": 1}, headers={"X-Admin-Token": "otro"}
+    )
+    assert cambio.status_code == 401
+    assert client.get("/api/analysis/admin/limits", headers={"X-Admin-Token": "secreto"}).status_code == 200
+    assert client.get("/api/analysis/admin/limits", headers={"X-Admin-Token": "secreto"}).json()["rate_limit"]["rafaga"] != 1
+
+
+def test_analysis_admission_limits(monkeypatch):
+    """Test lowered analysis limits return 429 with Retry-After while pricing is unaffected"""
+    import main
+    monkeypatch.setenv("LICITIA_ADMIN_TOKEN", "secreto")
+    admin = {"X-Admin-Token": "secreto"}
+    originales = client.get("/api/analysis/admin/limits", headers=admin).json()["rate_limit"]
+    assert client.put("/api/analysis/admin/limits", json={"max_concurrentes": 0}, headers=admin).status_code == 422
+    
+    response = client.put(
+        "/api/analysis/admin/limits", json={"tasa_por_cliente": 0.01, "rafaga_por_cliente": 1}, headers=admin
+    )
+    assert response.status_code == 200
+    assert response.json()["rate_limit"]["rafaga"] == 1
+    try:
+        assert client.get("/api/analysis/jobs/inexistente").status_code == 404
+        limitada = client.get("/api/analysis/jobs/inexistente")
+        assert limitada.status_code == 429
+        assert int(limitada.headers["Retry-After"]) >= 1
+        
+        assert client.get("/api/analysis/health").status_code == 200
+        assert client.post("/api/pricing/plus", json={"assets": 150000000, "process_value": 100000000}).status_code == 200
+    finally:
+        # Admin calls are rate limited too: refill the bucket before restoring
+        main.limitador_clientes.reiniciar()
+        restaurada = client.put("/api/analysis/admin/limits", json={
+            "tasa_por_cliente": originales["tasa"], "rafaga_por_cliente": originales["rafaga"]
+        }, headers=admin)
+        assert restaurada.status_code == 200
+
+
+def test_admission_rejections_keep_cors_headers(monkeypatch):
+    """Test 429 rejections carry CORS headers and preflights spend no tokens"""
+    import main
+    monkeypatch.setattr(main.limitador_clientes, "rafaga", 1)
+    monkeypatch.setattr(main.limitador_clientes, "tasa", 0.01)
+    origen = {"Origin": "https://app.licitia.co"}
+    preflight = {**origen, "Access-Control-Request-Method": "POST"}
+    
+    for _ in range(3):
+        assert client.options("/api/analysis/demo", headers=preflight).status_code == 200
+        assert client.options("/api/analysis/demo").status_code == 405
+    assert client.get("/api/analysis/jobs/inexistente", headers=origen).status_code == 404
+    limitada = client.get("/api/analysis/jobs/inexistente", headers=origen)
+    assert limitada.status_code == 429
+    assert "Retry-After" in limitada.headers
+    assert "access-control-allow-origin" in limitada.headers
+
+
+def test_coalescing_deadline_window():
+    """Test only requests whose deadlines fall in the same window share a coalescing key"""
+    import main
+    from core.plazo import Plazo
+    
+    def reloj():
+        return 100.2
+    
+    assert main._tramo_plazo(Plazo(5, reloj=reloj)) == main._tramo_plazo(Plazo(5.5, reloj=reloj))
+    assert main._tramo_plazo(Plazo(5, reloj=reloj)) != main._tramo_plazo(Plazo(60, reloj=reloj))
+    assert main._tramo_plazo(None) is None
+
+
+def test_analysis_deadline_partial_result():
+    """Test an analysis past its deadline returns a flagged partial result that is not cached"""
+    params = {
+        "certificado": "NIT: 555666777 Razón Social: PLAZO SAS Estado: ACTIVA",
+        "rut": "NIT: 555666777 Estado: ACTIVO",
+        "aviso": "OBJETO: Interventoria de obras viales"
+    }
+    parcial = client.post("/api/analysis/demo", params=params, headers={"X-Request-Timeout": "0.000001"})
+    assert parcial.status_code == 200
+    assert parcial.headers["X-Analysis-Incomplete"] == "true"
+    assert parcial.json()["incompleto"] is True
+    assert parcial.json()["semaforo"] is None
+    
+    completo = client.post("/api/analysis/demo", params=params)
+    assert "X-Analysis-Incomplete" not in completo.headers
+    assert completo.json()["incompleto"] is False
+    
+    assert client.post("/api/analysis/demo", params=params, headers={"X-Request-Timeout": "0"}).status_code == 422
+
+
+def test_analysis_stage_timings():
+    """Test stage timings are returned only on request and aggregated into histograms"""
+    params = {
+        "certificado": "NIT: 444555666 Razón Social: TIEMPOS SAS Estado: ACTIVA",
+        "rut": "NIT: 444555666 Estado: ACTIVO",
+        "aviso": "OBJETO: Mantenimiento de redes electricas"
+    }
+    antes = client.get("/api/analysis/timings").json()["etapas"].get("score", {}).get("total", 0)
+    
+    sin_tiempos = client.post("/api/analysis/demo", params=params)
+    assert sin_tiempos.status_code == 200
+    assert "tiempos_etapas_ms" not in sin_tiempos.json()["metadata"]
+    
+    # Served from the cache: timings of the original analysis, not recorded again
+    con_tiempos = client.post("/api/analysis/demo", params={**params, "include_timings": True})
+    tiempos = con_tiempos.json()["metadata"]["tiempos_etapas_ms"]
+    assert {"extraccion_certificado", "similitud.keywords", "semaforo", "total"} <= set(tiempos)
+    
+    histogramas = client.get("/api/analysis/timings").json()
+    assert histogramas["etapas"]["score"]["total"] == antes + 1
+    assert histogramas["etapas"]["total"]["p95_ms"] is not None
+
+
+def test_prometheus_metrics(monkeypatch, tmp_path):
+    """Test /metrics counts requests by route, status and pricing mode in the text format"""
+    import os
+    import main
+    from utils.metricas import AgregadorMultiproceso
+    monkeypatch.setattr(main, "agregador_metricas", AgregadorMultiproceso(str(tmp_path), vigencia=30))
+    
+    def contador(texto, etiquetas):
+        linea = f"licitia_http_requests_total{{{etiquetas}}} "
+        return next((float(l[len(linea):]) for l in texto.splitlines() if l.startswith(linea)), 0)
+    
+    etiquetas = 'method="POST",route="/api/pricing/plus",status="200",pricing_mode="capped"'
+    antes = contador(client.get("/metrics").text, etiquetas)
+    
+    client.post("/api/pricing/plus", json={"assets": 1000000000, "process_value": 100000000, "pricing_mode": "capped"})
+    respuesta = client.get("/metrics")
+    
+    assert respuesta.status_code == 200
+    assert respuesta.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert contador(respuesta.text, etiquetas) == antes + 1
+    assert f'licitia_http_request_duration_seconds_bucket{{{etiquetas},le="+Inf"}}' in respuesta.text
+    assert 'licitia_executor_queue_depth{stage="analisis"}' in respuesta.text
+    assert 'licitia_cache_hits_total{cache="result"}' in respuesta.text
+    assert (tmp_path / f"{os.getpid()}.json").exists()
@@ -0,0 +1,70 @@
+"""Tests for the queue-based logging mode"""
+
+import logging
+import queue
+import threading
+
+import pytest
+
+import logging_config
+from logging_config import ColaDescartable, dropped_log_records, setup_logging, stop_logging
+
+
+@pytest.fixture
+def raiz_restaurada():
+    """Restore the root logger configuration (and restart its listener) after the test"""
+    raiz = logging.getLogger()
+    handlers, nivel, listener = list(raiz.handlers), raiz.level, logging_config._listener
+    yield raiz
+    stop_logging()
+    raiz.handlers[:] = handlers
+    raiz.setLevel(nivel)
+    if listener is not None:
+        listener.start()
+        logging_config._listener = listener
+
+
+def test_modo_cola_escribe_en_segundo_plano(raiz_restaurada, capsys):
+    """Test records are formatted and written by the listener thread"""
+    hilos = []
+    setup_logging(log_to_file=False, log_to_console=True, use_queue=True)
+    consola = logging_config._listener.handlers[0]
+    emitir = consola.emit
+    consola.emit = lambda registro: (hilos.append(threading.current_thread()), emitir(registro))
+    
+    datos = {'estado': 'inicial'}
+    logging.getLogger('prueba').info("datos: %s", datos)
+    datos['estado'] = 'modificado'
+    stop_logging()
+    
+    assert [type(handler) for handler in raiz_restaurada.handlers] == [ColaDescartable]
+    assert hilos and threading.current_thread() not in hilos
+    assert "prueba - INFO - datos: {'estado': 'inicial'}" in capsys.readouterr().out
+
+
+def test_cola_llena_descarta_y_cuenta():
+    """Test a full queue drops records without blocking and reports them once there is room"""
+    cola = queue.Queue(maxsize=2)
+    handler = ColaDescartable(cola)
+    registro = logging.LogRecord('prueba', logging.INFO, __file__, 0, "mensaje %d", (1,), None)
+    
+    for _ in range(5):
+        handler.handle(registro)
+    
+    assert handler.descartados == 3
+    assert cola.get_nowait().msg == "mensaje 1"
+    cola.get_nowait()
+    
+    handler.handle(registro)
+    
+    assert cola.get_nowait().msg == "mensaje 1"
+    assert cola.get_nowait().msg == "Logging queue full: 3 log records dropped"
+    assert handler.descartados == 3
+
+
+def test_sin_modo_cola_no_hay_descartes(raiz_restaurada):
+    """Test direct mode keeps the handlers on the root logger"""
+    setup_logging(log_to_file=False, log_to_console=True)
+    
+    assert [type(handler) for handler in raiz_restaurada.handlers] == [logging.StreamHandler]
+    assert dropped_log_records() == 0
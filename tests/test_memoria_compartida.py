@@ -0,0 +1,70 @@
+"""Tests for shared-memory payload transfer to worker processes"""
+
+import asyncio
+import pytest
+from analysis_config import EXECUTOR_PROCESSES, SHARED_MEMORY_THRESHOLD
+from utils.ejecutores import CapaEjecucion
+from utils.memoria_compartida import ReferenciaCompartida, abrir_stream, compartir, resolver_texto
+from utils import tareas
+
+
+def test_payload_pequeno_no_usa_memoria_compartida():
+    """Test small payloads are passed through unchanged"""
+    with compartir(b'%PDF', 'texto', None) as referencias:
+        assert referencias == [b'%PDF', 'texto', None]
+
+
+def test_payload_grande_ida_y_vuelta():
+    """Test large bytes and text round-trip through shared memory"""
+    datos = bytes(range(256)) * (SHARED_MEMORY_THRESHOLD // 256 + 1)
+    texto = 'gestión pesquera ' * (SHARED_MEMORY_THRESHOLD // 10)
+    
+    with compartir(datos, texto) as (ref_datos, ref_texto):
+        assert isinstance(ref_datos, ReferenciaCompartida)
+        assert isinstance(ref_texto, ReferenciaCompartida)
+        with abrir_stream(ref_datos) as stream:
+            stream.seek(10)
+            assert stream.read(5) == datos[10:15]
+            stream.seek(0)
+            assert stream.read() == datos
+        assert resolver_texto(ref_texto) == texto
+
+
+def test_pdf_en_trabajador_precalentado(generar_pdf):
+    """Test a warm process worker extracts a PDF passed through shared memory"""
+    relleno = ['x' * 80] * 40
+    pdf = generar_pdf(['NIT: 900123456'] + ['\n'.join(relleno)] * (SHARED_MEMORY_THRESHOLD // 3000 + 1))
+    capa = CapaEjecucion(
+        {'pdf': {'tipo': EXECUTOR_PROCESSES, 'trabajadores': 1, 'max_concurrencia': 1, 'max_tareas_por_trabajador': 2}},
+        inicializador=tareas.inicializar_trabajador
+    )
+    
+    try:
+        capa.iniciar(tareas.calentar_trabajador)
+        with compartir(pdf) as (referencia,):
+            assert isinstance(referencia, ReferenciaCompartida)
+            resultado = asyncio.run(capa.ejecutar('pdf', tareas.procesar_pdf_bytes, referencia))
+        assert resultado['exito']
+        assert 'NIT: 900123456' in resultado['texto']
+    finally:
+        capa.cerrar()
+
+
+def test_textos_grandes_en_trabajador():
+    """Test a DEMO text analysis in a process worker reads large texts from shared memory"""
+    certificado = 'NIT: 900123456-1\nRazón Social: PESCA SAS\nEstado: ACTIVA'
+    rut = 'NIT: 900123456-1\nEstado: ACTIVO'
+    aviso = 'OBJETO: gestión pesquera\n' + 'Condiciones generales del proceso. ' * (SHARED_MEMORY_THRESHOLD // 30)
+    capa = CapaEjecucion(
+        {'analisis': {'tipo': EXECUTOR_PROCESSES, 'trabajadores': 1, 'max_concurrencia': 1}},
+        inicializador=tareas.inicializar_trabajador
+    )
+    
+    try:
+        with compartir(certificado, rut, aviso) as textos:
+            assert isinstance(textos[2], ReferenciaCompartida)
+            resultado = asyncio.run(capa.ejecutar('analisis', tareas.analizar_textos, *textos, 100000000))
+        assert resultado['datos_extraidos']['nit'] == '9001234561'
+        assert resultado['semaforo'] in ['VERDE', 'AMARILLO', 'ROJO']
+    finally:
+        capa.cerrar()
@@ -0,0 +1,102 @@
+"""Tests for the metrics registry, its exposition format and multi-worker aggregation"""
+
+import json
+import os
+
+from utils.metricas import AgregadorMultiproceso, RegistroMetricas, combinar, exposicion
+
+
+def _registro():
+    registro = RegistroMetricas()
+    registro.contador('peticiones_total', 'Requests', ('ruta',))
+    registro.indicador('en_cola', 'Queued tasks', ('etapa',))
+    registro.histograma('latencia_seconds', 'Latency', [10, 100], ('ruta',))
+    return registro
+
+
+def test_exposicion_formato_prometheus():
+    """Test counters, collected gauges and histograms render as cumulative buckets in seconds"""
+    registro = _registro()
+    registro.incrementar('peticiones_total', '/a')
+    registro.incrementar('peticiones_total', '/a')
+    registro.incrementar('peticiones_total', 'con "comillas"')
+    for ms in (5, 50, 500):
+        registro.observar('latencia_seconds', '/a', ms=ms)
+    registro.agregar_colector(lambda: [('en_cola', ('pdf',), 3)])
+    
+    texto = exposicion(registro.instantanea())
+    
+    assert '# TYPE peticiones_total counter' in texto
+    assert 'peticiones_total{ruta="/a"} 2' in texto
+    assert 'peticiones_total{ruta="con \\"comillas\\""} 1' in texto
+    assert 'en_cola{etapa="pdf"} 3' in texto
+    assert 'latencia_seconds_bucket{ruta="/a",le="0.01"} 1' in texto
+    assert 'latencia_seconds_bucket{ruta="/a",le="0.1"} 2' in texto
+    assert 'latencia_seconds_bucket{ruta="/a",le="+Inf"} 3' in texto
+    assert 'latencia_seconds_sum{ruta="/a"} 0.555' in texto
+    assert 'latencia_seconds_count{ruta="/a"} 3' in texto
+
+
+def test_colector_fallido_no_rompe_instantanea():
+    """Test a failing collector is skipped"""
+    registro = _registro()
+    
+    def fallar():
+        raise RuntimeError("sin datos")
+    
+    registro.agregar_colector(fallar)
+    registro.incrementar('peticiones_total', '/a')
+    
+    assert 'peticiones_total{ruta="/a"} 1' in exposicion(registro.instantanea())
+
+
+def test_combinar_suma_trabajadores():
+    """Test snapshots of several workers are summed per label values"""
+    uno, dos = _registro(), _registro()
+    uno.incrementar('peticiones_total', '/a', valor=2)
+    dos.incrementar('peticiones_total', '/a', valor=3)
+    dos.incrementar('peticiones_total', '/b')
+    uno.observar('latencia_seconds', '/a', ms=5)
+    dos.observar('latencia_seconds', '/a', ms=50)
+    uno.agregar_colector(lambda: [('en_cola', ('pdf',), 1)])
+    dos.agregar_colector(lambda: [('en_cola', ('pdf',), 4)])
+    
+    texto = exposicion(combinar([uno.instantanea(), dos.instantanea()]))
+    
+    assert 'peticiones_total{ruta="/a"} 5' in texto
+    assert 'peticiones_total{ruta="/b"} 1' in texto
+    assert 'en_cola{etapa="pdf"} 5' in texto
+    assert 'latencia_seconds_bucket{ruta="/a",le="0.1"} 2' in texto
+    assert 'latencia_seconds_count{ruta="/a"} 2' in texto
+
+
+def test_agregador_descarta_instantaneas_vencidas(tmp_path):
+    """Test a scrape merges fresh snapshots of other workers and removes stale ones"""
+    ahora = [1000.0]
+    agregador = AgregadorMultiproceso(str(tmp_path), vigencia=30, reloj=lambda: ahora[0])
+    otro = _registro()
+    otro.incrementar('peticiones_total', '/a', valor=7)
+    
+    for pid, actualizado_en in ((11, 990.0), (12, 900.0)):
+        instantanea = otro.instantanea()
+        instantanea.update(pid=pid, actualizado_en=actualizado_en)
+        agregador.volcar(instantanea)
+    
+    propia = _registro()
+    propia.incrementar('peticiones_total', '/a')
+    texto = exposicion(agregador.combinar(propia.instantanea()))
+    
+    assert 'peticiones_total{ruta="/a"} 8' in texto
+    assert sorted(os.listdir(tmp_path)) == ['11.json']
+    assert json.loads((tmp_path / '11.json').read_text())['pid'] == 11
+    
+    agregador.retirar(11)
+    assert os.listdir(tmp_path) == []
+
+
+def test_histograma_vacio_sin_muestras():
+    """Test declared families without observations still render their headers"""
+    texto = exposicion(_registro().instantanea())
+    
+    assert '# TYPE latencia_seconds histogram' in texto
+    assert 'latencia_seconds_count' not in texto
@@ -0,0 +1,76 @@
+"""Tests for the OCR path of scanned pages"""
+
+import os
+import pytest
+from utils import ocr
+from utils.pdf_handler import ManejadorDocumentos
+
+
+@pytest.fixture
+def renderizadas():
+    """(path, page) of every page rendered by the fake OCR engine"""
+    return []
+
+
+@pytest.fixture
+def motor_ocr(tmp_path, monkeypatch, renderizadas):
+    """Fake local OCR engine: renders the page number, recognizes a fixed text"""
+    llamadas = []
+    
+    def renderizar(ruta, numero):
+        assert os.path.isfile(ruta)
+        renderizadas.append((ruta, numero))
+        return b'pagina-%d' % numero
+    
+    def reconocer(imagen):
+        llamadas.append(imagen)
+        return 'NIT: 900123456 texto escaneado'
+    
+    monkeypatch.setattr(ocr, 'OCR_OK', True)
+    monkeypatch.setattr(ocr, 'renderizar_pagina', renderizar)
+    monkeypatch.setattr(ocr, 'reconocer_imagen', reconocer)
+    monkeypatch.setitem(ocr.OCR, 'directorio_cache', str(tmp_path))
+    return llamadas
+
+
+def test_cache_ocr(tmp_path):
+    """Test recognized text round-trips through the on-disk cache"""
+    cache = ocr.CacheOCR(str(tmp_path))
+    assert cache.obtener('ab' * 32) is None
+    cache.guardar('ab' * 32, 'texto')
+    assert cache.obtener('ab' * 32) == 'texto'
+
+
+def test_ocr_solo_paginas_sin_texto(generar_pdf, motor_ocr):
+    """Test only pages without a text layer are recognized, and only once"""
+    pdf = generar_pdf(['Pagina con capa de texto suficiente', ''])
+    manejador = ManejadorDocumentos(usar_ocr=True)
+    
+    resultado = manejador.procesar_pdf(pdf, tipo='bytes')
+    assert resultado['exito']
+    assert resultado['paginas_ocr'] == 1
+    assert 'texto escaneado' in resultado['texto']
+    assert len(motor_ocr) == 1
+    
+    repetido = manejador.procesar_pdf(pdf, tipo='bytes')
+    assert repetido['aciertos_cache_ocr'] == 1
+    assert len(motor_ocr) == 1
+    
+    sin_ocr = ManejadorDocumentos().procesar_pdf(pdf, tipo='bytes')
+    assert sin_ocr['paginas_ocr'] == 0
+
+
+def test_ocr_cacheado_no_renderiza_y_vuelca_una_vez(generar_pdf, motor_ocr, renderizadas):
+    """Test a document without a path is spooled once and cached pages skip pdftoppm"""
+    pdf = generar_pdf(['', '', 'Pagina con capa de texto suficiente'])
+    manejador = ManejadorDocumentos(usar_ocr=True)
+    
+    resultado = manejador.procesar_pdf(pdf, tipo='bytes')
+    assert resultado['paginas_ocr'] == 2
+    rutas = {ruta for ruta, _ in renderizadas}
+    assert len(rutas) == 1
+    assert not os.path.exists(rutas.pop())
+    
+    repetido = manejador.procesar_pdf(pdf, tipo='bytes')
+    assert repetido['aciertos_cache_ocr'] == 2
+    assert len(renderizadas) == 2
@@ -0,0 +1,55 @@
+"""Tests for ZIP bundle ingestion"""
+
+import io
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from utils import tareas
+from utils.paquetes import PaqueteInvalido, inventariar_paquete
+
+
+def _zip(entradas):
+    salida = io.BytesIO()
+    with zipfile.ZipFile(salida, 'w', zipfile.ZIP_DEFLATED) as archivo:
+        for nombre, datos in entradas.items():
+            archivo.writestr(nombre, datos)
+    return salida.getvalue()
+
+
+@pytest.fixture
+def paquete(generar_pdf):
+    return _zip({
+        'pliego_condiciones.pdf': generar_pdf(['PROCESO: LP-2024-001\nENTIDAD: ALCALDIA MUNICIPAL\n']),
+        'anexos/anexo_tecnico.pdf': generar_pdf(['Se exige poliza de cumplimiento', 'Experiencia minima', 'RUP vigente']),
+        'anexos/presupuesto.xlsx': b'x' * 300,
+        '__MACOSX/._pliego_condiciones.pdf': b'meta',
+    })
+
+
+def test_inventario_paquete(paquete, tmp_path):
+    """Test the notice and annexes are identified from the central directory"""
+    ruta = tmp_path / 'paquete.zip'
+    ruta.write_bytes(paquete)
+    
+    inventario = inventariar_paquete(str(ruta))
+    
+    assert inventario['pliego'].nombre == 'pliego_condiciones.pdf'
+    assert [anexo.nombre for anexo in inventario['anexos']] == ['anexos/anexo_tecnico.pdf', 'anexos/presupuesto.xlsx']
+    
+    ruta.write_bytes(_zip({'anexo.pdf': b'%PDF'}))
+    with pytest.raises(PaqueteInvalido):
+        inventariar_paquete(str(ruta))
+
+
+def test_procesar_paquete_cuenta_anexos(paquete):
+    """Test annexes are counted, sized and summarized in parallel"""
+    with ThreadPoolExecutor(max_workers=2) as ejecutor:
+        resumen = tareas.procesar_paquete(io.BytesIO(paquete), ejecutor_paginas=ejecutor)
+    
+    assert resumen['aviso']['datos']['numero_proceso'] == 'LP-2024-001'
+    assert resumen['num_anexos'] == 2
+    assert resumen['paginas_anexos'] == 3
+    assert resumen['tamano_anexos_bytes'] > 300
+    tecnico = resumen['anexos'][0]
+    assert {'poliza', 'experiencia', 'RUP'} <= set(tecnico['requisitos_mencionados'])
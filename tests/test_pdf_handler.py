@@ -0,0 +1,183 @@
+"""Tests for PDF text extraction"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from analysis_config import EXECUTOR_PROCESSES, PDF_EXTRACTION
+from core.extractor import ExtractorCertificado
+from core.plazo import Plazo
+from core.secciones import IndexadorSecciones
+from utils.ejecutores import EtapaEjecucion
+from utils.pdf_handler import ManejadorDocumentos
+
+
+def _paginas(n):
+    return [f'Pagina {i}' for i in range(n)]
+
+
+def test_extraccion_serial_con_tiempos(generar_pdf):
+    """Test serial extraction reports per-page timings"""
+    resultado = ManejadorDocumentos().procesar_pdf(generar_pdf(_paginas(3)), tipo='bytes')
+    
+    assert resultado['exito']
+    assert resultado['num_paginas'] == 3
+    assert resultado['paginas_procesadas'] == 3
+    assert len(resultado['tiempos_pagina_ms']) == 3
+    assert resultado['fragmentos'] == 1
+
+
+def test_extraccion_paralela_conserva_orden(generar_pdf):
+    """Test page ranges are reassembled in document order"""
+    n = PDF_EXTRACTION['paginas_por_fragmento'] * 2 + PDF_EXTRACTION['min_paginas_paralelo']
+    pdf = generar_pdf(_paginas(n))
+    
+    with ThreadPoolExecutor(max_workers=4) as ejecutor:
+        resultado = ManejadorDocumentos().procesar_pdf(pdf, tipo='bytes', ejecutor=ejecutor)
+    
+    serial = ManejadorDocumentos().procesar_pdf(pdf, tipo='bytes')
+    assert resultado['exito']
+    assert resultado['fragmentos'] > 1
+    assert resultado['texto'] == serial['texto']
+    assert resultado['texto'].index('Pagina 1\n') < resultado['texto'].index(f'Pagina {n - 1}')
+    assert len(resultado['tiempos_pagina_ms']) == n
+
+
+def test_presupuesto_de_paginas(generar_pdf):
+    """Test pages beyond max_paginas are not extracted"""
+    resultado = ManejadorDocumentos().procesar_pdf(generar_pdf(_paginas(5)), tipo='bytes', max_paginas=2)
+    
+    assert resultado['num_paginas'] == 5
+    assert resultado['paginas_procesadas'] == 2
+    assert 'Pagina 1' in resultado['texto']
+    assert 'Pagina 2' not in resultado['texto']
+
+
+def test_fragmentos_en_etapa_de_procesos(generar_pdf):
+    """Test page ranges run in a process stage and are counted in its metrics"""
+    pdf = generar_pdf(_paginas(PDF_EXTRACTION['min_paginas_paralelo']))
+    etapa = EtapaEjecucion('pdf', EXECUTOR_PROCESSES, 2, 2)
+    
+    try:
+        resultado = ManejadorDocumentos().procesar_pdf(pdf, tipo='bytes', ejecutor=etapa)
+    finally:
+        etapa.cerrar()
+    
+    assert resultado['exito']
+    assert f"Pagina {PDF_EXTRACTION['min_paginas_paralelo'] - 1}" in resultado['texto']
+    assert etapa.estadisticas()['completadas'] == resultado['fragmentos']
+    assert etapa.estadisticas()['en_ejecucion'] == 0
+
+
+def test_extraccion_perezosa_decodifica_solo_lo_necesario(generar_pdf):
+    """Test lazy extraction stops decoding at the end of the certificate section"""
+    n = PDF_EXTRACTION['paginas_por_fragmento'] * 6
+    certificado = (
+        "NIT: 900123456-1\nRazon Social: EMPRESA CONSTRUCTORA DEL CARIBE S.A.S. Sigla: ECC\n"
+        "Fecha expedicion: 01/01/2024\nEstado: ACTIVA\n"
+        "OBJETO SOCIAL: Construccion de obras civiles, consultoria tecnica e interventoria de proyectos\n"
+        "CAPITAL\nACTIVOS: $150,000,000\nPATRIMONIO: $90,000,000\nREPRESENTANTE LEGAL: PEDRO PEREZ\n"
+        "Identificacion: CC 1234567\nMunicipio: Barranquilla\n"
+        "Actividades secundarias: Alquiler de maquinaria pesada para obras de ingenieria civil\nCERTIFICAS ESPECIALES\n"
+    )
+    pdf = generar_pdf([certificado] + _paginas(n - 1))
+    
+    with ThreadPoolExecutor(max_workers=2) as ejecutor:
+        resultado = ManejadorDocumentos().procesar_pdf_incremental(
+            pdf, ExtractorCertificado(), tipo='bytes', ejecutor=ejecutor
+        )
+    serial = ManejadorDocumentos().procesar_pdf_incremental(pdf, ExtractorCertificado(), tipo='bytes')
+    
+    assert resultado['exito']
+    assert resultado['parada'] == 'fin_seccion'
+    assert resultado['paginas_procesadas'] == 1
+    assert resultado['datos']['nit'] == '9001234561'
+    assert resultado['paginas_decodificadas'] <= (
+        PDF_EXTRACTION['paginas_por_fragmento'] * PDF_EXTRACTION['fragmentos_adelantados']
+    )
+    assert serial['paginas_decodificadas'] == 1
+    assert serial['datos'] == resultado['datos']
+
+
+def test_iterar_paginas_en_streaming(generar_pdf):
+    """Test pages are yielded as (number, text) and consumed by the section indexer"""
+    pdf = generar_pdf(['OBJETO DEL CONTRATO: obras', 'Pagina intermedia', 'CRONOGRAMA\nApertura'])
+    manejador = ManejadorDocumentos()
+    
+    paginas = manejador.iterar_paginas(pdf, tipo='bytes')
+    numero, texto = next(paginas)
+    assert numero == 0
+    assert 'OBJETO DEL CONTRATO' in texto
+    paginas.close()
+    
+    with ThreadPoolExecutor(max_workers=2) as ejecutor:
+        secciones = IndexadorSecciones('aviso').indexar(
+            manejador.iterar_paginas(pdf, tipo='bytes', ejecutor=ejecutor)
+        )
+    assert secciones == {'objeto': [0], 'cronograma': [2]}
+
+
+class _EjecutorContado:
+    """Executor wrapper counting the ranges submitted"""
+    
+    def __init__(self, ejecutor):
+        self._ejecutor = ejecutor
+        self.enviados = 0
+    
+    def submit(self, *args, **kwargs):
+        self.enviados += 1
+        return self._ejecutor.submit(*args, **kwargs)
+
+
+def test_iterar_paginas_limita_rangos_en_vuelo(generar_pdf):
+    """Test iterar_paginas keeps at most fragmentos_adelantados ranges ahead of the consumer"""
+    por_fragmento = PDF_EXTRACTION['paginas_por_fragmento']
+    pdf = generar_pdf(_paginas(por_fragmento * 6))
+    manejador = ManejadorDocumentos()
+    
+    with ThreadPoolExecutor(max_workers=2) as base:
+        ejecutor = _EjecutorContado(base)
+        for numero, _ in manejador.iterar_paginas(pdf, tipo='bytes', ejecutor=ejecutor):
+            # Ranges before the current one are consumed; the rest are in flight
+            assert ejecutor.enviados - numero // por_fragmento <= PDF_EXTRACTION['fragmentos_adelantados']
+        assert ejecutor.enviados == 6
+        
+        assert list(manejador.iterar_paginas(pdf, tipo='bytes', ejecutor=ejecutor, plazo=Plazo(0))) == []
+
+
+class _Reloj:
+    """Clock whose deadline expires after the first page (or range) is read"""
+    
+    def __init__(self):
+        self.lecturas = 0
+    
+    def __call__(self):
+        # Read when the Plazo is created and before the first page
+        self.lecturas += 1
+        return 0 if self.lecturas <= 2 else 100
+
+
+def test_plazo_detiene_la_lectura(generar_pdf):
+    """Test pages are no longer decoded once the deadline has passed"""
+    pdf = generar_pdf(['NIT: 900123456-1'] + _paginas(4))
+    resultado = ManejadorDocumentos().procesar_pdf_incremental(
+        pdf, ExtractorCertificado(), tipo='bytes', plazo=Plazo(10, reloj=_Reloj())
+    )
+    
+    assert resultado['exito']
+    assert resultado['incompleto'] is True
+    assert resultado['paginas_decodificadas'] == 1
+    assert resultado['datos']['nit'] == '9001234561'
+
+
+def test_paginas_procesadas_cuenta_solo_las_leidas(generar_pdf):
+    """Test an interrupted read reports the pages read, not the ranges submitted ahead"""
+    por_fragmento = PDF_EXTRACTION['paginas_por_fragmento']
+    pdf = generar_pdf(_paginas(por_fragmento * 6))
+    
+    with ThreadPoolExecutor(max_workers=2) as ejecutor:
+        resultado = ManejadorDocumentos().procesar_pdf(
+            pdf, tipo='bytes', ejecutor=ejecutor, plazo=Plazo(10, reloj=_Reloj())
+        )
+    
+    assert resultado['incompleto'] is True
+    assert resultado['paginas_procesadas'] == por_fragmento
+    assert resultado['num_paginas'] == por_fragmento * 6
@@ -0,0 +1,66 @@
+"""Tests for the company profile store"""
+
+import pytest
+from datetime import datetime
+from data.perfiles import AlmacenPerfiles, construir_perfil
+
+
+def _empresa(nit, fecha_expedicion=None):
+    return {
+        'datos_cert': {'nit': nit, 'razon_social': f'EMPRESA {nit}', 'fecha_expedicion': fecha_expedicion},
+        'datos_rut': {'nit': nit, 'estado': 'ACTIVO'},
+        'puntos_estructura': 30,
+        'alertas_estructura': ['Representante legal no identificado'],
+    }
+
+
+@pytest.fixture
+def almacen(tmp_path):
+    almacen = AlmacenPerfiles(tmp_path / "perfiles.db")
+    yield almacen
+    almacen.cerrar()
+
+
+def test_guardar_y_obtener(almacen):
+    """Test profile round trip by NIT and certificate hash"""
+    perfil = construir_perfil(_empresa('900123456', '15/01/2024'), {'objeto_social': ['pesc']}, 'h1', 'h2')
+    almacen.guardar(perfil)
+    
+    guardado = almacen.obtener('900123456')
+    assert guardado['razon_social'] == 'EMPRESA 900123456'
+    assert guardado['tokens_similitud'] == {'objeto_social': ['pesc']}
+    assert guardado['fecha_expedicion'] == '2024-01-15'
+    assert almacen.obtener_por_hash('h1')['nit'] == '900123456'
+    assert almacen.obtener('000') is None
+
+
+def test_guardar_varios_actualiza(almacen):
+    """Test bulk upsert replaces existing profiles"""
+    perfiles = [construir_perfil(_empresa(str(900000000 + i)), {}) for i in range(5)]
+    assert almacen.guardar_varios(perfiles) == 5
+    
+    actualizado = construir_perfil(_empresa('900000000'), {})
+    actualizado['puntos_estructura'] = 40
+    almacen.guardar_varios([actualizado])
+    
+    assert almacen.obtener('900000000')['puntos_estructura'] == 40
+
+
+def test_vigencia(almacen):
+    """Test freshness tracking by expedition date"""
+    almacen.guardar_varios([
+        construir_perfil(_empresa('900000001', '01/06/2024'), {}),
+        construir_perfil(_empresa('900000002', '01/01/2024'), {}),
+        construir_perfil(_empresa('900000003'), {}),
+    ])
+    referencia = datetime(2024, 7, 1)
+    
+    assert sorted(almacen.nits_vencidos(referencia=referencia)) == ['900000002', '900000003']
+    assert AlmacenPerfiles.es_vigente(almacen.obtener('900000001'), referencia=referencia)
+    assert not AlmacenPerfiles.es_vigente(almacen.obtener('900000002'), referencia=referencia)
+
+
+def test_construir_perfil_sin_nit():
+    """Test profiles need a NIT"""
+    empresa = _empresa(None)
+    assert construir_perfil(empresa, {}) is None
@@ -0,0 +1,186 @@
+"""Tests for the durable job queue and its worker pool"""
+
+import os
+import threading
+import time
+
+import pytest
+from data.trabajos import COMPLETADO, EN_PROCESO, FALLIDO, PENDIENTE, ColaTrabajos
+from utils.trabajos import PoolTrabajos
+
+
+class _Reloj:
+    def __init__(self):
+        self.ahora = 1000.0
+    
+    def __call__(self):
+        return self.ahora
+
+
+class _ErrorConCodigo(Exception):
+    def __init__(self, status_code, detail):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+@pytest.fixture
+def reloj():
+    return _Reloj()
+
+
+@pytest.fixture
+def cola(tmp_path, reloj):
+    cola = ColaTrabajos(tmp_path / "trabajos.db", duracion_reserva=60, max_intentos=2, reloj=reloj)
+    yield cola
+    cola.cerrar()
+
+
+def test_prioridad_y_orden_de_llegada(cola, reloj):
+    """Test PRO jobs are claimed before earlier DEMO jobs, FIFO within a priority"""
+    demo = cola.encolar('demo', {'n': 1}, prioridad=0)
+    reloj.ahora += 1
+    pro_1 = cola.encolar('pro', {'n': 2}, prioridad=10)
+    reloj.ahora += 1
+    pro_2 = cola.encolar('pro', {'n': 3}, prioridad=10)
+    
+    assert cola.posicion(demo) == 2
+    assert cola.posicion(pro_1) == 0
+    assert [cola.tomar()['id'] for _ in range(3)] == [pro_1, pro_2, demo]
+    assert cola.tomar() is None
+    assert cola.obtener(demo)['estado'] == EN_PROCESO
+    assert cola.obtener(demo)['parametros'] == {'n': 1}
+
+
+def test_reserva_vencida_se_reintenta(cola, reloj):
+    """Test a job abandoned by its worker is claimed again, then failed after max attempts"""
+    id_trabajo = cola.encolar('pro', {})
+    assert cola.tomar()['intentos'] == 1
+    assert cola.tomar() is None
+    
+    reloj.ahora += 61
+    assert cola.tomar()['intentos'] == 2
+    
+    reloj.ahora += 61
+    assert cola.tomar() is None
+    trabajo = cola.obtener(id_trabajo)
+    assert trabajo['estado'] == FALLIDO
+    assert 'abandoned' in trabajo['error']
+
+
+def test_estadisticas_y_purga(cola, reloj):
+    """Test throughput and queue latency are derived from finished jobs"""
+    id_trabajo = cola.encolar('pro', {})
+    cola.encolar('demo', {}, prioridad=0)
+    reloj.ahora += 2
+    cola.tomar()
+    reloj.ahora += 3
+    cola.completar(id_trabajo, {'score': 80})
+    
+    estadisticas = cola.estadisticas(ventana=60)
+    assert estadisticas['por_estado'] == {PENDIENTE: 1, EN_PROCESO: 0, COMPLETADO: 1, FALLIDO: 0}
+    assert estadisticas['terminados_por_minuto'] == 1
+    assert estadisticas['espera_cola_ms']['media'] == 2000
+    assert estadisticas['ejecucion_ms']['max'] == 3000
+    assert cola.obtener(id_trabajo)['resultado'] == {'score': 80}
+    
+    reloj.ahora += 100
+    assert cola.purgar(50) == [id_trabajo]
+    assert cola.obtener(id_trabajo) is None
+
+
+def test_pool_ejecuta_y_registra_errores(cola):
+    """Test workers store results and keep the status code of failed jobs"""
+    def ejecutar(trabajo):
+        if trabajo['parametros']['falla']:
+            raise _ErrorConCodigo(400, 'RUT PDF error')
+        return {'ok': trabajo['id']}
+    
+    pool = PoolTrabajos(cola, ejecutar, trabajadores=2, intervalo_sondeo=0.05)
+    bueno = cola.encolar('pro', {'falla': False})
+    malo = cola.encolar('demo', {'falla': True})
+    pool.iniciar()
+    try:
+        limite = time.monotonic() + 10
+        while pool.completados + pool.fallidos < 2 and time.monotonic() < limite:
+            time.sleep(0.02)
+    finally:
+        pool.detener(timeout=5)
+    
+    assert cola.obtener(bueno)['resultado'] == {'ok': bueno}
+    fallido = cola.obtener(malo)
+    assert (fallido['estado'], fallido['codigo_error'], fallido['error']) == (FALLIDO, 400, 'RUT PDF error')
+    assert pool.estadisticas()['completados'] == 1
+
+
+def test_pool_conserva_cargas_de_trabajos_liberados(cola, tmp_path):
+    """Test uploads are dropped once a job finishes but kept when shutdown releases it"""
+    iniciado = threading.Event()
+    
+    def ejecutar(trabajo):
+        if trabajo['parametros']['detener']:
+            iniciado.set()
+            pool._detenido.wait(5)
+            raise RuntimeError('executor closed')
+        return {'ok': True}
+    
+    pool = PoolTrabajos(cola, ejecutar, trabajadores=1, intervalo_sondeo=0.05, directorio=str(tmp_path / "cargas"))
+    terminado = cola.encolar('pro', {'detener': False})
+    os.makedirs(pool.directorio_trabajo(terminado))
+    pool.iniciar()
+    try:
+        limite = time.monotonic() + 10
+        while pool.completados < 1 and time.monotonic() < limite:
+            time.sleep(0.02)
+        liberado = cola.encolar('pro', {'detener': True})
+        os.makedirs(pool.directorio_trabajo(liberado))
+        pool.notificar()
+        assert iniciado.wait(10)
+    finally:
+        pool.detener(timeout=5)
+    
+    assert not os.path.exists(pool.directorio_trabajo(terminado))
+    assert cola.obtener(liberado)['estado'] == PENDIENTE
+    assert os.path.isdir(pool.directorio_trabajo(liberado))
+
+
+def test_pool_renueva_la_reserva_de_trabajos_largos(cola, reloj):
+    """Test a job running longer than the lease is not claimed a second time"""
+    reclamados = []
+    
+    def ejecutar(trabajo):
+        for _ in range(3):
+            reloj.ahora += 50
+            time.sleep(0.2)
+            reclamados.append(cola.tomar())
+        return {'ok': True}
+    
+    pool = PoolTrabajos(cola, ejecutar, trabajadores=1, intervalo_sondeo=0.05, intervalo_renovacion=0.02)
+    id_trabajo = cola.encolar('pro', {})
+    pool.iniciar()
+    try:
+        limite = time.monotonic() + 10
+        while pool.completados < 1 and time.monotonic() < limite:
+            time.sleep(0.02)
+    finally:
+        pool.detener(timeout=5)
+    
+    assert reclamados == [None, None, None]
+    trabajo = cola.obtener(id_trabajo)
+    assert trabajo['estado'] == COMPLETADO
+    assert trabajo['intentos'] == 1
+
+
+def test_limpiar_huerfanos_respeta_cargas_recientes(cola, tmp_path):
+    """Test only old upload folders without a queued job are dropped"""
+    pool = PoolTrabajos(cola, lambda trabajo: {}, directorio=str(tmp_path / "cargas"))
+    encolado = cola.encolar('pro', {})
+    for nombre in (encolado, 'huerfano', 'reciente'):
+        os.makedirs(pool.directorio_trabajo(nombre))
+    antiguo = time.time() - cola.duracion_reserva - 10
+    for nombre in (encolado, 'huerfano'):
+        os.utime(pool.directorio_trabajo(nombre), (antiguo, antiguo))
+    
+    assert pool.limpiar_huerfanos() == ['huerfano']
+    assert os.path.isdir(pool.directorio_trabajo(encolado))
+    assert os.path.isdir(pool.directorio_trabajo('reciente'))
@@ -0,0 +1,309 @@
+"""Admission control for analysis requests: per-client rate limits and a global concurrency cap"""
+
+import asyncio
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Deque, Dict, Iterable, Optional
+
+from starlette.responses import JSONResponse
+
+logger = logging.getLogger(__name__)
+
+
+class Sobrecarga(Exception):
+    """Request rejected by admission control"""
+    
+    def __init__(self, motivo: str, reintentar_en: float):
+        super().__init__(motivo)
+        self.reintentar_en = reintentar_en
+    
+    @property
+    def retry_after(self) -> str:
+        """Retry-After header value (whole seconds, at least 1)"""
+        return str(max(1, math.ceil(self.reintentar_en)))
+
+
+class LimitadorTokens:
+    """
+    Token bucket per client.
+    
+    Each client earns `tasa` tokens per second up to `rafaga`; every request
+    spends one. Idle clients are forgotten beyond max_clientes (LRU).
+    """
+    
+    def __init__(
+        self,
+        tasa: float,
+        rafaga: int,
+        max_clientes: int = 10_000,
+        reloj: Callable[[], float] = time.monotonic
+    ):
+        self.tasa = tasa
+        self.rafaga = rafaga
+        self.max_clientes = max_clientes
+        self._reloj = reloj
+        self._cubetas: "OrderedDict[str, list]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.rechazadas = 0
+    
+    def configurar(self, tasa: Optional[float] = None, rafaga: Optional[int] = None) -> None:
+        """Change the limits; buckets keep their tokens (capped to the new burst)"""
+        with self._lock:
+            if tasa is not None:
+                self.tasa = tasa
+            if rafaga is not None:
+                self.rafaga = rafaga
+    
+    def reiniciar(self) -> None:
+        """Forget every client bucket; each client starts again with a full burst"""
+        with self._lock:
+            self._cubetas.clear()
+    
+    def consumir(self, cliente: str) -> None:
+        """
+        Spend one token for a request.
+        
+        Raises:
+            Sobrecarga: If the client has no token left, with the time until the next one
+        """
+        ahora = self._reloj()
+        with self._lock:
+            cubeta = self._cubetas.get(cliente)
+            if cubeta is None:
+                cubeta = [float(self.rafaga), ahora]
+                self._cubetas[cliente] = cubeta
+                while len(self._cubetas) > self.max_clientes:
+                    self._cubetas.popitem(last=False)
+            else:
+                self._cubetas.move_to_end(cliente)
+                cubeta[0] = min(float(self.rafaga), cubeta[0] + (ahora - cubeta[1]) * self.tasa)
+                cubeta[1] = ahora
+            
+            if cubeta[0] >= 1:
+                cubeta[0] -= 1
+                return
+            self.rechazadas += 1
+            faltante = 1 - cubeta[0]
+        raise Sobrecarga(
+            "Rate limit exceeded", faltante / self.tasa if self.tasa > 0 else 60
+        )
+    
+    def estadisticas(self) -> Dict:
+        return {
+            'tasa': self.tasa,
+            'rafaga': self.rafaga,
+            'clientes': len(self._cubetas),
+            'rechazadas': self.rechazadas
+        }
+
+
+class ControlAdmision:
+    """
+    Global cap on concurrent requests with a bounded FIFO wait queue.
+    
+    Requests beyond max_concurrentes wait for a slot; when the queue is full,
+    or a request waits longer than espera_maxima, it is rejected right away
+    instead of slowing every other request down. Freed slots are handed
+    directly to the oldest waiter.
+    """
+    
+    def __init__(self, max_concurrentes: int, max_en_espera: int, espera_maxima: float):
+        self.max_concurrentes = max_concurrentes
+        self.max_en_espera = max_en_espera
+        self.espera_maxima = espera_maxima
+        self._lock = threading.Lock()
+        self._en_espera: Deque[asyncio.Future] = deque()
+        self.en_curso = 0
+        self.admitidas = 0
+        self.rechazadas_cola_llena = 0
+        self.rechazadas_espera = 0
+        self.max_en_espera_observada = 0
+        # Exponential moving average of the time a request holds a slot
+        self.duracion_media = 1.0
+    
+    def configurar(
+        self,
+        max_concurrentes: Optional[int] = None,
+        max_en_espera: Optional[int] = None,
+        espera_maxima: Optional[float] = None
+    ) -> None:
+        """
+        Change the limits at runtime.
+        
+        Requests already admitted keep their slot; a higher cap admits
+        waiters right away, a lower one takes effect as slots are freed.
+        """
+        with self._lock:
+            if max_concurrentes is not None:
+                self.max_concurrentes = max_concurrentes
+            if max_en_espera is not None:
+                self.max_en_espera = max_en_espera
+            if espera_maxima is not None:
+                self.espera_maxima = espera_maxima
+            while self._en_espera and self.en_curso < self.max_concurrentes:
+                self.en_curso += 1
+                self._entregar(self._en_espera.popleft())
+    
+    def _reintentar_en(self) -> float:
+        """Estimated seconds until the queue ahead drains (lock held)"""
+        return self.duracion_media * (len(self._en_espera) + 1) / max(self.max_concurrentes, 1)
+    
+    async def entrar(self) -> None:
+        """
+        Take a slot, waiting in the queue if needed.
+        
+        Raises:
+            Sobrecarga: If the queue is full or the wait exceeds espera_maxima
+        """
+        with self._lock:
+            if self.en_curso < self.max_concurrentes and not self._en_espera:
+                self.en_curso += 1
+                self.admitidas += 1
+                return
+            if len(self._en_espera) >= self.max_en_espera:
+                self.rechazadas_cola_llena += 1
+                raise Sobrecarga("Server overloaded", self._reintentar_en())
+            futuro = asyncio.get_running_loop().create_future()
+            self._en_espera.append(futuro)
+            self.max_en_espera_observada = max(self.max_en_espera_observada, len(self._en_espera))
+            espera = self.espera_maxima
+        
+        try:
+            await asyncio.wait_for(futuro, espera)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            with self._lock:
+                if futuro in self._en_espera:
+                    self._en_espera.remove(futuro)
+                    propio = False
+                else:
+                    # Handed a slot just as the wait ended: give it back
+                    propio = futuro.done() and not futuro.cancelled()
+                if isinstance(e, asyncio.TimeoutError):
+                    self.rechazadas_espera += 1
+                reintentar_en = self._reintentar_en()
+            if propio:
+                self.salir()
+            if isinstance(e, asyncio.TimeoutError):
+                raise Sobrecarga("Server overloaded", reintentar_en) from None
+            raise
+        with self._lock:
+            self.admitidas += 1
+    
+    def salir(self, duracion: Optional[float] = None) -> None:
+        """Free a slot, handing it to the oldest waiter if any"""
+        with self._lock:
+            if duracion is not None:
+                self.duracion_media = 0.9 * self.duracion_media + 0.1 * duracion
+            if self._en_espera and self.en_curso <= self.max_concurrentes:
+                self._entregar(self._en_espera.popleft())
+            else:
+                self.en_curso -= 1
+    
+    def _entregar(self, futuro: asyncio.Future) -> None:
+        """Wake a waiter with the slot (lock held); the future may live on another loop"""
+        futuro.get_loop().call_soon_threadsafe(self._despertar, futuro)
+    
+    def _despertar(self, futuro: asyncio.Future) -> None:
+        if futuro.done():
+            # The waiter gave up in the meantime: pass the slot on
+            self.salir()
+        else:
+            futuro.set_result(None)
+    
+    def estadisticas(self) -> Dict:
+        return {
+            'max_concurrentes': self.max_concurrentes,
+            'max_en_espera': self.max_en_espera,
+            'espera_maxima_segundos': self.espera_maxima,
+            'en_curso': self.en_curso,
+            'en_espera': len(self._en_espera),
+            'max_en_espera_observada': self.max_en_espera_observada,
+            'admitidas': self.admitidas,
+            'rechazadas_cola_llena': self.rechazadas_cola_llena,
+            'rechazadas_espera': self.rechazadas_espera,
+            'duracion_media_segundos': round(self.duracion_media, 3)
+        }
+
+
+def identificar_cliente(scope, usar_x_forwarded_for: bool = False) -> str:
+    """Client identity: first X-Forwarded-For address (if trusted) or the peer address"""
+    if usar_x_forwarded_for:
+        for nombre, valor in scope.get('headers', []):
+            if nombre == b'x-forwarded-for':
+                return valor.decode('latin-1').split(',')[0].strip()
+    cliente = scope.get('client')
+    return cliente[0] if cliente else 'desconocido'
+
+
+class MiddlewareAdmision:
+    """
+    ASGI middleware applying admission control to one path prefix.
+    
+    Every request under the prefix spends a token of its client's bucket
+    (429 when empty). Requests other than GET also need a concurrency slot
+    (503 when the wait queue is full or the wait is too long), held until the
+    response, including a streamed body, is completely sent. Both rejections
+    carry Retry-After. Paths outside the prefix and OPTIONS requests (CORS
+    preflights) are passed through untouched.
+    """
+    
+    def __init__(
+        self,
+        app,
+        limitador: LimitadorTokens,
+        control: ControlAdmision,
+        prefijo: str,
+        rutas_exentas: Iterable[str] = (),
+        usar_x_forwarded_for: bool = False
+    ):
+        self.app = app
+        self.limitador = limitador
+        self.control = control
+        self.prefijo = prefijo
+        self.rutas_exentas = set(rutas_exentas)
+        self.usar_x_forwarded_for = usar_x_forwarded_for
+    
+    async def __call__(self, scope, receive, send):
+        ruta = scope.get('path', '')
+        if (
+            scope['type'] != 'http'
+            or scope['method'] == 'OPTIONS'
+            or not ruta.startswith(self.prefijo)
+            or ruta in self.rutas_exentas
+        ):
+            await self.app(scope, receive, send)
+            return
+        
+        try:
+            self.limitador.consumir(identificar_cliente(scope, self.usar_x_forwarded_for))
+        except Sobrecarga as e:
+            await self._rechazar(scope, receive, send, 429, e)
+            return
+        
+        if scope['method'] == 'GET':
+            await self.app(scope, receive, send)
+            return
+        
+        try:
+            await self.control.entrar()
+        except Sobrecarga as e:
+            await self._rechazar(scope, receive, send, 503, e)
+            return
+        
+        inicio = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.control.salir(time.perf_counter() - inicio)
+    
+    async def _rechazar(self, scope, receive, send, estado: int, error: Sobrecarga) -> None:
+        logger.warning(f"Rejected {scope['method']} {scope['path']} with {estado}: {str(error)}")
+        respuesta = JSONResponse(
+            status_code=estado,
+            content={"detail": str(error)},
+            headers={"Retry-After": error.retry_after}
+        )
+        await respuesta(scope, receive, send)
@@ -0,0 +1,319 @@
+"""
+Pluggable PDF text backends.
+
+Each backend opens a PDF from a binary stream (plus its path when the
+document is on disk) and returns a DocumentoPDF that decodes pages on
+demand. Optional libraries and binaries are detected at import time;
+backends that are not installed report disponible = False.
+
+- pypdf / pypdf2: pure Python, always the baseline
+- pdftotext: poppler-utils subprocess (fast, good layout)
+- pdfminer: pdfminer.six (slow, robust on unusual encodings)
+"""
+
+import io
+import logging
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+from analysis_config import PDF_BACKENDS
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pypdf
+    PYPDF_OK = True
+except ImportError:
+    PYPDF_OK = False
+
+try:
+    import PyPDF2
+    PYPDF2_OK = True
+except ImportError:
+    PYPDF2_OK = False
+
+try:
+    from pdfminer.converter import TextConverter
+    from pdfminer.layout import LAParams
+    from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+    from pdfminer.pdfpage import PDFPage
+    PDFMINER_OK = True
+except ImportError:
+    PDFMINER_OK = False
+
+PDFTOTEXT_OK = shutil.which('pdftotext') is not None and shutil.which('pdfinfo') is not None
+
+
+class DocumentoPDF:
+    """Opened PDF document; pages are decoded when requested"""
+    
+    num_paginas: int = 0
+    
+    def extraer_pagina(self, numero: int) -> str:
+        """Text of page `numero` (0-based)"""
+        raise NotImplementedError
+    
+    def cerrar(self) -> None:
+        pass
+
+
+class BackendPDF:
+    """PDF text extraction backend"""
+    
+    nombre = ''
+    disponible = False
+    
+    def abrir(self, stream: BinaryIO, ruta: Optional[str] = None) -> DocumentoPDF:
+        """
+        Open a PDF.
+        
+        Args:
+            stream: Seekable binary stream positioned anywhere
+            ruta: Path of the same document when it is a file on disk
+            
+        Returns:
+            DocumentoPDF
+        """
+        raise NotImplementedError
+
+
+class _DocumentoPyPDF(DocumentoPDF):
+    
+    def __init__(self, reader):
+        self._reader = reader
+        self.num_paginas = len(reader.pages)
+    
+    def extraer_pagina(self, numero: int) -> str:
+        return self._reader.pages[numero].extract_text() or ''
+
+
+class BackendPyPDF(BackendPDF):
+    """pypdf (or its predecessor PyPDF2) reader"""
+    
+    def __init__(self, modulo, nombre: str):
+        self._modulo = modulo
+        self.nombre = nombre
+        self.disponible = modulo is not None
+    
+    def abrir(self, stream: BinaryIO, ruta: Optional[str] = None) -> DocumentoPDF:
+        return _DocumentoPyPDF(self._modulo.PdfReader(stream))
+
+
+class _DocumentoPdfminer(DocumentoPDF):
+    
+    def __init__(self, stream: BinaryIO):
+        self._paginas = list(PDFPage.get_pages(stream))
+        self.num_paginas = len(self._paginas)
+        self._recursos = PDFResourceManager()
+    
+    def extraer_pagina(self, numero: int) -> str:
+        salida = io.StringIO()
+        with TextConverter(self._recursos, salida, laparams=LAParams()) as conversor:
+            PDFPageInterpreter(self._recursos, conversor).process_page(self._paginas[numero])
+        return salida.getvalue()
+
+
+class BackendPdfminer(BackendPDF):
+    """pdfminer.six layout analysis"""
+    
+    nombre = 'pdfminer'
+    disponible = PDFMINER_OK
+    
+    def abrir(self, stream: BinaryIO, ruta: Optional[str] = None) -> DocumentoPDF:
+        return _DocumentoPdfminer(stream)
+
+
+class _DocumentoPdftotext(DocumentoPDF):
+    
+    def __init__(self, stream: BinaryIO, ruta: Optional[str]):
+        self._temporal = None
+        if ruta is None:
+            # The poppler tools need a file; spool streams to a temporary one
+            descriptor, ruta = tempfile.mkstemp(prefix='licitia-', suffix='.pdf')
+            self._temporal = ruta
+            with os.fdopen(descriptor, 'wb') as destino:
+                stream.seek(0)
+                shutil.copyfileobj(stream, destino)
+        self._ruta = ruta
+        self._cache: Dict[int, str] = {}
+        try:
+            info = self._ejecutar(['pdfinfo', ruta])
+            match = re.search(r'^Pages:\s+(\d+)', info, re.MULTILINE)
+            if not match:
+                raise ValueError("pdfinfo did not report a page count")
+            self.num_paginas = int(match.group(1))
+        except Exception:
+            self.cerrar()
+            raise
+    
+    def _ejecutar(self, comando: List[str]) -> str:
+        resultado = subprocess.run(
+            comando, capture_output=True, timeout=PDF_BACKENDS['timeout_subproceso'], check=True
+        )
+        return resultado.stdout.decode('utf-8', errors='replace')
+    
+    def extraer_pagina(self, numero: int) -> str:
+        if numero not in self._cache:
+            # One subprocess per batch of pages; pages are separated by form feeds
+            fin = min(numero + PDF_BACKENDS['lote_pdftotext'], self.num_paginas)
+            salida = self._ejecutar([
+                'pdftotext', '-layout', '-enc', 'UTF-8',
+                '-f', str(numero + 1), '-l', str(fin), self._ruta, '-'
+            ])
+            for desplazamiento, texto in enumerate(salida.split('\f')[:fin - numero]):
+                self._cache[numero + desplazamiento] = texto
+        return self._cache.pop(numero, '')
+    
+    def cerrar(self) -> None:
+        if self._temporal is not None:
+            try:
+                os.unlink(self._temporal)
+            except FileNotFoundError:
+                pass
+            self._temporal = None
+
+
+class BackendPdftotext(BackendPDF):
+    """poppler-utils pdftotext subprocess"""
+    
+    nombre = 'pdftotext'
+    disponible = PDFTOTEXT_OK
+    
+    def abrir(self, stream: BinaryIO, ruta: Optional[str] = None) -> DocumentoPDF:
+        return _DocumentoPdftotext(stream, ruta)
+
+
+BACKENDS: Dict[str, BackendPDF] = {
+    'pypdf': BackendPyPDF(pypdf if PYPDF_OK else None, 'pypdf'),
+    'pypdf2': BackendPyPDF(PyPDF2 if PYPDF2_OK else None, 'pypdf2'),
+    'pdftotext': BackendPdftotext(),
+    'pdfminer': BackendPdfminer(),
+}
+
+# Backend chosen by calibration (tried first)
+_preferido: Optional[str] = None
+
+
+def obtener_backend(nombre: str) -> BackendPDF:
+    """Get a backend by name"""
+    if nombre not in BACKENDS:
+        raise KeyError(f"Unknown PDF backend: {nombre}")
+    return BACKENDS[nombre]
+
+
+def backends_disponibles() -> List[BackendPDF]:
+    """
+    Installed backends in fallback order.
+    
+    Returns:
+        The calibrated backend first (if any), then PDF_BACKENDS['orden']
+    """
+    orden = list(PDF_BACKENDS['orden'])
+    if _preferido in orden:
+        orden.remove(_preferido)
+        orden.insert(0, _preferido)
+    return [BACKENDS[nombre] for nombre in orden if nombre in BACKENDS and BACKENDS[nombre].disponible]
+
+
+def establecer_preferido(nombre: Optional[str]) -> None:
+    """Set the backend tried first (None restores the configured order)"""
+    global _preferido
+    if nombre is not None:
+        obtener_backend(nombre)
+    _preferido = nombre
+
+
+def _palabras(texto: str) -> set:
+    return set(re.findall(r'\w{3,}', texto.lower()))
+
+
+def _calidad(paginas: List[str], referencia: Optional[str]) -> float:
+    """Word recall against the reference text, or share of pages with text"""
+    if referencia is not None:
+        esperadas = _palabras(referencia)
+        if not esperadas:
+            return 1.0
+        return len(esperadas & _palabras('\n'.join(paginas))) / len(esperadas)
+    if not paginas:
+        return 0.0
+    return sum(1 for pagina in paginas if pagina.strip()) / len(paginas)
+
+
+def cargar_corpus(directorio: str) -> List[Tuple[bytes, Optional[str]]]:
+    """
+    Load the calibration corpus.
+    
+    Args:
+        directorio: Folder with PDFs; an optional <name>.txt next to each
+            PDF holds its reference text
+            
+    Returns:
+        List of (PDF bytes, reference text or None)
+    """
+    corpus = []
+    for ruta in sorted(Path(directorio).glob('*.pdf')):
+        referencia = ruta.with_suffix('.txt')
+        corpus.append((
+            ruta.read_bytes(),
+            referencia.read_text(encoding='utf-8') if referencia.exists() else None
+        ))
+    return corpus
+
+
+def calibrar(
+    corpus: List[Tuple[bytes, Optional[str]]],
+    calidad_minima: Optional[float] = None,
+    aplicar: bool = True
+) -> Dict:
+    """
+    Benchmark the installed backends on a corpus and pick the fastest good one.
+    
+    Args:
+        corpus: List of (PDF bytes, reference text or None)
+        calidad_minima: Mean quality a backend must reach (default PDF_BACKENDS['calidad_minima'])
+        aplicar: Make the chosen backend the preferred one
+        
+    Returns:
+        dict with 'elegido' (None if no backend qualifies) and per-backend
+        'resultados' (tiempo_ms, calidad, errores)
+    """
+    calidad_minima = PDF_BACKENDS['calidad_minima'] if calidad_minima is None else calidad_minima
+    resultados = {}
+    
+    for backend in backends_disponibles():
+        tiempo = 0.0
+        calidades = []
+        errores = 0
+        for datos, referencia in corpus:
+            t0 = time.perf_counter()
+            try:
+                documento = backend.abrir(io.BytesIO(datos))
+                try:
+                    paginas = [documento.extraer_pagina(n) for n in range(documento.num_paginas)]
+                finally:
+                    documento.cerrar()
+            except Exception:
+                errores += 1
+                calidades.append(0.0)
+                continue
+            finally:
+                tiempo += time.perf_counter() - t0
+            calidades.append(_calidad(paginas, referencia))
+        resultados[backend.nombre] = {
+            'tiempo_ms': round(tiempo * 1000, 3),
+            'calidad': round(sum(calidades) / len(calidades), 4) if calidades else 0.0,
+            'errores': errores
+        }
+    
+    aptos = [nombre for nombre, r in resultados.items() if r['calidad'] >= calidad_minima]
+    elegido = min(aptos, key=lambda nombre: resultados[nombre]['tiempo_ms']) if aptos else None
+    if aplicar and elegido is not None:
+        establecer_preferido(elegido)
+    logger.info(f"PDF backend calibration: {elegido or 'none qualified'} {resultados}")
+    return {'elegido': elegido, 'resultados': resultados}
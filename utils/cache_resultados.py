@@ -0,0 +1,167 @@
+"""Date-aware analysis result cache with scheduled re-scoring"""
+
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Recompute callback: given the evaluation date, returns (result, valid_until)
+Recalculo = Callable[[Optional[datetime]], Tuple[Dict, Optional[datetime]]]
+
+
+class _Entrada:
+    """Cached result plus the pre-computed result for after its expiry"""
+    
+    __slots__ = ('resultado', 'vence_en', 'recalcular', 'siguiente', 'siguiente_vence_en')
+    
+    def __init__(self, resultado: Dict, vence_en: Optional[datetime], recalcular: Recalculo):
+        self.resultado = resultado
+        self.vence_en = vence_en
+        self.recalcular = recalcular
+        self.siguiente = None
+        self.siguiente_vence_en = None
+
+
+class CacheResultados:
+    """
+    Bounded LRU cache of analysis results with date-derived expiry.
+    
+    Each entry expires at the instant its date-based validation would change
+    (see ValidadorEstructural.proximo_cambio_certificado), never by a fixed
+    TTL. The background scheduler re-scores entries about to expire using
+    that instant as the evaluation date and keeps the result ready, so reads
+    across the threshold stay cache hits and never return stale data.
+    """
+    
+    def __init__(self, max_entradas: int = 1000, reloj: Callable[[], datetime] = datetime.now):
+        self.max_entradas = max_entradas
+        self._reloj = reloj
+        self._entradas: "OrderedDict[str, _Entrada]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.recalculos = 0
+    
+    def obtener(self, clave: str) -> Optional[Dict]:
+        """Get a cached result if it is still valid at the current time"""
+        ahora = self._reloj()
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None and entrada.vence_en is not None and ahora >= entrada.vence_en:
+                if entrada.siguiente is not None and (
+                    entrada.siguiente_vence_en is None or ahora < entrada.siguiente_vence_en
+                ):
+                    # Promote the result pre-computed for the new period
+                    entrada.resultado = entrada.siguiente
+                    entrada.vence_en = entrada.siguiente_vence_en
+                    entrada.siguiente = None
+                    entrada.siguiente_vence_en = None
+                else:
+                    del self._entradas[clave]
+                    entrada = None
+            
+            if entrada is None:
+                self.fallos += 1
+                return None
+            
+            self._entradas.move_to_end(clave)
+            self.aciertos += 1
+            return entrada.resultado
+    
+    def guardar(
+        self,
+        clave: str,
+        resultado: Dict,
+        vence_en: Optional[datetime],
+        recalcular: Recalculo
+    ) -> None:
+        """
+        Store a result.
+        
+        Args:
+            clave: Cache key (hash of the analysis inputs)
+            resultado: Analysis result
+            vence_en: Instant at which the result stops being valid (None = no date dependency)
+            recalcular: Callback to re-score the inputs at a given date
+        """
+        with self._lock:
+            self._entradas[clave] = _Entrada(resultado, vence_en, recalcular)
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+    
+    def obtener_o_calcular(self, clave: str, recalcular: Recalculo) -> Dict:
+        """Get a cached result or compute and store it"""
+        resultado = self.obtener(clave)
+        if resultado is None:
+            resultado, vence_en = recalcular(None)
+            self.guardar(clave, resultado, vence_en, recalcular)
+        return resultado
+    
+    def por_vencer(self, horizonte: timedelta) -> List[str]:
+        """Keys that expire within the horizon and have no pre-computed successor"""
+        limite = self._reloj() + horizonte
+        with self._lock:
+            return [
+                clave for clave, entrada in self._entradas.items()
+                if entrada.vence_en is not None
+                and entrada.vence_en <= limite
+                and entrada.siguiente is None
+            ]
+    
+    def recalcular_por_vencer(self, horizonte: timedelta) -> int:
+        """
+        Re-score entries about to cross a date threshold.
+        
+        Returns:
+            Number of entries re-scored
+        """
+        recalculadas = 0
+        for clave in self.por_vencer(horizonte):
+            with self._lock:
+                entrada = self._entradas.get(clave)
+            if entrada is None:
+                continue
+            try:
+                siguiente, siguiente_vence_en = entrada.recalcular(entrada.vence_en)
+            except Exception as e:
+                logger.warning(f"Error re-scoring cached analysis {clave[:12]}: {str(e)}")
+                continue
+            with self._lock:
+                if self._entradas.get(clave) is entrada:
+                    entrada.siguiente = siguiente
+                    entrada.siguiente_vence_en = siguiente_vence_en
+                    recalculadas += 1
+        self.recalculos += recalculadas
+        return recalculadas
+    
+    async def programar_recalculo(
+        self,
+        intervalo_segundos: float = 600,
+        horizonte: timedelta = timedelta(hours=1)
+    ) -> None:
+        """Background loop that re-scores entries before they expire"""
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                recalculadas = await loop.run_in_executor(None, self.recalcular_por_vencer, horizonte)
+                if recalculadas:
+                    logger.info(f"Re-scored {recalculadas} cached analyses before expiry")
+            except Exception as e:
+                logger.error(f"Error in analysis cache scheduler: {str(e)}", exc_info=True)
+            await asyncio.sleep(intervalo_segundos)
+    
+    def estadisticas(self) -> Dict:
+        """Cache hit/miss counters"""
+        total = self.aciertos + self.fallos
+        return {
+            'entradas': len(self._entradas),
+            'aciertos': self.aciertos,
+            'fallos': self.fallos,
+            'tasa_aciertos': self.aciertos / total if total else 0.0,
+            'recalculos': self.recalculos
+        }
@@ -0,0 +1,94 @@
+"""Memory-bounded handling of uploaded documents"""
+
+import hashlib
+import os
+import tempfile
+from typing import BinaryIO, NamedTuple, Optional
+
+from analysis_config import UPLOADS
+
+
+class ArchivoDemasiadoGrande(ValueError):
+    """Upload exceeds UPLOADS['max_bytes_documento']"""
+
+
+class ArchivoCargado(NamedTuple):
+    """Upload spooled to a temporary file"""
+    ruta: str
+    tamano: int
+    sha256: str
+
+
+def verificar_tamano(tamano: Optional[int], limite: Optional[int] = None) -> None:
+    """
+    Reject an upload by its declared size before reading it.
+    
+    Raises:
+        ArchivoDemasiadoGrande: If the size is known and above the limit
+    """
+    limite = UPLOADS['max_bytes_documento'] if limite is None else limite
+    if tamano is not None and tamano > limite:
+        raise ArchivoDemasiadoGrande(f"File exceeds {limite} bytes")
+
+
+def guardar_carga(
+    origen: BinaryIO,
+    limite: Optional[int] = None,
+    directorio: Optional[str] = None
+) -> ArchivoCargado:
+    """
+    Copy an upload to a temporary file in fixed-size chunks, hashing as it streams.
+    
+    At most one chunk is held in memory. The caller owns the returned file
+    and must remove it (see eliminar_carga).
+    
+    Args:
+        origen: Readable binary stream (e.g. UploadFile.file)
+        limite: Max size in bytes (default UPLOADS['max_bytes_documento'])
+        directorio: Folder for the file (default UPLOADS['directorio'])
+        
+    Returns:
+        ArchivoCargado with the temporary path, size and SHA-256
+        
+    Raises:
+        ArchivoDemasiadoGrande: If the stream exceeds the limit (nothing is kept)
+    """
+    limite = UPLOADS['max_bytes_documento'] if limite is None else limite
+    resumen = hashlib.sha256()
+    tamano = 0
+    descriptor, ruta = tempfile.mkstemp(
+        prefix='licitia-', suffix='.pdf', dir=UPLOADS['directorio'] if directorio is None else directorio
+    )
+    try:
+        with os.fdopen(descriptor, 'wb') as destino:
+            while True:
+                bloque = origen.read(UPLOADS['tamano_bloque'])
+                if not bloque:
+                    break
+                tamano += len(bloque)
+                if tamano > limite:
+                    raise ArchivoDemasiadoGrande(f"File exceeds {limite} bytes")
+                resumen.update(bloque)
+                destino.write(bloque)
+    except BaseException:
+        eliminar_carga(ruta)
+        raise
+    return ArchivoCargado(ruta, tamano, resumen.hexdigest())
+
+
+def hash_carga(origen: BinaryIO) -> str:
+    """SHA-256 of a stream read in fixed-size chunks (same digest as guardar_carga)"""
+    resumen = hashlib.sha256()
+    while True:
+        bloque = origen.read(UPLOADS['tamano_bloque'])
+        if not bloque:
+            return resumen.hexdigest()
+        resumen.update(bloque)
+
+
+def eliminar_carga(ruta: str) -> None:
+    """Remove a spooled upload, ignoring files already gone"""
+    try:
+        os.unlink(ruta)
+    except FileNotFoundError:
+        pass
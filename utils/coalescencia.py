@@ -0,0 +1,89 @@
+"""Single-flight coalescing of identical concurrent requests"""
+
+import asyncio
+import threading
+import weakref
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+class CoalescedorSolicitudes:
+    """
+    Runs one computation per key at a time and shares its outcome.
+    
+    The first caller for a key (the leader) starts the computation; callers
+    arriving while it is in flight await the same result (or exception)
+    instead of repeating the work. Nothing is kept once it finishes: this
+    only merges concurrent work, caching is left to CacheResultados.
+    
+    The computation is shielded, so a leader that disconnects does not
+    cancel it for the callers still waiting.
+    """
+    
+    def __init__(self):
+        # asyncio futures are bound to a loop; keep the in-flight map per running loop
+        self._en_curso = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self.ejecuciones = 0
+        self.coalescidas = 0
+    
+    def _pendientes(self) -> Dict[str, asyncio.Future]:
+        loop = asyncio.get_running_loop()
+        pendientes = self._en_curso.get(loop)
+        if pendientes is None:
+            pendientes = {}
+            self._en_curso[loop] = pendientes
+        return pendientes
+    
+    async def ejecutar(
+        self,
+        clave: str,
+        calcular: Callable[[], Awaitable[Any]],
+        al_liderar: Optional[Callable[[], None]] = None
+    ) -> Any:
+        """
+        Await the in-flight computation for a key, or start it.
+        
+        Args:
+            clave: Hash of everything the result depends on
+            calcular: Coroutine function computing the result; only called
+                by the leader
+            al_liderar: Called by the leader right before the computation is
+                scheduled, so the caller knows it handed its resources over
+                even if it is cancelled before the computation starts
+                
+        Returns:
+            The computation's result
+        """
+        pendientes = self._pendientes()
+        futuro = pendientes.get(clave)
+        if futuro is not None:
+            with self._lock:
+                self.coalescidas += 1
+            return await asyncio.shield(futuro)
+        
+        with self._lock:
+            self.ejecuciones += 1
+        if al_liderar is not None:
+            al_liderar()
+        futuro = asyncio.ensure_future(calcular())
+        pendientes[clave] = futuro
+        futuro.add_done_callback(lambda f: self._terminar(pendientes, clave, f))
+        return await asyncio.shield(futuro)
+    
+    @staticmethod
+    def _terminar(pendientes: Dict[str, asyncio.Future], clave: str, futuro: asyncio.Future) -> None:
+        if pendientes.get(clave) is futuro:
+            del pendientes[clave]
+        if not futuro.cancelled():
+            # Mark the exception as retrieved when every waiter has gone away
+            futuro.exception()
+    
+    def estadisticas(self) -> Dict:
+        """Computations run, requests served by one already in flight, and the share saved"""
+        total = self.ejecuciones + self.coalescidas
+        return {
+            'ejecuciones': self.ejecuciones,
+            'coalescidas': self.coalescidas,
+            'en_curso': sum(len(pendientes) for pendientes in list(self._en_curso.values())),
+            'tasa_ahorro': round(self.coalescidas / total, 4) if total else 0.0
+        }
@@ -0,0 +1,287 @@
+"""Executor layer for offloading analysis work from the asyncio event loop"""
+
+import asyncio
+import functools
+import logging
+import multiprocessing
+import os
+import threading
+import weakref
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Optional
+
+from analysis_config import EXECUTION_STAGES, EXECUTOR_PROCESSES, PROCESS_WORKERS
+
+logger = logging.getLogger(__name__)
+
+
+def _contexto_procesos():
+    """
+    Multiprocessing context for worker pools.
+    
+    forkserver (where available) forks workers from a server process that
+    has already imported the analysis modules, and is compatible with
+    max_tasks_per_child recycling.
+    """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        contexto = multiprocessing.get_context('forkserver')
+        contexto.set_forkserver_preload(PROCESS_WORKERS['modulos_precargados'])
+        return contexto
+    return multiprocessing.get_context('spawn')
+
+
+class EtapaEjecucion:
+    """One executor stage with bounded concurrency and queue metrics"""
+    
+    def __init__(
+        self,
+        nombre: str,
+        tipo: str,
+        trabajadores: Optional[int],
+        max_concurrencia: int,
+        inicializador: Optional[Callable[[], None]] = None,
+        max_tareas_por_trabajador: Optional[int] = None
+    ):
+        self.nombre = nombre
+        self.tipo = tipo
+        self.trabajadores = trabajadores or os.cpu_count() or 1
+        self.max_concurrencia = max_concurrencia
+        self.inicializador = inicializador
+        self.max_tareas_por_trabajador = max_tareas_por_trabajador
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        # asyncio primitives are bound to a loop; keep one semaphore per running loop
+        self._semaforos = weakref.WeakKeyDictionary()
+        # Slots of the synchronous submit() path, released when each future is done
+        self._semaforo_hilos = threading.BoundedSemaphore(max_concurrencia)
+        self.en_cola = 0
+        self.en_ejecucion = 0
+        self.max_en_cola = 0
+        self.completadas = 0
+        self.errores = 0
+    
+    @property
+    def executor(self) -> Executor:
+        """Underlying executor, created on first use"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._crear_executor()
+            return self._executor
+    
+    def _crear_executor(self) -> Executor:
+        """Create the pool for this stage"""
+        if self.tipo == EXECUTOR_PROCESSES:
+            return ProcessPoolExecutor(
+                max_workers=self.trabajadores,
+                mp_context=_contexto_procesos(),
+                initializer=self.inicializador,
+                max_tasks_per_child=self.max_tareas_por_trabajador
+            )
+        return ThreadPoolExecutor(
+            max_workers=self.trabajadores,
+            thread_name_prefix=f"licitia-{self.nombre}"
+        )
+    
+    def iniciar(self, calentar: Optional[Callable[[], Any]] = None) -> None:
+        """
+        Create the pool now and start every worker.
+        
+        Args:
+            calentar: Picklable no-op task submitted once per worker so that
+                process pools spawn and initialize all workers up front
+        """
+        executor = self.executor
+        if calentar is not None:
+            wait([executor.submit(calentar) for _ in range(self.trabajadores)])
+    
+    def reiniciar(self, calentar: Optional[Callable[[], Any]] = None) -> None:
+        """
+        Swap in a fresh pool (e.g. after a config reload).
+        
+        New tasks go to the new pool right away; tasks already submitted to
+        the old pool run to completion before its workers exit.
+        """
+        with self._lock:
+            anterior = self._executor
+            self._executor = self._crear_executor()
+        if calentar is not None:
+            self.iniciar(calentar)
+        if anterior is not None:
+            anterior.shutdown(wait=False)
+    
+    def _semaforo(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaforo = self._semaforos.get(loop)
+        if semaforo is None:
+            semaforo = asyncio.Semaphore(self.max_concurrencia)
+            self._semaforos[loop] = semaforo
+        return semaforo
+    
+    async def ejecutar(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run fn in this stage's pool once a concurrency slot is free"""
+        semaforo = self._semaforo()
+        # Counters are shared with submit() callbacks and other event loops' threads
+        with self._lock:
+            self.en_cola += 1
+            self.max_en_cola = max(self.max_en_cola, self.en_cola)
+        try:
+            await semaforo.acquire()
+        finally:
+            with self._lock:
+                self.en_cola -= 1
+        
+        with self._lock:
+            self.en_ejecucion += 1
+        try:
+            loop = asyncio.get_running_loop()
+            resultado = await loop.run_in_executor(
+                self.executor, functools.partial(fn, *args, **kwargs)
+            )
+            with self._lock:
+                self.completadas += 1
+            return resultado
+        except Exception:
+            with self._lock:
+                self.errores += 1
+            raise
+        finally:
+            with self._lock:
+                self.en_ejecucion -= 1
+            semaforo.release()
+    
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """
+        Submit fn from synchronous code (e.g. a task fanning out page ranges).
+        
+        Blocks the calling thread until one of the stage's max_concurrencia
+        thread-level slots is free (kept apart from the asyncio slots of
+        ejecutar), and is counted in the stage metrics like an Executor.submit.
+        Never call it from a task of the same stage: it could wait forever.
+        """
+        with self._lock:
+            self.en_cola += 1
+            self.max_en_cola = max(self.max_en_cola, self.en_cola)
+        try:
+            self._semaforo_hilos.acquire()
+        finally:
+            with self._lock:
+                self.en_cola -= 1
+        
+        with self._lock:
+            self.en_ejecucion += 1
+        try:
+            futuro = self.executor.submit(fn, *args, **kwargs)
+        except Exception:
+            with self._lock:
+                self.en_ejecucion -= 1
+            self._semaforo_hilos.release()
+            raise
+        futuro.add_done_callback(self._registrar_fin)
+        return futuro
+    
+    def _registrar_fin(self, futuro: Future) -> None:
+        self._semaforo_hilos.release()
+        with self._lock:
+            self.en_ejecucion -= 1
+            if futuro.cancelled() or futuro.exception() is not None:
+                self.errores += 1
+            else:
+                self.completadas += 1
+    
+    def cerrar(self, esperar: bool = True) -> None:
+        """Shut down the pool"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=esperar, cancel_futures=not esperar)
+                self._executor = None
+    
+    def estadisticas(self) -> Dict:
+        """Queue depth and throughput counters"""
+        with self._lock:
+            return {
+                'tipo': self.tipo,
+                'trabajadores': self.trabajadores,
+                'max_concurrencia': self.max_concurrencia,
+                'max_tareas_por_trabajador': self.max_tareas_por_trabajador,
+                'en_cola': self.en_cola,
+                'en_ejecucion': self.en_ejecucion,
+                'max_en_cola': self.max_en_cola,
+                'completadas': self.completadas,
+                'errores': self.errores
+            }
+
+
+class CapaEjecucion:
+    """
+    Named executor stages for analysis work.
+    
+    Thread stages run I/O-ish work; process stages run CPU-heavy PDF
+    extraction and similarity so they never block the event loop.
+    """
+    
+    def __init__(
+        self,
+        etapas: Optional[Dict[str, Dict[str, Any]]] = None,
+        inicializador: Optional[Callable[[], None]] = None
+    ):
+        """
+        Args:
+            etapas: Stage configuration (default EXECUTION_STAGES)
+            inicializador: Picklable initializer run once in each worker process
+        """
+        etapas = EXECUTION_STAGES if etapas is None else etapas
+        self.etapas = {
+            nombre: EtapaEjecucion(
+                nombre,
+                config['tipo'],
+                config.get('trabajadores'),
+                config.get('max_concurrencia', 8),
+                inicializador=inicializador if config['tipo'] == EXECUTOR_PROCESSES else None,
+                max_tareas_por_trabajador=config.get(
+                    'max_tareas_por_trabajador', PROCESS_WORKERS['max_tareas_por_trabajador']
+                ) if config['tipo'] == EXECUTOR_PROCESSES else None
+            )
+            for nombre, config in etapas.items()
+        }
+    
+    def establecer_inicializador(self, inicializador: Optional[Callable[[], None]]) -> None:
+        """
+        Set the initializer of the process stages.
+        
+        Only pools created afterwards (first use, iniciar or reiniciar) run it.
+        """
+        for etapa in self.etapas.values():
+            if etapa.tipo == EXECUTOR_PROCESSES:
+                etapa.inicializador = inicializador
+    
+    def etapa(self, nombre: str) -> EtapaEjecucion:
+        """Get a stage by name"""
+        if nombre not in self.etapas:
+            raise KeyError(f"Unknown execution stage: {nombre}")
+        return self.etapas[nombre]
+    
+    async def ejecutar(self, etapa: str, fn: Callable, *args, **kwargs) -> Any:
+        """Run fn in the given stage"""
+        return await self.etapa(etapa).ejecutar(fn, *args, **kwargs)
+    
+    def iniciar(self, calentar: Optional[Callable[[], Any]] = None) -> None:
+        """Start every stage pool, warming process workers with the given task"""
+        for etapa in self.etapas.values():
+            etapa.iniciar(calentar if etapa.tipo == EXECUTOR_PROCESSES else None)
+        logger.info(f"Analysis executors started: {', '.join(self.etapas)}")
+    
+    def reiniciar(self, calentar: Optional[Callable[[], Any]] = None) -> None:
+        """Swap every stage pool for a fresh one without dropping in-flight tasks"""
+        for etapa in self.etapas.values():
+            etapa.reiniciar(calentar if etapa.tipo == EXECUTOR_PROCESSES else None)
+        logger.info("Analysis executors restarted")
+    
+    def cerrar(self, esperar: bool = True) -> None:
+        """Shut down every stage pool"""
+        for etapa in self.etapas.values():
+            etapa.cerrar(esperar)
+        logger.info("Analysis executors shut down")
+    
+    def estadisticas(self) -> Dict:
+        """Per-stage queue depth and throughput"""
+        return {nombre: etapa.estadisticas() for nombre, etapa in self.etapas.items()}
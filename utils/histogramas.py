@@ -0,0 +1,105 @@
+"""Latency histograms of the analysis stages"""
+
+import bisect
+import threading
+from typing import Dict, List, Optional, Sequence
+
+
+class Histograma:
+    """
+    Fixed-bucket latency histogram in milliseconds.
+    
+    Memory stays constant whatever the number of observations; percentiles
+    are estimated by linear interpolation inside the bucket holding them,
+    so their error is bounded by the bucket width.
+    """
+    
+    def __init__(self, limites_ms: Sequence[float]):
+        """
+        Args:
+            limites_ms: Increasing upper bounds of the buckets; larger values
+                fall in a final unbounded bucket
+        """
+        self.limites_ms = list(limites_ms)
+        self.cuentas = [0] * (len(self.limites_ms) + 1)
+        self.total = 0
+        self.suma_ms = 0.0
+        self.max_ms = 0.0
+    
+    def observar(self, ms: float) -> None:
+        self.cuentas[bisect.bisect_left(self.limites_ms, ms)] += 1
+        self.total += 1
+        self.suma_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+    
+    def percentil(self, p: float) -> Optional[float]:
+        """Estimated p-th percentile (0-100), or None without observations"""
+        if not self.total:
+            return None
+        objetivo = self.total * p / 100
+        acumulado = 0
+        for indice, cuenta in enumerate(self.cuentas):
+            if cuenta and acumulado + cuenta >= objetivo:
+                inferior = self.limites_ms[indice - 1] if indice else 0.0
+                superior = self.limites_ms[indice] if indice < len(self.limites_ms) else self.max_ms
+                estimado = inferior + (superior - inferior) * (objetivo - acumulado) / cuenta
+                return min(estimado, self.max_ms)
+            acumulado += cuenta
+        return self.max_ms
+    
+    def acumulados(self) -> List[int]:
+        """Observations at or below each bound, the last entry being the total"""
+        acumulados, acumulado = [], 0
+        for cuenta in self.cuentas:
+            acumulado += cuenta
+            acumulados.append(acumulado)
+        return acumulados
+    
+    def estadisticas(self) -> Dict:
+        return {
+            'total': self.total,
+            'suma_ms': round(self.suma_ms, 3),
+            'media_ms': round(self.suma_ms / self.total, 3) if self.total else None,
+            'max_ms': round(self.max_ms, 3),
+            'p50_ms': _redondear(self.percentil(50)),
+            'p95_ms': _redondear(self.percentil(95)),
+            'p99_ms': _redondear(self.percentil(99))
+        }
+
+
+def _redondear(valor: Optional[float]) -> Optional[float]:
+    return round(valor, 3) if valor is not None else None
+
+
+class HistogramasEtapas:
+    """
+    One Histograma per analysis stage, created on first observation.
+    
+    Thread-safe: results are recorded from the event loop and from the job
+    worker threads.
+    """
+    
+    def __init__(self, limites_ms: Sequence[float]):
+        self.limites_ms = list(limites_ms)
+        self._histogramas: Dict[str, Histograma] = {}
+        self._lock = threading.Lock()
+    
+    def registrar(self, tiempos_ms: Dict[str, float]) -> None:
+        """Record the stage timings of one analysis (metadata['tiempos_etapas_ms'])"""
+        with self._lock:
+            for etapa, ms in tiempos_ms.items():
+                histograma = self._histogramas.get(etapa)
+                if histograma is None:
+                    histograma = self._histogramas[etapa] = Histograma(self.limites_ms)
+                histograma.observar(ms)
+    
+    def estadisticas(self) -> Dict:
+        """Count, mean, max and percentiles per stage"""
+        with self._lock:
+            return {
+                'limites_ms': self.limites_ms,
+                'etapas': {
+                    etapa: histograma.estadisticas()
+                    for etapa, histograma in sorted(self._histogramas.items())
+                }
+            }
@@ -0,0 +1,112 @@
+"""Shared-memory transfer of document bytes and text to worker processes"""
+
+import io
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+from typing import Any, List, NamedTuple, Union
+
+from analysis_config import SHARED_MEMORY_THRESHOLD
+
+
+class ReferenciaCompartida(NamedTuple):
+    """Picklable handle to a payload stored in a shared memory block"""
+    nombre: str
+    tamano: int
+    es_texto: bool
+
+
+class _LectorMemoria(io.RawIOBase):
+    """Seekable read-only stream over a memoryview (no copy of the buffer)"""
+    
+    def __init__(self, vista: memoryview):
+        self._vista = vista
+        self._posicion = 0
+    
+    def readable(self) -> bool:
+        return True
+    
+    def seekable(self) -> bool:
+        return True
+    
+    def readinto(self, destino) -> int:
+        n = min(len(destino), len(self._vista) - self._posicion)
+        destino[:n] = self._vista[self._posicion:self._posicion + n]
+        self._posicion += n
+        return n
+    
+    def seek(self, desplazamiento: int, origen: int = io.SEEK_SET) -> int:
+        if origen == io.SEEK_CUR:
+            desplazamiento += self._posicion
+        elif origen == io.SEEK_END:
+            desplazamiento += len(self._vista)
+        self._posicion = max(0, min(desplazamiento, len(self._vista)))
+        return self._posicion
+    
+    def tell(self) -> int:
+        return self._posicion
+    
+    def close(self) -> None:
+        self._vista = memoryview(b'')
+        super().close()
+
+
+@contextmanager
+def compartir(*valores: Union[bytes, str, Any]):
+    """
+    Place large bytes/str payloads in shared memory for the duration of the block.
+    
+    Payloads below SHARED_MEMORY_THRESHOLD (and non bytes/str values) are
+    yielded unchanged, since pickling them is cheaper than a shared block.
+    Blocks are unlinked when the context exits.
+    
+    Yields:
+        List of values or ReferenciaCompartida handles, in the same order
+    """
+    bloques: List[shared_memory.SharedMemory] = []
+    referencias = []
+    try:
+        for valor in valores:
+            es_texto = isinstance(valor, str)
+            datos = valor.encode('utf-8') if es_texto else valor
+            if not isinstance(datos, (bytes, bytearray)) or len(datos) < SHARED_MEMORY_THRESHOLD:
+                referencias.append(valor)
+                continue
+            bloque = shared_memory.SharedMemory(create=True, size=len(datos))
+            bloques.append(bloque)
+            bloque.buf[:len(datos)] = datos
+            referencias.append(ReferenciaCompartida(bloque.name, len(datos), es_texto))
+        yield referencias
+    finally:
+        for bloque in bloques:
+            bloque.close()
+            bloque.unlink()
+
+
+@contextmanager
+def abrir_stream(valor: Union[bytes, ReferenciaCompartida]):
+    """Open a payload (raw bytes or shared block) as a binary stream"""
+    if not isinstance(valor, ReferenciaCompartida):
+        yield io.BytesIO(valor)
+        return
+    
+    bloque = shared_memory.SharedMemory(name=valor.nombre)
+    vista = bloque.buf[:valor.tamano]
+    stream = io.BufferedReader(_LectorMemoria(vista))
+    try:
+        yield stream
+    finally:
+        stream.close()
+        vista.release()
+        bloque.close()
+
+
+def resolver_texto(valor: Union[str, ReferenciaCompartida]) -> str:
+    """Materialize a text payload (raw str or shared block)"""
+    if not isinstance(valor, ReferenciaCompartida):
+        return valor
+    
+    bloque = shared_memory.SharedMemory(name=valor.nombre)
+    try:
+        return bytes(bloque.buf[:valor.tamano]).decode('utf-8')
+    finally:
+        bloque.close()
@@ -0,0 +1,333 @@
+"""In-process metrics registry exposed in the Prometheus text format"""
+
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qs
+
+from utils.histogramas import Histograma
+
+logger = logging.getLogger(__name__)
+
+CONTADOR = 'counter'
+INDICADOR = 'gauge'
+HISTOGRAMA = 'histogram'
+
+TIPO_CONTENIDO = 'text/plain; version=0.0.4; charset=utf-8'
+
+# (metric name, label values, value) produced by a collector at scrape time
+Muestra = Tuple[str, Tuple[str, ...], object]
+
+
+class RegistroMetricas:
+    """
+    Counters, gauges and latency histograms keyed by label values.
+    
+    Recording is a dict lookup and an addition under a lock, cheap enough
+    for every request. Values owned by other components (cache hits, queue
+    depth) are not mirrored on every change: collectors read them from the
+    components' estadisticas() when a snapshot is taken.
+    
+    Histograms observe milliseconds (like Histograma) and are exposed in
+    seconds, as Prometheus expects.
+    """
+    
+    def __init__(self):
+        self._familias: Dict[str, Dict] = {}
+        self._valores: Dict[str, Dict[Tuple[str, ...], object]] = {}
+        self._colectores: List[Callable[[], Iterable[Muestra]]] = []
+        self._lock = threading.Lock()
+    
+    def _declarar(self, nombre: str, tipo: str, ayuda: str, etiquetas: Sequence[str], limites_ms=None) -> None:
+        with self._lock:
+            if nombre not in self._familias:
+                self._familias[nombre] = {
+                    'tipo': tipo,
+                    'ayuda': ayuda,
+                    'etiquetas': list(etiquetas),
+                    'limites_ms': list(limites_ms) if limites_ms is not None else None
+                }
+                self._valores[nombre] = {}
+    
+    def contador(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = ()) -> None:
+        self._declarar(nombre, CONTADOR, ayuda, etiquetas)
+    
+    def indicador(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = ()) -> None:
+        self._declarar(nombre, INDICADOR, ayuda, etiquetas)
+    
+    def histograma(self, nombre: str, ayuda: str, limites_ms: Sequence[float], etiquetas: Sequence[str] = ()) -> None:
+        self._declarar(nombre, HISTOGRAMA, ayuda, etiquetas, limites_ms)
+    
+    def incrementar(self, nombre: str, *etiquetas: str, valor: float = 1) -> None:
+        with self._lock:
+            valores = self._valores[nombre]
+            valores[etiquetas] = valores.get(etiquetas, 0) + valor
+    
+    def fijar(self, nombre: str, *etiquetas: str, valor: float) -> None:
+        with self._lock:
+            self._valores[nombre][etiquetas] = valor
+    
+    def observar(self, nombre: str, *etiquetas: str, ms: float) -> None:
+        with self._lock:
+            valores = self._valores[nombre]
+            histograma = valores.get(etiquetas)
+            if histograma is None:
+                histograma = valores[etiquetas] = Histograma(self._familias[nombre]['limites_ms'])
+            histograma.observar(ms)
+    
+    def agregar_colector(self, colector: Callable[[], Iterable[Muestra]]) -> None:
+        """
+        Add a callable read at snapshot time.
+        
+        It returns (name, label values, value) samples of declared families:
+        the current total for counters, the current value for gauges or a
+        Histograma for histograms.
+        """
+        self._colectores.append(colector)
+    
+    def instantanea(self) -> Dict:
+        """
+        JSON-serializable snapshot of every family, collectors included.
+        
+        Returns:
+            dict with 'pid', 'actualizado_en' (unix seconds) and 'familias':
+            name -> family description plus 'muestras', a list of
+            [label values, value] where histogram values are
+            {'cuentas': per-bucket counts, 'suma_ms': sum}
+        """
+        recolectadas = []
+        for colector in self._colectores:
+            try:
+                recolectadas.extend(colector())
+            except Exception as e:
+                logger.warning(f"Metrics collector failed: {str(e)}")
+        
+        with self._lock:
+            valores = {nombre: dict(muestras) for nombre, muestras in self._valores.items()}
+            for nombre, etiquetas, valor in recolectadas:
+                if nombre in valores:
+                    valores[nombre][tuple(etiquetas)] = valor
+            familias = {}
+            for nombre, familia in self._familias.items():
+                familias[nombre] = {
+                    **familia,
+                    'muestras': [
+                        [list(etiquetas), _serializar(valor)]
+                        for etiquetas, valor in sorted(valores[nombre].items())
+                    ]
+                }
+        return {'pid': os.getpid(), 'actualizado_en': time.time(), 'familias': familias}
+
+
+def _serializar(valor):
+    if isinstance(valor, Histograma):
+        return {'cuentas': list(valor.cuentas), 'suma_ms': valor.suma_ms}
+    return valor
+
+
+def combinar(instantaneas: Iterable[Dict]) -> Dict:
+    """
+    Merge the snapshots of several worker processes.
+    
+    Counters, gauges (queue depths, cache entries) and histogram buckets
+    are summed per label values, so the result describes the whole server.
+    Histograms are only merged with matching bucket bounds.
+    """
+    familias: Dict[str, Dict] = {}
+    acumulado: Dict[str, Dict[Tuple[str, ...], object]] = {}
+    for instantanea in instantaneas:
+        for nombre, familia in instantanea['familias'].items():
+            if nombre not in familias:
+                familias[nombre] = {clave: valor for clave, valor in familia.items() if clave != 'muestras'}
+                acumulado[nombre] = {}
+            elif familias[nombre]['limites_ms'] != familia['limites_ms']:
+                logger.warning(f"Skipping {nombre} of process {instantanea.get('pid')}: bucket bounds differ")
+                continue
+            valores = acumulado[nombre]
+            for etiquetas, valor in familia['muestras']:
+                clave = tuple(etiquetas)
+                previo = valores.get(clave)
+                if previo is None:
+                    valores[clave] = dict(valor, cuentas=list(valor['cuentas'])) if isinstance(valor, dict) else valor
+                elif isinstance(valor, dict):
+                    previo['cuentas'] = [a + b for a, b in zip(previo['cuentas'], valor['cuentas'])]
+                    previo['suma_ms'] += valor['suma_ms']
+                else:
+                    valores[clave] = previo + valor
+    
+    for nombre, familia in familias.items():
+        familia['muestras'] = [[list(etiquetas), valor] for etiquetas, valor in sorted(acumulado[nombre].items())]
+    return {'familias': familias}
+
+
+def _escapar(valor: str) -> str:
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _etiquetas(nombres: Sequence[str], valores: Sequence[str], extra: str = '') -> str:
+    pares = [f'{nombre}="{_escapar(valor)}"' for nombre, valor in zip(nombres, valores)]
+    if extra:
+        pares.append(extra)
+    return '{' + ','.join(pares) + '}' if pares else ''
+
+
+def _numero(valor: float) -> str:
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def exposicion(instantanea: Dict) -> str:
+    """Render a snapshot (or merged snapshots) in the Prometheus text exposition format"""
+    lineas = []
+    for nombre, familia in sorted(instantanea['familias'].items()):
+        lineas.append(f"# HELP {nombre} {familia['ayuda']}")
+        lineas.append(f"# TYPE {nombre} {familia['tipo']}")
+        nombres = familia['etiquetas']
+        for etiquetas, valor in familia['muestras']:
+            if familia['tipo'] != HISTOGRAMA:
+                lineas.append(f"{nombre}{_etiquetas(nombres, etiquetas)} {_numero(valor)}")
+                continue
+            acumulado = 0
+            limites = [_numero(ms / 1000) for ms in familia['limites_ms']] + ['+Inf']
+            for limite, cuenta in zip(limites, valor['cuentas']):
+                acumulado += cuenta
+                le = 'le="' + limite + '"'
+                lineas.append(f"{nombre}_bucket{_etiquetas(nombres, etiquetas, le)} {acumulado}")
+            lineas.append(f"{nombre}_sum{_etiquetas(nombres, etiquetas)} {_numero(valor['suma_ms'] / 1000)}")
+            lineas.append(f"{nombre}_count{_etiquetas(nombres, etiquetas)} {acumulado}")
+    return '\n'.join(lineas) + '\n'
+
+
+class AgregadorMultiproceso:
+    """
+    Shares metric snapshots between the worker processes of one server.
+    
+    Each worker periodically writes its snapshot to <directorio>/<pid>.json
+    (atomically replaced); a scrape, answered by whichever worker receives
+    it, merges its own live snapshot with the files of the other workers.
+    Files not refreshed within `vigencia` seconds belong to workers that
+    exited (or a previous run) and are removed, so their values drop out
+    like any counter reset.
+    """
+    
+    def __init__(self, directorio: str, vigencia: float, reloj: Callable[[], float] = time.time):
+        """
+        Args:
+            directorio: Folder shared by the workers of one server (and only them)
+            vigencia: Seconds after which a snapshot file is considered stale
+            reloj: Time source (unix seconds)
+        """
+        self.directorio = directorio
+        self.vigencia = vigencia
+        self._reloj = reloj
+        os.makedirs(directorio, exist_ok=True)
+    
+    def _ruta(self, pid: int) -> str:
+        return os.path.join(self.directorio, f"{pid}.json")
+    
+    def volcar(self, instantanea: Dict) -> None:
+        """Write this process's snapshot"""
+        descriptor, temporal = tempfile.mkstemp(dir=self.directorio, suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'w', encoding='utf-8') as archivo:
+                json.dump(instantanea, archivo)
+            os.replace(temporal, self._ruta(instantanea['pid']))
+        except BaseException:
+            try:
+                os.unlink(temporal)
+            except OSError:
+                pass
+            raise
+    
+    def retirar(self, pid: Optional[int] = None) -> None:
+        """Remove a process's snapshot (this one by default), e.g. at shutdown"""
+        try:
+            os.unlink(self._ruta(pid or os.getpid()))
+        except FileNotFoundError:
+            pass
+    
+    def combinar(self, propia: Dict) -> Dict:
+        """
+        Merge this process's snapshot with the fresh snapshots of the other workers.
+        
+        Args:
+            propia: Current snapshot of this process
+            
+        Returns:
+            Merged snapshot (see combinar)
+        """
+        instantaneas = [propia]
+        limite = self._reloj() - self.vigencia
+        for nombre in os.listdir(self.directorio):
+            if not nombre.endswith('.json') or nombre == f"{propia['pid']}.json":
+                continue
+            ruta = os.path.join(self.directorio, nombre)
+            try:
+                with open(ruta, encoding='utf-8') as archivo:
+                    instantanea = json.load(archivo)
+            except (OSError, ValueError):
+                # Removed or replaced meanwhile
+                continue
+            if instantanea.get('actualizado_en', 0) < limite:
+                self.retirar(instantanea.get('pid'))
+                continue
+            instantaneas.append(instantanea)
+        return combinar(instantaneas)
+
+
+class MiddlewareMetricas:
+    """
+    ASGI middleware counting and timing every HTTP request.
+    
+    Labels: method, route template (not the raw path, to keep cardinality
+    bounded; unmatched paths are 'unmatched'), status and pricing mode. The
+    pricing mode comes from the 'pricing_mode' query parameter, or from
+    request.state.pricing_mode when an endpoint reads it from the body.
+    Registered outermost, so requests rejected by other middleware are
+    counted and streamed responses are timed until their last byte.
+    """
+    
+    def __init__(self, app, registro: RegistroMetricas, modos_precio: Iterable[str], rutas_excluidas: Iterable[str] = ()):
+        self.app = app
+        self.registro = registro
+        self.modos_precio = set(modos_precio)
+        self.rutas_excluidas = set(rutas_excluidas)
+    
+    def _modo_precio(self, scope) -> str:
+        modo = scope.get('state', {}).get('pricing_mode')
+        if modo is None:
+            modo = parse_qs(scope.get('query_string', b'').decode('latin-1')).get('pricing_mode', [None])[0]
+        if modo is None:
+            return 'none'
+        return modo if modo in self.modos_precio else 'other'
+    
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope.get('path') in self.rutas_excluidas:
+            await self.app(scope, receive, send)
+            return
+        
+        scope.setdefault('state', {})
+        estado = [500]
+        
+        async def enviar(mensaje):
+            if mensaje['type'] == 'http.response.start':
+                estado[0] = mensaje['status']
+            await send(mensaje)
+        
+        inicio = time.perf_counter()
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            ms = (time.perf_counter() - inicio) * 1000
+            ruta = scope.get('route')
+            etiquetas = (
+                scope['method'],
+                getattr(ruta, 'path', 'unmatched'),
+                str(estado[0]),
+                self._modo_precio(scope)
+            )
+            self.registro.incrementar('licitia_http_requests_total', *etiquetas)
+            self.registro.observar('licitia_http_request_duration_seconds', *etiquetas, ms=ms)
@@ -0,0 +1,136 @@
+"""
+Local OCR for PDF pages without a text layer.
+
+Pages are rendered with poppler's pdftoppm and recognized with the
+tesseract CLI; both run as subprocesses, so no Python bindings are needed.
+Recognized text is cached on disk by document hash, page number and
+rendering settings, which lets every worker process share it and makes
+re-uploaded scans free: a cached page is neither rendered nor recognized.
+"""
+
+import hashlib
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional, Tuple
+
+from analysis_config import OCR
+
+logger = logging.getLogger(__name__)
+
+OCR_OK = shutil.which('tesseract') is not None and shutil.which('pdftoppm') is not None
+
+
+def necesita_ocr(texto: str) -> bool:
+    """True if an extracted page has no usable text layer"""
+    return len(texto.strip()) < OCR['min_caracteres']
+
+
+class CacheOCR:
+    """On-disk cache of recognized text keyed by page (see clave_pagina)"""
+    
+    def __init__(self, directorio: Optional[str] = None):
+        self.directorio = Path(OCR['directorio_cache'] if directorio is None else directorio)
+    
+    def _ruta(self, clave: str) -> Path:
+        return self.directorio / clave[:2] / f"{clave}.txt"
+    
+    def obtener(self, clave: str) -> Optional[str]:
+        """Get cached text for a page key"""
+        try:
+            return self._ruta(clave).read_text(encoding='utf-8')
+        except FileNotFoundError:
+            return None
+    
+    def guardar(self, clave: str, texto: str) -> None:
+        """Store text for a page key (atomic, safe across processes)"""
+        ruta = self._ruta(clave)
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        descriptor, temporal = tempfile.mkstemp(dir=ruta.parent, suffix='.tmp')
+        with os.fdopen(descriptor, 'w', encoding='utf-8') as destino:
+            destino.write(texto)
+        os.replace(temporal, ruta)
+
+
+def _ejecutar(comando, entrada: Optional[bytes] = None) -> bytes:
+    resultado = subprocess.run(
+        comando, input=entrada, capture_output=True, timeout=OCR['timeout_subproceso'], check=True
+    )
+    return resultado.stdout
+
+
+def renderizar_pagina(ruta: str, numero: int) -> bytes:
+    """Render page `numero` (0-based) to a grayscale PNG"""
+    return _ejecutar([
+        'pdftoppm', '-f', str(numero + 1), '-l', str(numero + 1),
+        '-r', str(OCR['dpi']), '-gray', '-png', ruta
+    ])
+
+
+def reconocer_imagen(imagen: bytes) -> str:
+    """Recognize text in an image with tesseract"""
+    return _ejecutar(['tesseract', 'stdin', 'stdout', '-l', OCR['idioma']], imagen).decode('utf-8', errors='replace')
+
+
+def huella_pdf(stream) -> str:
+    """SHA-256 of a PDF stream, read in blocks"""
+    stream.seek(0)
+    huella = hashlib.sha256()
+    for bloque in iter(lambda: stream.read(1 << 20), b''):
+        huella.update(bloque)
+    return huella.hexdigest()
+
+
+@contextmanager
+def volcar_pdf(stream):
+    """
+    Spool a PDF stream without a path to a temporary file for pdftoppm.
+    
+    Yields:
+        Tuple of (temporary path, SHA-256 of the document), hashed while copying
+    """
+    descriptor, temporal = tempfile.mkstemp(prefix='licitia-ocr-', suffix='.pdf')
+    try:
+        huella = hashlib.sha256()
+        with os.fdopen(descriptor, 'wb') as destino:
+            stream.seek(0)
+            for bloque in iter(lambda: stream.read(1 << 20), b''):
+                huella.update(bloque)
+                destino.write(bloque)
+        yield temporal, huella.hexdigest()
+    finally:
+        os.unlink(temporal)
+
+
+def clave_pagina(huella: str, numero: int) -> str:
+    """Cache key of a page: document hash, page number and rendering settings"""
+    return f"{huella}-{numero}-{OCR['dpi']}-{OCR['idioma']}"
+
+
+def ocr_pagina(ruta: str, numero: int, huella: str, cache: Optional[CacheOCR] = None) -> Tuple[str, bool]:
+    """
+    OCR one page, rendering it only when it is not cached yet.
+    
+    Args:
+        ruta: Path of the PDF on disk
+        numero: Page number (0-based)
+        huella: SHA-256 of the document (see huella_pdf)
+        cache: Text cache (default CacheOCR())
+        
+    Returns:
+        Tuple of (text, cache hit)
+    """
+    cache = CacheOCR() if cache is None else cache
+    clave = clave_pagina(huella, numero)
+    
+    texto = cache.obtener(clave)
+    if texto is not None:
+        return texto, True
+    
+    texto = reconocer_imagen(renderizar_pagina(ruta, numero))
+    cache.guardar(clave, texto)
+    return texto, False
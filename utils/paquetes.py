@@ -0,0 +1,86 @@
+"""ZIP bundles with a tender notice (pliego) and its annexes"""
+
+import posixpath
+import re
+import zipfile
+from typing import Dict, List, NamedTuple, Optional
+
+from analysis_config import BUNDLES
+from utils.cargas import ArchivoCargado, guardar_carga
+
+
+class PaqueteInvalido(ValueError):
+    """Archive is not a usable ZIP bundle"""
+
+
+class EntradaPaquete(NamedTuple):
+    """One file inside a bundle"""
+    nombre: str
+    tamano: int
+    tamano_comprimido: int
+    es_pdf: bool
+
+
+def inventariar_paquete(ruta: str) -> Dict:
+    """
+    List a bundle from its central directory, without decompressing entries.
+    
+    Directories and metadata entries (__MACOSX/, hidden files) are skipped.
+    The first PDF whose name matches BUNDLES['patron_pliego'] is the tender
+    notice; every other file is an annex.
+    
+    Args:
+        ruta: Path of the ZIP file
+        
+    Returns:
+        dict with 'pliego' (EntradaPaquete) and 'anexos' (List[EntradaPaquete])
+        
+    Raises:
+        PaqueteInvalido: If the file is not a ZIP, exceeds the BUNDLES limits
+            or has no tender notice PDF
+    """
+    try:
+        with zipfile.ZipFile(ruta) as archivo:
+            infos = archivo.infolist()
+    except zipfile.BadZipFile as e:
+        raise PaqueteInvalido(f"Invalid ZIP bundle: {str(e)}")
+    
+    entradas: List[EntradaPaquete] = []
+    for info in infos:
+        base = posixpath.basename(info.filename)
+        if info.is_dir() or not base or base.startswith('.') or info.filename.startswith('__MACOSX/'):
+            continue
+        entradas.append(EntradaPaquete(
+            info.filename, info.file_size, info.compress_size, base.lower().endswith('.pdf')
+        ))
+    
+    if len(entradas) > BUNDLES['max_entradas']:
+        raise PaqueteInvalido(f"Bundle has more than {BUNDLES['max_entradas']} files")
+    if sum(entrada.tamano for entrada in entradas) > BUNDLES['max_bytes_descomprimidos']:
+        raise PaqueteInvalido(f"Bundle expands to more than {BUNDLES['max_bytes_descomprimidos']} bytes")
+    
+    pliego: Optional[EntradaPaquete] = next(
+        (e for e in entradas if e.es_pdf and re.search(BUNDLES['patron_pliego'], posixpath.basename(e.nombre))),
+        None
+    )
+    if pliego is None:
+        raise PaqueteInvalido("Bundle has no tender notice (pliego) PDF")
+    
+    return {
+        'pliego': pliego,
+        'anexos': [entrada for entrada in entradas if entrada is not pliego]
+    }
+
+
+def guardar_entrada(ruta: str, nombre: str) -> ArchivoCargado:
+    """
+    Spool one bundle entry to a temporary file, decompressing it as a stream.
+    
+    Only this entry is written to disk, and the size limit is enforced on
+    the decompressed bytes actually read (not on the declared size).
+    
+    Returns:
+        ArchivoCargado (the caller removes it with eliminar_carga)
+    """
+    with zipfile.ZipFile(ruta) as archivo, archivo.open(nombre) as entrada:
+        return guardar_carga(entrada)
@@ -1,64 +1,507 @@
 """PDF document processing"""
 
-try:
-    import PyPDF2
-    PYPDF2_OK = True
-except ImportError:
-    PYPDF2_OK = False
+import io
+import logging
+import mmap
+import time
+from collections import deque
+from concurrent.futures import wait
+from contextlib import ExitStack, contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from analysis_config import PDF_EXTRACTION
+from core.plazo import Plazo, SIN_PLAZO
+from utils.backends_pdf import BackendPDF, DocumentoPDF, backends_disponibles, obtener_backend
+from utils import ocr as ocr_local
+from utils.memoria_compartida import ReferenciaCompartida, abrir_stream, compartir
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def _abrir_pdf(ruta_o_bytes, tipo: str):
+    """Open a PDF source as a binary stream"""
+    if tipo == 'bytes':
+        yield io.BytesIO(ruta_o_bytes)
+    elif tipo == 'stream':
+        ruta_o_bytes.seek(0)
+        yield ruta_o_bytes
+    elif tipo == 'compartida':
+        with abrir_stream(ruta_o_bytes) as stream:
+            yield stream
+    elif tipo == 'mmap':
+        # Pages are read straight from the page cache, without a private copy
+        with open(ruta_o_bytes, 'rb') as pdf_file, \
+                mmap.mmap(pdf_file.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+            yield mapa
+    else:
+        with open(ruta_o_bytes, 'rb') as pdf_file:
+            yield pdf_file
+
+
+def _ruta_en_disco(ruta_o_bytes, tipo: str) -> Optional[str]:
+    return ruta_o_bytes if tipo in ('archivo', 'mmap') else None
+
+
+def _extraer_paginas(documento: DocumentoPDF, inicio: int, fin: int) -> Tuple[List[str], List[float]]:
+    """Extract text of pages [inicio, fin) with per-page timing in milliseconds"""
+    textos = []
+    tiempos = []
+    for numero in range(inicio, fin):
+        t0 = time.perf_counter()
+        textos.append(documento.extraer_pagina(numero))
+        tiempos.append(round((time.perf_counter() - t0) * 1000, 3))
+    return textos, tiempos
+
+
+def extraer_rango_paginas(
+    fuente,
+    tipo: str,
+    inicio: int,
+    fin: int,
+    backend: str = 'pypdf2'
+) -> Tuple[List[str], List[float]]:
+    """
+    Extract a page range from a PDF (picklable task for page sharding).
+    
+    Args:
+        fuente: File path, bytes or ReferenciaCompartida
+        tipo: 'archivo', 'mmap', 'bytes' or 'compartida'
+        inicio: First page (0-based, inclusive)
+        fin: Last page (exclusive)
+        backend: Name of the PDF backend to use
+        
+    Returns:
+        Tuple of (page texts, per-page times in ms)
+    """
+    with _abrir_pdf(fuente, tipo) as pdf_file:
+        documento = obtener_backend(backend).abrir(pdf_file, _ruta_en_disco(fuente, tipo))
+        try:
+            return _extraer_paginas(documento, inicio, fin)
+        finally:
+            documento.cerrar()
+
+
+def ocr_pagina_pdf(ruta: str, numero: int, huella: str) -> Tuple[str, bool, float]:
+    """
+    OCR one page of a PDF on disk (picklable task for the PDF process pool).
+    
+    Returns:
+        Tuple of (text, OCR cache hit, time in ms)
+    """
+    t0 = time.perf_counter()
+    texto, acierto = ocr_local.ocr_pagina(ruta, numero, huella)
+    return texto, acierto, round((time.perf_counter() - t0) * 1000, 3)
+
+
+class LectorPaginas:
+    """
+    Lazy page iterator over a PDF: a page is decoded only when it is requested.
+    
+    Iterating yields (page number, text) in document order.
+    
+    Without an executor pages are decoded one by one in the calling thread.
+    With one, page ranges of PDF_EXTRACTION['paginas_por_fragmento'] are
+    decoded by the executor (documents shorter than 'min_paginas_paralelo'
+    form a single range) and yielded in order; at most `adelanto` ranges are
+    in flight, so abandoning the iteration leaves later ranges undecoded.
+    Use as a context manager; leaving it cancels pending ranges.
+    Range workers use the same backend as the reader.
+    
+    With `ocr`, pages without a text layer (see ocr.necesita_ocr) are
+    recognized with the local OCR engine, one executor task per page. The
+    first such page hashes the document (and spools it to a temporary file
+    if it is not on disk); every OCR task reuses that path and hash.
+    
+    With a `plazo`, iteration stops before the next page (or range) once the
+    deadline has passed and `interrumpido` is set.
+    
+    `paginas_leidas` counts the pages yielded to the reader, while
+    `paginas_decodificadas` also counts ranges decoded ahead of it.
+    """
+    
+    def __init__(
+        self,
+        ruta_o_bytes,
+        tipo: str = 'archivo',
+        max_paginas: Optional[int] = None,
+        ejecutor=None,
+        adelanto: Optional[int] = None,
+        backend: Optional[BackendPDF] = None,
+        ocr: bool = False,
+        plazo: Optional[Plazo] = None
+    ):
+        """
+        Args:
+            ruta_o_bytes: File path, bytes, binary stream or ReferenciaCompartida
+            tipo: 'archivo', 'mmap', 'bytes', 'stream' or 'compartida'
+            max_paginas: Page budget; only the first max_paginas pages are read
+            ejecutor: Optional executor (anything with submit()) for page ranges
+            adelanto: Ranges in flight ahead of the reader (None = all at once)
+            backend: PDF backend (default: first available one)
+            ocr: OCR pages without a text layer (ignored if no engine is installed)
+            plazo: Request deadline, checked before each page or range
+        """
+        self._fuente = ruta_o_bytes
+        self._tipo = tipo
+        self.max_paginas = max_paginas
+        self._ejecutor = ejecutor
+        self._adelanto = adelanto
+        self.backend = backend if backend is not None else backends_disponibles()[0]
+        self._pila = ExitStack()
+        self._documento = None
+        self._ocr = ocr and ocr_local.OCR_OK
+        self._documento_ocr: Optional[Tuple[str, str]] = None
+        self._plazo = plazo or SIN_PLAZO
+        self.interrumpido = False
+        self._rangos = deque()
+        self._pendientes = deque()
+        self.num_paginas = 0
+        self.limite = 0
+        self.paginas_decodificadas = 0
+        self.paginas_leidas = 0
+        self.tiempos_pagina_ms: List[float] = []
+        self.fragmentos = 0
+        self.paginas_ocr = 0
+        self.aciertos_cache_ocr = 0
+    
+    def __enter__(self) -> 'LectorPaginas':
+        try:
+            fuente, tipo = self._fuente, self._tipo
+            if tipo == 'stream' and self._ejecutor is not None:
+                # Streams cannot be shared with workers; shard from their bytes
+                fuente.seek(0)
+                fuente, tipo = fuente.read(), 'bytes'
+            
+            stream = self._pila.enter_context(_abrir_pdf(fuente, tipo))
+            self._documento = self.backend.abrir(stream, _ruta_en_disco(fuente, tipo))
+            self._pila.callback(self._documento.cerrar)
+            self.num_paginas = self._documento.num_paginas
+            self.limite = self.num_paginas if self.max_paginas is None else min(self.num_paginas, self.max_paginas)
+            
+            if self._ejecutor is None:
+                self.fragmentos = 1
+            else:
+                # Bytes reach worker processes through one shared block instead of one copy per range
+                if tipo == 'bytes':
+                    (compartida,) = self._pila.enter_context(compartir(fuente))
+                    if isinstance(compartida, ReferenciaCompartida):
+                        fuente, tipo = compartida, 'compartida'
+                self._fuente, self._tipo = fuente, tipo
+                self._rangos.extend(self._calcular_rangos())
+        except Exception:
+            self._pila.close()
+            raise
+        return self
+    
+    def __exit__(self, *exc) -> bool:
+        for paginas, _, futuro in self._pendientes:
+            if futuro.cancel():
+                self.paginas_decodificadas -= paginas
+        # Ranges already running must finish before the shared block is unlinked
+        wait([futuro for _, _, futuro in self._pendientes])
+        self._pendientes.clear()
+        self._pila.close()
+        return False
+    
+    def __iter__(self) -> Iterator[Tuple[int, str]]:
+        if self._ejecutor is None:
+            for numero in range(self.limite):
+                if self._plazo.vencido():
+                    self.interrumpido = True
+                    return
+                textos, tiempos = _extraer_paginas(self._documento, numero, numero + 1)
+                self.paginas_decodificadas += 1
+                self._reconocer(numero, textos, tiempos)
+                self.tiempos_pagina_ms.extend(tiempos)
+                self.paginas_leidas += 1
+                yield numero, textos[0]
+            return
+        
+        while self._rangos or self._pendientes:
+            if self._plazo.vencido():
+                # Ranges in flight are cancelled on exit
+                self.interrumpido = True
+                return
+            self._enviar_rangos()
+            _, inicio, futuro = self._pendientes.popleft()
+            textos, tiempos = futuro.result()
+            self._reconocer(inicio, textos, tiempos)
+            self.tiempos_pagina_ms.extend(tiempos)
+            for numero, texto in enumerate(textos, inicio):
+                self.paginas_leidas += 1
+                yield numero, texto
+    
+    def _reconocer(self, inicio: int, textos: List[str], tiempos: List[float]) -> None:
+        """OCR the pages of a decoded range that have no text layer, in place"""
+        if not self._ocr:
+            return
+        sin_texto = [i for i, texto in enumerate(textos) if ocr_local.necesita_ocr(texto)]
+        if not sin_texto:
+            return
+        documento = self._intentar_ocr(self._preparar_ocr)
+        if documento is None:
+            return
+        ruta, huella = documento
+        
+        if self._ejecutor is None:
+            resultados = {
+                i: self._intentar_ocr(lambda i=i: ocr_pagina_pdf(ruta, inicio + i, huella))
+                for i in sin_texto
+            }
+        else:
+            # One task per page: scanned documents parallelize page by page
+            futuros = {
+                i: self._ejecutor.submit(ocr_pagina_pdf, ruta, inicio + i, huella)
+                for i in sin_texto
+            }
+            resultados = {i: self._intentar_ocr(futuro.result) for i, futuro in futuros.items()}
+        
+        for i, resultado in resultados.items():
+            if resultado is None:
+                continue
+            texto, acierto, tiempo = resultado
+            textos[i] = texto
+            tiempos[i] = round(tiempos[i] + tiempo, 3)
+            self.paginas_ocr += 1
+            self.aciertos_cache_ocr += acierto
+    
+    def _preparar_ocr(self) -> Tuple[str, str]:
+        """Path and SHA-256 of the document, spooled to disk once if it has no path"""
+        if self._documento_ocr is None:
+            with _abrir_pdf(self._fuente, self._tipo) as stream:
+                ruta = _ruta_en_disco(self._fuente, self._tipo)
+                if ruta is None:
+                    # Removed with the reader, after every OCR task has finished
+                    self._documento_ocr = self._pila.enter_context(ocr_local.volcar_pdf(stream))
+                else:
+                    self._documento_ocr = (ruta, ocr_local.huella_pdf(stream))
+        return self._documento_ocr
+    
+    @staticmethod
+    def _intentar_ocr(reconocer: Callable[[], Tuple]) -> Optional[Tuple]:
+        # An OCR failure leaves the page empty instead of failing the document
+        try:
+            return reconocer()
+        except Exception as e:
+            logger.warning(f"OCR failed on PDF page: {str(e)}")
+            return None
+    
+    def _calcular_rangos(self) -> List[Tuple[int, int]]:
+        if self.limite < PDF_EXTRACTION['min_paginas_paralelo']:
+            tamano = max(self.limite, 1)
+        else:
+            tamano = PDF_EXTRACTION['paginas_por_fragmento']
+        return [(inicio, min(inicio + tamano, self.limite)) for inicio in range(0, self.limite, tamano)]
+    
+    def _enviar_rangos(self) -> None:
+        en_vuelo = len(self._rangos) + len(self._pendientes) if self._adelanto is None else max(self._adelanto, 1)
+        while self._rangos and len(self._pendientes) < en_vuelo:
+            inicio, fin = self._rangos.popleft()
+            futuro = self._ejecutor.submit(
+                extraer_rango_paginas, self._fuente, self._tipo, inicio, fin, self.backend.nombre
+            )
+            self._pendientes.append((fin - inicio, inicio, futuro))
+            self.paginas_decodificadas += fin - inicio
+            self.fragmentos += 1
 
 
 class ManejadorDocumentos:
     """PDF document handler"""
     
     def __init__(self, usar_ocr=False):
+        """
+        Args:
+            usar_ocr: OCR pages without a text layer with the local engine
+                (utils.ocr); ignored when tesseract/pdftoppm are not installed
+        """
         self.usar_ocr = usar_ocr
     
-    def procesar_pdf(self, ruta_o_bytes, tipo='archivo'):
+    def _con_respaldo(self, operacion: Callable[[BackendPDF], Dict], vacio: Dict) -> Dict:
+        """
+        Run an extraction with each available backend until one succeeds.
+        
+        Args:
+            operacion: Extraction using the given backend; raises on failure
+            vacio: Fields of the failure result
+            
+        Returns:
+            Result of the first backend that succeeded, with its name in
+            'metodo_extraccion' (and earlier failures in 'errores_backend')
+        """
+        backends = backends_disponibles()
+        if not backends:
+            return {'exito': False, 'error': 'No PDF backend installed', **vacio}
+        
+        errores = []
+        for backend in backends:
+            try:
+                resultado = operacion(backend)
+            except Exception as e:
+                logger.debug(f"PDF backend {backend.nombre} failed: {str(e)}")
+                errores.append(f"{backend.nombre}: {str(e)}")
+                continue
+            resultado['metodo_extraccion'] = backend.nombre
+            if errores:
+                resultado['errores_backend'] = errores
+            return resultado
+        
+        return {'exito': False, 'error': '; '.join(errores), **vacio}
+    
+    def procesar_pdf(self, ruta_o_bytes, tipo='archivo', max_paginas=None, ejecutor=None, plazo=None):
         """
         Process PDF file and extract text.
         
+        Backends are tried in backends_disponibles() order; a document that
+        fails with one backend is retried with the next.
+        
         Args:
-            ruta_o_bytes: File path or bytes
-            tipo: 'archivo' for file path, 'bytes' for bytes
+            ruta_o_bytes: File path, bytes, binary stream or ReferenciaCompartida
+            tipo: 'archivo' for file path, 'mmap' for a memory-mapped file path,
+                'bytes' for bytes, 'stream' for a seekable binary stream,
+                'compartida' for a shared memory block
+            max_paginas: Page budget; only the first max_paginas pages are extracted
+            ejecutor: Optional executor (anything with submit()) to decode page
+                ranges in parallel (see LectorPaginas)
+            plazo: Request deadline; on expiry the text of the pages read so
+                far is returned with 'incompleto' set
             
         Returns:
             dict with extraction results
         """
-        if not PYPDF2_OK:
+        def extraer(backend: BackendPDF) -> Dict:
+            with LectorPaginas(
+                ruta_o_bytes, tipo, max_paginas, ejecutor, backend=backend, ocr=self.usar_ocr, plazo=plazo
+            ) as lector:
+                texto = '\n'.join(pagina for _, pagina in lector)
             return {
-                'exito': False,
-                'error': 'PyPDF2 not installed',
-                'texto': ''
+                'exito': True,
+                'texto': texto,
+                'num_paginas': lector.num_paginas,
+                'paginas_procesadas': lector.paginas_leidas,
+                'incompleto': lector.interrumpido,
+                'tiempos_pagina_ms': lector.tiempos_pagina_ms,
+                'fragmentos': lector.fragmentos,
+                'paginas_ocr': lector.paginas_ocr,
+                'aciertos_cache_ocr': lector.aciertos_cache_ocr
             }
         
-        try:
-            if tipo == 'bytes':
-                import io
-                pdf_file = io.BytesIO(ruta_o_bytes)
-            else:
-                pdf_file = open(ruta_o_bytes, 'rb')
-            
-            reader = PyPDF2.PdfReader(pdf_file)
-            texto = []
-            
-            for pagina in reader.pages:
-                texto.append(pagina.extract_text())
+        return self._con_respaldo(extraer, {'texto': ''})
+    
+    def iterar_paginas(
+        self,
+        ruta_o_bytes,
+        tipo='archivo',
+        max_paginas=None,
+        ejecutor=None,
+        adelanto=None,
+        plazo=None
+    ):
+        """
+        Stream (page number, text) pairs as pages are decoded.
+        
+        Consumers (extractors, IndexadorSecciones) start working on the first
+        page while later ones are still decoding, and only hold the pages
+        they keep. The first backend that opens the document is used; once
+        pages are flowing, errors propagate to the consumer.
+        
+        Args:
+            ruta_o_bytes: File path, bytes, binary stream or ReferenciaCompartida
+            tipo: Source type (see procesar_pdf)
+            max_paginas: Page budget
+            ejecutor: Optional executor for page ranges
+            adelanto: Ranges in flight ahead of the consumer
+                (default PDF_EXTRACTION['fragmentos_adelantados'])
+            plazo: Request deadline; iteration stops before the next page
+                (or range) once it has passed
             
-            if tipo != 'bytes':
-                pdf_file.close()
+        Yields:
+            (page number, text), 0-based, in document order
             
-            return {
+        Raises:
+            ValueError: If no backend can open the document
+        """
+        if adelanto is None:
+            adelanto = PDF_EXTRACTION['fragmentos_adelantados']
+        errores = []
+        for backend in backends_disponibles():
+            pila = ExitStack()
+            try:
+                lector = pila.enter_context(LectorPaginas(
+                    ruta_o_bytes, tipo, max_paginas, ejecutor, adelanto,
+                    backend=backend, ocr=self.usar_ocr, plazo=plazo
+                ))
+            except Exception as e:
+                errores.append(f"{backend.nombre}: {str(e)}")
+                continue
+            with pila:
+                yield from lector
+            return
+        raise ValueError('; '.join(errores) or 'No PDF backend installed')
+    
+    def procesar_pdf_incremental(
+        self,
+        ruta_o_bytes,
+        extractor,
+        tipo='archivo',
+        max_paginas=None,
+        ejecutor=None,
+        indexador=None,
+        plazo=None
+    ):
+        """
+        Extract document fields reading only the pages the extractor needs.
+        
+        Pages are decoded lazily and fed to extractor.extraer_incremental,
+        which stops once its required fields are found or a section
+        boundary is passed. Backends fall back as in procesar_pdf.
+        
+        Args:
+            ruta_o_bytes: File path, bytes, binary stream or ReferenciaCompartida
+            extractor: ExtractorIncremental for the document type
+            tipo: Source type (see procesar_pdf)
+            max_paginas: Page budget
+            ejecutor: Optional executor for page ranges (keeps
+                PDF_EXTRACTION['fragmentos_adelantados'] ranges in flight)
+            indexador: Optional IndexadorSecciones fed with the same pages
+            plazo: Request deadline; on expiry the fields found in the pages
+                read so far are returned with 'incompleto' set
+                
+        Returns:
+            dict with the extracted fields in 'datos', page counters and,
+            with an indexador, the section index of the pages read
+        """
+        def extraer(backend: BackendPDF) -> Dict:
+            if indexador is not None:
+                # Drop entries left by a backend that failed midway
+                indexador.secciones.clear()
+            with LectorPaginas(
+                ruta_o_bytes, tipo, max_paginas, ejecutor,
+                adelanto=PDF_EXTRACTION['fragmentos_adelantados'],
+                backend=backend,
+                ocr=self.usar_ocr,
+                plazo=plazo
+            ) as lector:
+                paginas = lector if indexador is None else indexador.observar(lector)
+                extraccion = extractor.extraer_incremental(paginas, plazo)
+            resultado = {
                 'exito': True,
-                'texto': '\n'.join(texto),
-                'num_paginas': len(reader.pages),
-                'metodo_extraccion': 'pypdf2'
-            }
-        except Exception as e:
-            return {
-                'exito': False,
-                'error': str(e),
-                'texto': ''
+                'datos': extraccion['datos'],
+                'num_paginas': lector.num_paginas,
+                'paginas_procesadas': extraccion['paginas_leidas'],
+                'paginas_decodificadas': lector.paginas_decodificadas,
+                'parada': extraccion['parada'],
+                'incompleto': lector.interrumpido or extraccion['parada'] == 'plazo',
+                'tiempos_pagina_ms': lector.tiempos_pagina_ms,
+                'fragmentos': lector.fragmentos,
+                'paginas_ocr': lector.paginas_ocr,
+                'aciertos_cache_ocr': lector.aciertos_cache_ocr
             }
+            if indexador is not None:
+                resultado['secciones'] = indexador.secciones
+            return resultado
+        
+        return self._con_respaldo(extraer, {'datos': {}})
 
 
 # Alias for compatibility
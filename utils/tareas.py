@@ -0,0 +1,370 @@
+"""
+Analysis tasks executed in worker pools.
+
+Top-level functions only, so they can be pickled into process pools.
+Each worker keeps one warm DemoEngine (through a RegistroMotores) and
+ManejadorDocumentos, created by inicializar_trabajador when the pool
+starts the process.
+"""
+
+import os
+from concurrent.futures import Executor, wait
+from datetime import datetime
+from typing import BinaryIO, Dict, Optional, Union
+
+from analysis_config import BUNDLES, OCR
+from core.comparador import ComparadorTextos
+from core.cronometro import Cronometro
+from core.plazo import Plazo
+from core.secciones import IndexadorSecciones
+from demo_engine import DemoEngine, Notificador, RegistroMotores
+from utils import backends_pdf
+from utils.cargas import ArchivoCargado, eliminar_carga, guardar_carga
+from utils.memoria_compartida import ReferenciaCompartida, resolver_texto
+from utils.paquetes import guardar_entrada, inventariar_paquete
+from utils.pdf_handler import ManejadorDocumentos
+
+# Warm engine shared by every task run in this process
+registro = RegistroMotores()
+_manejador: Optional[ManejadorDocumentos] = None
+
+
+def inicializar_trabajador(backend_pdf: Optional[str] = None) -> None:
+    """
+    Process pool initializer: build and warm the analysis components once.
+    
+    Args:
+        backend_pdf: PDF backend chosen by calibration in the parent process;
+            workers do not inherit the parent's module state
+    """
+    global _manejador
+    backends_pdf.establecer_preferido(backend_pdf)
+    _manejador = ManejadorDocumentos(usar_ocr=OCR['habilitado'])
+    registro.calentar()
+
+
+def calentar_trabajador() -> int:
+    """No-op task used to force a worker to start; returns its PID"""
+    registro.obtener()
+    return os.getpid()
+
+
+def _obtener_motor() -> DemoEngine:
+    return registro.obtener()
+
+
+def _obtener_manejador() -> ManejadorDocumentos:
+    return _manejador if _manejador is not None else ManejadorDocumentos(usar_ocr=OCR['habilitado'])
+
+
+def procesar_pdf_bytes(
+    datos: Union[bytes, ReferenciaCompartida],
+    ejecutor_paginas: Optional[Executor] = None,
+    max_paginas: Optional[int] = None
+) -> Dict:
+    """
+    Extract text from PDF bytes (raw or in shared memory).
+    
+    Args:
+        datos: PDF bytes or shared memory reference
+        ejecutor_paginas: Executor for page ranges (only from the main process;
+            worker processes cannot submit to the parent's pools)
+        max_paginas: Page budget for the document
+    """
+    tipo = 'compartida' if isinstance(datos, ReferenciaCompartida) else 'bytes'
+    return _obtener_manejador().procesar_pdf(
+        datos, tipo=tipo, max_paginas=max_paginas, ejecutor=ejecutor_paginas
+    )
+
+
+def procesar_documento(
+    tipo: str,
+    datos: Union[str, bytes, ReferenciaCompartida],
+    ejecutor_paginas: Optional[Executor] = None,
+    max_paginas: Optional[int] = None,
+    plazo: Optional[Plazo] = None
+) -> Dict:
+    """
+    Extract the fields of one PDF document, decoding only the pages needed.
+    
+    Args:
+        tipo: 'certificado', 'rut' or 'aviso'
+        datos: Path of a spooled upload (memory-mapped), PDF bytes or shared memory reference
+        ejecutor_paginas: Executor for page ranges
+        max_paginas: Page budget for the document
+        plazo: Request deadline; pages are no longer read once it passes
+        
+    Returns:
+        procesar_pdf_incremental result (fields in 'datos', section index of
+        the pages read in 'secciones'; the text is not returned so it is not
+        pickled back to the caller)
+    """
+    if isinstance(datos, str):
+        tipo_fuente = 'mmap'
+    elif isinstance(datos, ReferenciaCompartida):
+        tipo_fuente = 'compartida'
+    else:
+        tipo_fuente = 'bytes'
+    return _obtener_manejador().procesar_pdf_incremental(
+        datos,
+        _obtener_motor().extractor_documento(tipo),
+        tipo=tipo_fuente,
+        max_paginas=max_paginas,
+        ejecutor=ejecutor_paginas,
+        indexador=IndexadorSecciones(tipo),
+        plazo=plazo
+    )
+
+
+def procesar_carga(
+    tipo: str,
+    origen: BinaryIO,
+    ejecutor_paginas: Optional[Executor] = None,
+    max_paginas: Optional[int] = None,
+    plazo: Optional[Plazo] = None
+) -> Dict:
+    """
+    Spool an upload to a temporary file, then extract its fields from the mapped file.
+    
+    Runs in a thread (the upload stream is not picklable). The temporary file
+    is removed here even if the awaiting request was cancelled.
+    
+    Returns:
+        procesar_documento result plus 'sha256' and 'tamano_bytes' of the upload
+    """
+    return _procesar_spool(tipo, guardar_carga(origen), ejecutor_paginas, max_paginas, plazo)
+
+
+def _procesar_spool(
+    tipo: str,
+    carga: ArchivoCargado,
+    ejecutor_paginas: Optional[Executor],
+    max_paginas: Optional[int],
+    plazo: Optional[Plazo] = None
+) -> Dict:
+    """Extract fields from a spooled file, then remove it"""
+    try:
+        resultado = procesar_documento(tipo, carga.ruta, ejecutor_paginas, max_paginas, plazo)
+    finally:
+        eliminar_carga(carga.ruta)
+    resultado['sha256'] = carga.sha256
+    resultado['tamano_bytes'] = carga.tamano
+    return resultado
+
+
+def resumir_anexo(
+    ruta_paquete: str,
+    nombre: str,
+    max_paginas: Optional[int] = None,
+    plazo: Optional[Plazo] = None
+) -> Dict:
+    """
+    Count pages and find mentioned requirements in one PDF annex of a bundle.
+    
+    Runs in a process worker; the entry is streamed out of the ZIP to a
+    temporary file and only its summary is returned. Past the deadline, the
+    requirements are taken from the pages read so far ('incompleto').
+    """
+    carga = guardar_entrada(ruta_paquete, nombre)
+    try:
+        extraccion = _obtener_manejador().procesar_pdf(
+            carga.ruta, tipo='mmap', max_paginas=max_paginas, plazo=plazo
+        )
+    finally:
+        eliminar_carga(carga.ruta)
+    
+    resumen = {
+        'nombre': nombre,
+        'tamano_bytes': carga.tamano,
+        'exito': extraccion['exito'],
+        'num_paginas': extraccion.get('num_paginas', 0),
+        'paginas_procesadas': extraccion.get('paginas_procesadas', 0),
+        'requisitos_mencionados': []
+    }
+    if extraccion['exito']:
+        datos = _obtener_motor().extraer_documento('aviso', extraccion['texto'])
+        resumen['requisitos_mencionados'] = datos['requisitos_mencionados']
+        resumen['incompleto'] = extraccion['incompleto']
+    else:
+        resumen['error'] = extraccion['error']
+    return resumen
+
+
+def procesar_paquete(
+    origen: BinaryIO,
+    ejecutor_paginas: Optional[Executor] = None,
+    max_paginas: Optional[int] = None,
+    plazo: Optional[Plazo] = None
+) -> Dict:
+    """
+    Process a ZIP bundle of a tender notice (pliego) and its annexes.
+    
+    Runs in a thread. The archive is spooled to one temporary file and read
+    entry by entry (never extracted as a whole). PDF annexes are summarized
+    in parallel on the executor while the notice itself is extracted with
+    page ranges on the same executor; other files are only counted and sized.
+    
+    Args:
+        origen: Readable binary stream of the ZIP upload
+        ejecutor_paginas: Executor for annex summaries and notice page ranges
+        max_paginas: Page budget for the notice
+        plazo: Request deadline for the notice and annex extractions
+        
+    Returns:
+        dict with 'aviso' (procesar_documento result of the notice), 'pliego'
+        (its entry name), 'anexos' (per-file summaries), 'num_anexos',
+        'tamano_anexos_bytes' and 'paginas_anexos'
+        
+    Raises:
+        PaqueteInvalido: Invalid archive or no tender notice in it
+        ArchivoDemasiadoGrande: Archive or notice above the size limits
+    """
+    carga = guardar_carga(origen, BUNDLES['max_bytes_paquete'])
+    futuros = {}
+    try:
+        inventario = inventariar_paquete(carga.ruta)
+        pdfs = [anexo for anexo in inventario['anexos'] if anexo.es_pdf]
+        if ejecutor_paginas is not None:
+            futuros = {
+                anexo.nombre: ejecutor_paginas.submit(
+                    resumir_anexo, carga.ruta, anexo.nombre, BUNDLES['max_paginas_anexo'], plazo
+                )
+                for anexo in pdfs
+            }
+        
+        pliego = inventario['pliego']
+        aviso = _procesar_spool(
+            'aviso', guardar_entrada(carga.ruta, pliego.nombre), ejecutor_paginas, max_paginas, plazo
+        )
+        
+        anexos = []
+        for anexo in inventario['anexos']:
+            if not anexo.es_pdf:
+                anexos.append({'nombre': anexo.nombre, 'tamano_bytes': anexo.tamano, 'num_paginas': 0})
+                continue
+            try:
+                if anexo.nombre in futuros:
+                    anexos.append(futuros[anexo.nombre].result())
+                else:
+                    anexos.append(resumir_anexo(carga.ruta, anexo.nombre, BUNDLES['max_paginas_anexo'], plazo))
+            except Exception as e:
+                anexos.append({
+                    'nombre': anexo.nombre, 'tamano_bytes': anexo.tamano, 'num_paginas': 0,
+                    'exito': False, 'error': str(e)
+                })
+    finally:
+        # Workers read the archive; let them finish before it is removed
+        for futuro in futuros.values():
+            futuro.cancel()
+        wait(list(futuros.values()))
+        eliminar_carga(carga.ruta)
+    
+    return {
+        'aviso': aviso,
+        'pliego': pliego.nombre,
+        'anexos': anexos,
+        'num_anexos': len(anexos),
+        'tamano_anexos_bytes': sum(anexo['tamano_bytes'] for anexo in anexos),
+        'paginas_anexos': sum(anexo['num_paginas'] for anexo in anexos)
+    }
+
+
+def evaluar_documentos(
+    datos_cert: Dict,
+    datos_rut: Dict,
+    datos_aviso: Dict,
+    valor_proceso: Optional[float] = None,
+    timestamp_inicio: Optional[datetime] = None,
+    notificar: Optional[Notificador] = None,
+    plazo: Optional[Plazo] = None,
+    cronometro: Optional[Cronometro] = None
+) -> Dict:
+    """
+    Validate and score already extracted certificate, RUT and notice fields.
+    
+    notificar (progress events, see DemoEngine.analizar) is only usable from
+    thread stages, since callbacks cannot be pickled into worker processes;
+    plazo (request deadline) and cronometro (stage timer already holding the
+    extraction times) are picklable and work in both.
+    """
+    motor = _obtener_motor()
+    cronometro = cronometro or Cronometro()
+    empresa = motor.validar_empresa(datos_cert, datos_rut, notificar=notificar, cronometro=cronometro)
+    return motor.evaluar_aviso(
+        empresa, datos_aviso, valor_proceso, timestamp_inicio, notificar, plazo, cronometro
+    )
+
+
+def analizar_textos(
+    certificado_texto: Union[str, ReferenciaCompartida],
+    rut_texto: Union[str, ReferenciaCompartida],
+    aviso_texto: Union[str, ReferenciaCompartida],
+    valor_proceso: Optional[float] = None,
+    notificar: Optional[Notificador] = None,
+    plazo: Optional[Plazo] = None
+) -> Dict:
+    """Run the complete DEMO analysis (notificar: thread stages only, see evaluar_documentos)"""
+    return _obtener_motor().analizar(
+        resolver_texto(certificado_texto),
+        resolver_texto(rut_texto),
+        resolver_texto(aviso_texto),
+        valor_proceso,
+        notificar=notificar,
+        plazo=plazo
+    )
+
+
+def preparar_empresa(
+    certificado_texto: Union[str, ReferenciaCompartida],
+    rut_texto: Union[str, ReferenciaCompartida]
+) -> Dict:
+    """Extract and validate company documents"""
+    return _obtener_motor().preparar_empresa(
+        resolver_texto(certificado_texto), resolver_texto(rut_texto)
+    )
+
+
+def validar_empresa(datos_cert: Dict, datos_rut: Dict) -> Dict:
+    """Validate already extracted company data"""
+    return _obtener_motor().validar_empresa(datos_cert, datos_rut)
+
+
+def analizar_aviso(
+    empresa: Dict,
+    aviso_texto: Union[str, ReferenciaCompartida],
+    valor_proceso: Optional[float] = None,
+    plazo: Optional[Plazo] = None
+) -> Dict:
+    """Analyze a prepared company against one tender notice"""
+    return _obtener_motor().analizar_aviso(
+        empresa, resolver_texto(aviso_texto), valor_proceso, plazo=plazo
+    )
+
+
+def analizar_perfil(
+    datos_cert: Dict,
+    datos_rut: Dict,
+    aviso_texto: Union[str, ReferenciaCompartida],
+    valor_proceso: Optional[float] = None,
+    plazo: Optional[Plazo] = None
+) -> Dict:
+    """Analyze stored company data against one tender notice (no extraction)"""
+    motor = _obtener_motor()
+    cronometro = Cronometro()
+    empresa = motor.validar_empresa(datos_cert, datos_rut, cronometro=cronometro)
+    return motor.analizar_aviso(
+        empresa, resolver_texto(aviso_texto), valor_proceso, plazo=plazo, cronometro=cronometro
+    )
+
+
+def buscar_top_k(
+    objeto_social: str,
+    actividades_secundarias: str,
+    objetos_contrato: Dict[str, str],
+    k: int,
+    plazo: Optional[Plazo] = None
+) -> Dict:
+    """Rank tenders by similarity to a company"""
+    return ComparadorTextos().buscar_top_k(
+        objeto_social, actividades_secundarias, objetos_contrato, k=k, plazo=plazo
+    )
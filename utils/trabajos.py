@@ -0,0 +1,233 @@
+"""Worker pool draining the durable analysis job queue"""
+
+import logging
+import os
+import shutil
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from data.trabajos import ColaTrabajos
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTrabajos:
+    """
+    Worker threads that claim queued jobs by priority and store their results.
+    
+    Each worker runs one job at a time through the `ejecutar` callback; the
+    heavy lifting inside it goes to the analysis executor stages as usual.
+    Workers sleep until notified of a new job or until the poll interval
+    passes, which also picks up jobs enqueued by other processes.
+    
+    While a job runs, a helper thread renews its lease every
+    `intervalo_renovacion` seconds, so jobs longer than the lease are not
+    claimed again by another worker.
+    
+    When given a `directorio`, the pool also owns each job's upload folder
+    (`directorio/<job id>`): it is removed once the job is completed, failed
+    or purged, and kept when the job is released back to the queue.
+    """
+    
+    def __init__(
+        self,
+        cola: ColaTrabajos,
+        ejecutar: Callable[[Dict], Dict],
+        trabajadores: int = 2,
+        intervalo_sondeo: float = 1.0,
+        retencion: float = 24 * 3600,
+        directorio: Optional[str] = None,
+        intervalo_renovacion: Optional[float] = None
+    ):
+        """
+        Args:
+            cola: Durable job queue
+            ejecutar: Runs one claimed job and returns its result; exceptions
+                with a status_code/detail (e.g. HTTPException) keep them
+            trabajadores: Jobs run concurrently by this process
+            intervalo_sondeo: Max seconds an idle worker waits before polling the queue
+            retencion: Seconds finished jobs are kept before being purged
+            directorio: Folder holding one upload subfolder per job (None = no cleanup)
+            intervalo_renovacion: Seconds between lease renewals of a running
+                job (default a third of the queue's duracion_reserva)
+        """
+        self.cola = cola
+        self.ejecutar = ejecutar
+        self.trabajadores = trabajadores
+        self.intervalo_sondeo = intervalo_sondeo
+        self.retencion = retencion
+        self.directorio = directorio
+        self.intervalo_renovacion = intervalo_renovacion or cola.duracion_reserva / 3
+        self._hilos: List[threading.Thread] = []
+        self._condicion = threading.Condition()
+        self._detenido = threading.Event()
+        self._lock = threading.Lock()
+        self._ultima_purga = 0.0
+        self.en_ejecucion = 0
+        self.completados = 0
+        self.fallidos = 0
+    
+    def iniciar(self) -> None:
+        """Start the worker threads (no-op if already running)"""
+        with self._lock:
+            if self._hilos:
+                return
+            self._detenido.clear()
+            self._hilos = [
+                threading.Thread(target=self._bucle, name=f"licitia-trabajos-{i}", daemon=True)
+                for i in range(self.trabajadores)
+            ]
+            for hilo in self._hilos:
+                hilo.start()
+        logger.info(f"Job workers started: {self.trabajadores}")
+    
+    def notificar(self) -> None:
+        """Wake an idle worker after a job was enqueued"""
+        with self._condicion:
+            self._condicion.notify()
+    
+    def detener(self, timeout: Optional[float] = None) -> None:
+        """
+        Stop the workers once their current job finishes.
+        
+        Jobs that fail while stopping go back to the queue; jobs still running
+        when the process exits keep their lease and are claimed again once it
+        expires.
+        """
+        self._detenido.set()
+        with self._condicion:
+            self._condicion.notify_all()
+        with self._lock:
+            hilos, self._hilos = self._hilos, []
+        for hilo in hilos:
+            hilo.join(timeout)
+    
+    def _bucle(self) -> None:
+        while not self._detenido.is_set():
+            try:
+                trabajo = self.cola.tomar()
+            except Exception as e:
+                logger.error(f"Job queue error: {str(e)}")
+                trabajo = None
+            
+            if trabajo is None:
+                self._purgar()
+                with self._condicion:
+                    if not self._detenido.is_set():
+                        self._condicion.wait(self.intervalo_sondeo)
+                continue
+            
+            self._procesar(trabajo)
+    
+    def directorio_trabajo(self, id_trabajo: str) -> Optional[str]:
+        """Upload folder of a job (None when the pool has no directory)"""
+        if self.directorio is None:
+            return None
+        return os.path.join(self.directorio, id_trabajo)
+    
+    def _limpiar(self, id_trabajo: str) -> None:
+        """Drop the uploads of a job that will not run again"""
+        directorio = self.directorio_trabajo(id_trabajo)
+        if directorio is not None:
+            shutil.rmtree(directorio, ignore_errors=True)
+    
+    def limpiar_huerfanos(self) -> List[str]:
+        """
+        Drop upload folders of jobs that are no longer in the queue.
+        
+        Folders younger than the lease are kept: another process may still
+        be spooling the uploads of a job it has not enqueued yet.
+        
+        Returns:
+            Names of the folders removed
+        """
+        if self.directorio is None or not os.path.isdir(self.directorio):
+            return []
+        vigentes = set(self.cola.ids())
+        limite = time.time() - self.cola.duracion_reserva
+        eliminados = []
+        for nombre in os.listdir(self.directorio):
+            ruta = os.path.join(self.directorio, nombre)
+            try:
+                antiguo = os.path.getmtime(ruta) < limite
+            except OSError:
+                continue
+            if nombre not in vigentes and antiguo:
+                shutil.rmtree(ruta, ignore_errors=True)
+                eliminados.append(nombre)
+        return eliminados
+    
+    def _renovar(self, id_trabajo: str, terminado: threading.Event) -> None:
+        """Keep renewing a running job's lease until it finishes"""
+        while not terminado.wait(self.intervalo_renovacion):
+            try:
+                if not self.cola.renovar(id_trabajo):
+                    return
+            except Exception as e:
+                logger.error(f"Job {id_trabajo} lease renewal error: {str(e)}")
+    
+    def _procesar(self, trabajo: Dict) -> None:
+        """Run one claimed job and record its outcome"""
+        with self._lock:
+            self.en_ejecucion += 1
+        terminado = threading.Event()
+        threading.Thread(
+            target=self._renovar, args=(trabajo['id'], terminado),
+            name=f"licitia-reserva-{trabajo['id']}", daemon=True
+        ).start()
+        try:
+            resultado = self.ejecutar(trabajo)
+        except Exception as e:
+            if self._detenido.is_set():
+                # Interrupted by shutdown (executors closing): run it again on restart
+                self.cola.liberar(trabajo['id'])
+                return
+            logger.warning(f"Job {trabajo['id']} failed: {str(e)}")
+            self.cola.fallar(
+                trabajo['id'],
+                str(getattr(e, 'detail', None) or e),
+                getattr(e, 'status_code', 500)
+            )
+            self._limpiar(trabajo['id'])
+            with self._lock:
+                self.fallidos += 1
+        else:
+            self.cola.completar(trabajo['id'], resultado)
+            self._limpiar(trabajo['id'])
+            with self._lock:
+                self.completados += 1
+        finally:
+            terminado.set()
+            with self._lock:
+                self.en_ejecucion -= 1
+    
+    def _purgar(self) -> None:
+        """Drop expired finished jobs, at most once per minute"""
+        ahora = time.monotonic()
+        with self._lock:
+            if ahora - self._ultima_purga < 60:
+                return
+            self._ultima_purga = ahora
+        try:
+            eliminados = self.cola.purgar(self.retencion)
+        except Exception as e:
+            logger.error(f"Job purge error: {str(e)}")
+            return
+        for id_trabajo in eliminados:
+            # Covers jobs failed by tomar() after their last lease expired
+            self._limpiar(id_trabajo)
+        if eliminados:
+            logger.info(f"Purged {len(eliminados)} finished jobs")
+    
+    def estadisticas(self, ventana: float = 300) -> Dict:
+        """Queue depth, throughput and latency plus this process' worker counters"""
+        estadisticas = self.cola.estadisticas(ventana)
+        estadisticas.update({
+            'trabajadores': self.trabajadores,
+            'activos': bool(self._hilos),
+            'en_ejecucion': self.en_ejecucion,
+            'completados': self.completados,
+            'fallidos': self.fallidos
+        })
+        return estadisticas